@@ -17,55 +17,131 @@
 #   - iredmail_ldap_basedn: dn which contains all mail domains and accounts.
 #   - iredmail_ldap_bind_dn: the bind dn used to update LDAP data.
 #   - iredmail_ldap_bind_password: password of bind dn in plain text.
+#
+# Bound connections are kept in a pool (per process), see `LDAP_POOL_*` in
+# `libs/default_settings.py`.
 
 import uuid
 from typing import List, Tuple, Dict
 import ldap
+from ldap.controls import SimplePagedResultsControl
+from ldap.ldapobject import ReconnectLDAPObject
 
-from libs import utils, form_utils
+from libs import utils, form_utils, backend_cache
 from libs.logger import logger
+from libs.pool import ConnectionPool
 import settings
 
 
-class LDAPWrap(object):
-    def __init__(self):
-        # Initialize LDAP connection.
-        self.conn = None
+def _connect():
+    uri = settings.iredmail_ldap_uri
+
+    # Detect STARTTLS support.
+    starttls = False
+    if uri.startswith('ldaps://'):
+        starttls = True
+
+        # Rebuild uri, use ldap:// + STARTTLS (with normal port 389)
+        # instead of ldaps:// (port 636) for secure connection.
+        uri = uri.replace('ldaps://', 'ldap://')
+
+        # Don't check CA cert
+        ldap.set_option(ldap.OPT_X_TLS_REQUIRE_CERT, ldap.OPT_X_TLS_NEVER)
+
+    # If connection is lost (`ldap.SERVER_DOWN`), `ReconnectLDAPObject`
+    # reconnects and re-does STARTTLS and bind automatically, then retries
+    # the operation.
+    conn = ReconnectLDAPObject(uri, retry_max=2, retry_delay=1)
+
+    # Set LDAP protocol version: LDAP v3.
+    conn.set_option(ldap.OPT_PROTOCOL_VERSION, ldap.VERSION3)
 
-        uri = settings.iredmail_ldap_uri
+    if starttls:
+        conn.start_tls_s()
 
-        # Detect STARTTLS support.
-        starttls = False
-        if uri.startswith('ldaps://'):
-            starttls = True
+    try:
+        # bind as vmailadmin
+        conn.bind_s(settings.iredmail_ldap_bind_dn, settings.iredmail_ldap_bind_password)
+    except Exception as e:
+        logger.error('VMAILADMIN_INVALID_CREDENTIALS. Detail: %s' % repr(e))
+        conn.unbind()
+        raise
+
+    return conn
+
+
+def _close(conn):
+    conn.unbind()
 
-            # Rebuild uri, use ldap:// + STARTTLS (with normal port 389)
-            # instead of ldaps:// (port 636) for secure connection.
-            uri = uri.replace('ldaps://', 'ldap://')
 
-            # Don't check CA cert
-            ldap.set_option(ldap.OPT_X_TLS_REQUIRE_CERT, ldap.OPT_X_TLS_NEVER)
+def _ping(conn):
+    conn.whoami_s()
+    return True
 
-        self.conn = ldap.initialize(uri)
 
-        # Set LDAP protocol version: LDAP v3.
-        self.conn.set_option(ldap.OPT_PROTOCOL_VERSION, ldap.VERSION3)
+# Bound connections shared by all threads of current process.
+_pool = ConnectionPool(connect=_connect,
+                       close=_close,
+                       ping=_ping,
+                       max_size=settings.LDAP_POOL_SIZE,
+                       idle_timeout=settings.LDAP_POOL_IDLE_TIMEOUT,
+                       check_interval=settings.LDAP_POOL_CHECK_INTERVAL,
+                       wait_timeout=settings.LDAP_POOL_WAIT_TIMEOUT)
 
-        if starttls:
-            self.conn.start_tls_s()
+
+class LDAPWrap(object):
+    """Get a bound connection from pool, it's returned to pool when this
+    object is deleted (usually when function which created it returns)."""
+    def __init__(self):
+        self.conn = None
 
         try:
-            # bind as vmailadmin
-            self.conn.bind_s(settings.iredmail_ldap_bind_dn, settings.iredmail_ldap_bind_password)
+            self.conn = _pool.acquire()
         except Exception as e:
-            logger.error('VMAILADMIN_INVALID_CREDENTIALS. Detail: %s' % repr(e))
+            logger.error("LDAP error: {0}".format(e))
 
     def __del__(self):
-        try:
-            if self.conn:
-                self.conn.unbind()
-        except:
-            pass
+        if self.conn is not None:
+            _pool.release(self.conn)
+            self.conn = None
+
+
+def get_metrics():
+    """Get metrics of LDAP connection pool of current process."""
+    return {'ldap_pool': _pool.stats()}
+
+
+def iter_search(base, scope, filterstr, attrlist=None, page_size=None, conn=None):
+    """Search with Simple Paged Results control (RFC 2696), so that large
+    result is not limited by server size limit. Search results are
+    requested (and yielded) page by page, one page is held in memory.
+
+    Yield `(<dn>, <ldif>)`.
+
+    :param page_size: number of entries in one page. Defaults to
+                      `settings.LDAP_PAGE_SIZE`.
+    """
+    if not conn:
+        _wrap = LDAPWrap()
+        conn = _wrap.conn
+
+    ctrl = SimplePagedResultsControl(True, size=page_size or settings.LDAP_PAGE_SIZE, cookie='')
+
+    while True:
+        msgid = conn.search_ext(base, scope, filterstr, attrlist, serverctrls=[ctrl])
+        (_rtype, _rdata, _rmsgid, _sctrls) = conn.result3(msgid)
+
+        for (_dn, _ldif) in _rdata:
+            # Search references don't have dn.
+            if _dn:
+                yield (_dn, _ldif)
+
+        # Server returns an empty cookie with last page.
+        _cookies = [c.cookie for c in _sctrls if c.controlType == SimplePagedResultsControl.controlType]
+        if not _cookies or not _cookies[0]:
+            break
+
+        ctrl.cookie = _cookies[0]
 
 
 # Check whether domain name (either primary domain or alias domain) exists
@@ -75,6 +151,7 @@ def is_domain_exists(domain, conn=None):
 
     if not utils.is_domain(domain):
         # Return False if invalid.
+        backend_cache.skip_caching()
         return False
 
     if not conn:
@@ -100,6 +177,7 @@ def is_domain_exists(domain, conn=None):
             return False
     except:
         # Account 'EXISTS' (fake) if lookup failed.
+        backend_cache.skip_caching()
         return True
 
 
@@ -110,6 +188,7 @@ def is_email_exists(mail, conn=None):
     mail = utils.strip_mail_ext_address(mail)
 
     if not utils.is_email(mail):
+        backend_cache.skip_caching()
         return True
 
     # Filter used to search mail accounts.
@@ -135,6 +214,7 @@ def is_email_exists(mail, conn=None):
             return False
     except:
         # Account 'EXISTS' (fake) if lookup failed.
+        backend_cache.skip_caching()
         return True
 
 
@@ -142,6 +222,7 @@ def is_maillist_exists(mail, conn=None):
     """Check whether mailing list account exists."""
     mail = str(mail).lower()
     if not utils.is_email(mail):
+        backend_cache.skip_caching()
         return True
 
     # Filter used to search mail accounts.
@@ -166,9 +247,48 @@ def is_maillist_exists(mail, conn=None):
             # Account not exist.
             return False
     except:
+        backend_cache.skip_caching()
         return False
 
 
+def filter_existing_maillists(mails, conn=None):
+    """Return `(True, [<mail>, ...])` with mailing lists which exist in
+    given mail addresses, checked with one LDAP query for every 100
+    addresses."""
+    mails = {str(i).lower() for i in mails if utils.is_email(i)}
+    if not mails:
+        return (True, [])
+
+    existing_lists = set()
+    try:
+        if not conn:
+            _wrap = LDAPWrap()
+            conn = _wrap.conn
+
+        _mails = sorted(mails)
+        for i in range(0, len(_mails), 100):
+            query_filter = '(&'
+            query_filter += '(|(objectClass=mailUser)(objectClass=mailList)(objectClass=mailAlias))'
+            query_filter += '(|'
+            for mail in _mails[i:i + 100]:
+                query_filter += '(mail=%s)(shadowAddress=%s)' % (mail, mail)
+            query_filter += '))'
+
+            qr = conn.search_s(settings.iredmail_ldap_basedn,
+                               ldap.SCOPE_SUBTREE,
+                               query_filter,
+                               ['mail', 'shadowAddress'])
+
+            for (_dn, _ldif) in qr:
+                _ldif = utils.bytes2str(_ldif)
+                _addresses = _ldif.get('mail', []) + _ldif.get('shadowAddress', [])
+                existing_lists.update({str(i).lower() for i in _addresses})
+
+        return (True, list(existing_lists & mails))
+    except Exception as e:
+        return (False, repr(e))
+
+
 def __generate_mlid():
     """Generate an server-wide unique uuid as mailing list id."""
     return str(uuid.uuid4())
@@ -638,10 +758,11 @@ def get_existing_maillists(domains=None, conn=None):
 
     existing_lists = set()
     try:
-        qr = conn.search_s(settings.iredmail_ldap_basedn,
-                           ldap.SCOPE_SUBTREE,
-                           _filter,
-                           ['mail'])
+        qr = iter_search(settings.iredmail_ldap_basedn,
+                         ldap.SCOPE_SUBTREE,
+                         _filter,
+                         ['mail'],
+                         conn=conn)
 
         for (_dn, _ldif) in qr:
             _ldif = utils.bytes2str(_ldif)
@@ -652,3 +773,53 @@ def get_existing_maillists(domains=None, conn=None):
         return (True, existing_lists)
     except Exception as e:
         return (False, repr(e))
+
+
+def get_maillists_changed_since(since=None, conn=None):
+    """Get mailing lists created or modified since given time.
+
+    :param since: the time (value of `modifyTimestamp`) returned by previous
+                  call. If None, get all mailing lists.
+    :param conn: ldap connection cursor.
+
+    Return `(True, ({<mail>: [<domain>, ...]}, <time>))` with domains of
+    every mailing list (domain of `mail` and domains of `shadowAddress`, same
+    as `get_existing_maillists(domains=...)` matches), pass returned time as
+    `since` to get mailing lists changed after this call. Note: removed
+    mailing lists can not be detected this way.
+    """
+    if not conn:
+        _wrap = LDAPWrap()
+        conn = _wrap.conn
+
+    _filter = '(&(objectClass=mailList)(enabledService=mlmmj))'
+    if since:
+        # Use `>=` to not miss mailing lists changed in same second.
+        _filter = '(&' + _filter + '(modifyTimestamp>=%s))' % since
+
+    lists = {}
+    latest = since
+    try:
+        qr = iter_search(settings.iredmail_ldap_basedn,
+                         ldap.SCOPE_SUBTREE,
+                         _filter,
+                         ['mail', 'shadowAddress', 'modifyTimestamp'],
+                         conn=conn)
+
+        for (_dn, _ldif) in qr:
+            _ldif = utils.bytes2str(_ldif)
+
+            _addresses = _ldif.get('mail', []) + _ldif.get('shadowAddress', [])
+            _domains = sorted({str(i).lower().split('@', 1)[-1] for i in _addresses})
+
+            for mail in _ldif.get('mail', []):
+                lists[str(mail).lower()] = _domains
+
+            # Generalized time (e.g. `20190101120000Z`) can be compared as string.
+            for _time in _ldif.get('modifyTimestamp', []):
+                if latest is None or _time > latest:
+                    latest = _time
+
+        return (True, (lists, latest))
+    except Exception as e:
+        return (False, repr(e))
@@ -21,81 +21,157 @@
 #                           Read+write privilege is required.
 #   - iredmail_sql_db_password: SQL user password.
 #   - iredmail_sql_db_use_ssl (optional): force secure connection.
+#
+# Connections are kept in a pool (per process), see `SQL_POOL_*` in
+# `libs/default_settings.py`.
 
 import uuid
 import web
-from libs import utils, form_utils
+from libs import utils, form_utils, backend_cache
 from libs.logger import logger
+from libs.pool import ConnectionPool
 import settings
 
 
-class MYSQLWrap(object):
-    def __del__(self):
-        try:
-            self.conn.ctx.db.close()
-        except:
-            pass
+def _connect_mysql():
+    conn = web.database(dbn='mysql',
+                        host=settings.iredmail_sql_db_server,
+                        port=int(settings.iredmail_sql_db_port),
+                        ssl={"ssl": settings.__dict__.get("iredmail_sql_db_use_ssl", False)},
+                        db=settings.iredmail_sql_db_name,
+                        user=settings.iredmail_sql_db_user,
+                        pw=settings.iredmail_sql_db_password,
+                        charset='utf8',
+                        pooling=False)
 
-    @staticmethod
-    def __connect():
-        conn = web.database(dbn='mysql',
-                            host=settings.iredmail_sql_db_server,
-                            port=int(settings.iredmail_sql_db_port),
-                            ssl={"ssl": settings.__dict__.get("iredmail_sql_db_use_ssl", False)},
-                            db=settings.iredmail_sql_db_name,
-                            user=settings.iredmail_sql_db_user,
-                            pw=settings.iredmail_sql_db_password,
-                            charset='utf8')
+    conn.supports_multiple_insert = True
 
-        conn.supports_multiple_insert = True
+    return conn
 
-        return conn
 
-    def __init__(self):
+def _connect_pgsql():
+    kw = {}
+    if settings.__dict__.get('iredmail_sql_db_use_ssl', False):
+        kw["sslmode"] = "prefer"
+
+    conn = web.database(dbn='postgres',
+                        host=settings.iredmail_sql_db_server,
+                        port=int(settings.iredmail_sql_db_port),
+                        db=settings.iredmail_sql_db_name,
+                        user=settings.iredmail_sql_db_user,
+                        pw=settings.iredmail_sql_db_password,
+                        pooling=False,
+                        **kw)
+    conn.supports_multiple_insert = True
+
+    return conn
+
+
+def _connect():
+    if settings.iredmail_sql_db_type == 'mysql':
+        conn = _connect_mysql()
+    else:
+        conn = _connect_pgsql()
+
+    # `web.database()` keeps one connection for each thread, but pooled
+    # connection is reused by different threads, so keep a single connection
+    # instead. It's used only by the thread which got it from pool (with
+    # `SQLWrap()`) until it's returned, connection must not be shared with
+    # other threads.
+    conn._ctx = web.storage()
+
+    # Connect now, error is raised while getting connection from pool.
+    conn._getctx()
+
+    # Mark connection lost while querying, so that it's closed instead of
+    # returned to pool.
+    _execute = conn._db_execute
+
+    def _db_execute(cur, sql_query):
         try:
-            self.conn = self.__connect()
-        except AttributeError:  # should also catch `<db>.OperationalError`
-            # Reconnect if error raised: MySQL server has gone away.
-            self.conn = self.__connect()
+            return _execute(cur, sql_query)
         except Exception as e:
-            logger.error("SQL error: {0}".format(e))
+            if _is_disconnect_error(e):
+                conn._ctx.disconnected = True
 
+            raise
+
+    conn._db_execute = _db_execute
+
+    return conn
 
-class PGSQLWrap(object):
-    def __del__(self):
-        try:
-            self.conn.ctx.db.close()
-        except:
-            pass
 
+def _is_disconnect_error(e):
+    # MySQL: 2006 (server has gone away), 2013 (lost connection to server).
+    # PostgreSQL connection is marked as `closed` by psycopg2.
+    return type(e).__name__ == 'OperationalError' and bool(e.args) and e.args[0] in (2006, 2013)
+
+
+def _close(conn):
+    conn._ctx.db.close()
+
+
+def _ping(conn):
+    conn.query('SELECT 1')
+    return True
+
+
+def _is_broken(conn):
+    # Connection lost while querying, or transaction not finished.
+    if conn._ctx.get('disconnected') or conn._ctx.get('transactions'):
+        return True
+
+    _db = conn._ctx.get('db')
+    if _db is None:
+        return True
+
+    # `closed` of psycopg2, `open` of MySQLdb and PyMySQL. Note: `open` is
+    # still true after MySQL server closed the connection, idle connection is
+    # checked with `_ping()` before reusing it.
+    return bool(getattr(_db, 'closed', False)) or not getattr(_db, 'open', True)
+
+
+# Connections shared by all threads of current process.
+_pool = ConnectionPool(connect=_connect,
+                       close=_close,
+                       ping=_ping,
+                       is_broken=_is_broken,
+                       max_size=settings.SQL_POOL_SIZE,
+                       idle_timeout=settings.SQL_POOL_IDLE_TIMEOUT,
+                       check_interval=settings.SQL_POOL_CHECK_INTERVAL,
+                       wait_timeout=settings.SQL_POOL_WAIT_TIMEOUT)
+
+
+class SQLWrap(object):
+    """Get a connection from pool, it's returned to pool when this object is
+    deleted (usually when function which created it returns).
+
+    Connection is not thread-safe, every thread (e.g. worker threads of
+    `mlmmj.run_for_lists()`) must create its own `SQLWrap()`.
+    """
     def __init__(self):
-        # Initial DB connection and cursor.
-        kw = {}
-        if settings.__dict__.get('iredmail_sql_db_use_ssl', False):
-            kw["sslmode"] = "prefer"
+        self.conn = None
 
         try:
-            self.conn = web.database(dbn='postgres',
-                                     host=settings.iredmail_sql_db_server,
-                                     port=int(settings.iredmail_sql_db_port),
-                                     db=settings.iredmail_sql_db_name,
-                                     user=settings.iredmail_sql_db_user,
-                                     pw=settings.iredmail_sql_db_password,
-                                     **kw)
-            self.conn.supports_multiple_insert = True
+            self.conn = _pool.acquire()
         except Exception as e:
             logger.error("SQL error: {0}".format(e))
 
+    def __del__(self):
+        if self.conn is not None:
+            _pool.release(self.conn)
+            self.conn = None
+
 
-if settings.iredmail_sql_db_type == 'mysql':
-    SQLWrap = MYSQLWrap
-elif settings.iredmail_sql_db_type == 'pgsql':
-    SQLWrap = PGSQLWrap
+def get_metrics():
+    """Get metrics of SQL connection pool of current process."""
+    return {'sql_pool': _pool.stats()}
 
 
 def is_domain_exists(domain, conn=None):
     # Return True if account is invalid or exist.
     if not utils.is_domain(domain):
+        backend_cache.skip_caching()
         return True
 
     if not conn:
@@ -130,6 +206,7 @@ def is_domain_exists(domain, conn=None):
     except Exception as e:
         # Return True as exist to not allow to create new domain/account.
         logger.error("SQL error: {0}".format(e))
+        backend_cache.skip_caching()
         return True
 
 
@@ -138,6 +215,7 @@ def is_email_exists(mail, conn=None):
     mail = str(mail).lower()
 
     if not utils.is_email(mail):
+        backend_cache.skip_caching()
         return True
 
     if not conn:
@@ -167,6 +245,7 @@ def is_email_exists(mail, conn=None):
         return False
     except Exception as e:
         logger.error("SQL error: {0}".format(e))
+        backend_cache.skip_caching()
         return True
 
 
@@ -175,6 +254,7 @@ def is_maillist_exists(mail, conn=None):
     mail = str(mail).lower()
 
     if not utils.is_email(mail):
+        backend_cache.skip_caching()
         return True
 
     if not conn:
@@ -194,9 +274,33 @@ def is_maillist_exists(mail, conn=None):
         return False
     except Exception as e:
         logger.error("SQL error: {0}".format(e))
+        backend_cache.skip_caching()
         return True
 
 
+def filter_existing_maillists(mails, conn=None):
+    """Return `(True, [<mail>, ...])` with mailing lists which exist in
+    given mail addresses, checked with one SQL query."""
+    mails = list({str(i).lower() for i in mails if utils.is_email(i)})
+    if not mails:
+        return (True, [])
+
+    if not conn:
+        _wrap = SQLWrap()
+        conn = _wrap.conn
+
+    try:
+        qr = conn.select('maillists',
+                         vars={'mails': mails},
+                         what='address',
+                         where='address IN $mails')
+
+        return (True, list({str(i.address).lower() for i in qr}))
+    except Exception as e:
+        logger.error("SQL error: {0}".format(e))
+        return (False, repr(e))
+
+
 def __generate_mlid():
     """Generate an server-wide unique uuid as mailing list id."""
     return str(uuid.uuid4())
@@ -365,6 +469,7 @@ def add_maillist(mail, form, conn=None):
         'transport': '%s:%s/%s' % (settings.MTA_TRANSPORT_NAME, domain, listname),
         'mlid': __get_new_mlid(conn=conn),
         'maxmsgsize': form_utils.get_max_message_size(form),
+        'created': web.sqlliteral('NOW()'),
     }
 
     if 'only_moderator_can_post' in form:
@@ -451,6 +556,7 @@ def update_maillist(mail, form, conn=None):
 
     params = {
         'name': form.get('name', ''),
+        'modified': web.sqlliteral('NOW()'),
     }
 
     if 'max_message_size' in form:
@@ -517,3 +623,43 @@ def get_existing_maillists(domains=None, conn=None):
         return (True, list(existing_lists))
     except Exception as e:
         return (False, repr(e))
+
+
+def get_maillists_changed_since(since=None, conn=None):
+    """Get mailing lists created or modified since given time.
+
+    :param since: the time returned by previous call. If None, get all
+                  mailing lists.
+    :param conn: sql connection cursor.
+
+    Return `(True, ({<mail>: [<domain>, ...]}, <time>))` with domain of
+    every mailing list, pass returned time as `since` to get mailing lists
+    changed after this call. Note: removed mailing lists can not be detected
+    this way.
+    """
+    if not conn:
+        _wrap = SQLWrap()
+        conn = _wrap.conn
+
+    try:
+        if since:
+            # Use `>=` to not miss mailing lists changed in same second.
+            qr = conn.select('maillists',
+                             vars={'since': since},
+                             what='address, domain, created, modified',
+                             where='created >= $since OR modified >= $since')
+        else:
+            qr = conn.select('maillists', what='address, domain, created, modified')
+
+        lists = {}
+        latest = since
+        for i in qr:
+            lists[str(i.address).lower()] = [str(i.domain).lower()]
+
+            for _time in [i.created, i.modified]:
+                if _time and (latest is None or _time > latest):
+                    latest = _time
+
+        return (True, (lists, latest))
+    except Exception as e:
+        return (False, repr(e))
@@ -17,6 +17,10 @@ def is_maillist_exists(mail, *args, **kw):
     return True
 
 
+def filter_existing_maillists(mails, *args, **kw):
+    return (True, list({str(i).lower() for i in mails if utils.is_email(i)}))
+
+
 def add_maillist(mail, *args, **kw):
     return (True, )
 
@@ -87,3 +91,7 @@ def get_existing_maillists(domains=None, *args, **kw):
     all_lists.sort()
 
     return (True, all_lists)
+
+
+def get_metrics():
+    return {}
@@ -0,0 +1,14 @@
+from controllers.decorators import api_acl
+from libs.utils import api_render
+from libs import jobs
+
+
+class Job(object):
+    @api_acl
+    def GET(self, job_id):
+        """Get status of a background job.
+
+        :param job_id: job id returned by the API which started the job.
+        """
+        qr = jobs.get_job(job_id)
+        return api_render(qr)
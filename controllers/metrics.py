@@ -0,0 +1,24 @@
+import os
+
+from controllers.decorators import api_acl
+from libs.utils import api_render
+from libs import mlmmj, backend_cache
+import settings
+
+# Load mailing list backend.
+backend = backend_cache.load_backend(settings.backend_api)
+
+
+class Metrics(object):
+    @api_acl
+    def GET(self):
+        """Get metrics of current (uwsgi) process.
+
+        NOTE: every process has its own caches, metrics are not aggregated.
+        """
+        metrics = {'pid': os.getpid()}
+        metrics.update(mlmmj.get_metrics())
+        metrics.update(backend.get_metrics())
+        metrics.update(backend_cache.get_metrics())
+
+        return api_render((True, metrics))
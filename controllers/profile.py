@@ -2,17 +2,22 @@ import web
 
 from controllers.decorators import api_acl
 from libs.utils import api_render
-from libs import mlmmj
+from libs import mlmmj, utils, backend_cache
 import settings
 
 # Load mailing list backend.
-backend = __import__(settings.backend_api)
+backend = backend_cache.load_backend(settings.backend_api)
 
 
 class Profile(object):
     @api_acl
     def GET(self, mail):
-        """Get mailing list profiles."""
+        """Get mailing list profiles.
+
+        Response has an `ETag` header, if it's sent back in `If-None-Match`
+        header and no control file was changed, `304 Not Modified` is
+        returned without body.
+        """
         # Make sure mailing list account exists
         if not backend.is_maillist_exists(mail=mail):
             return api_render((False, 'NO_SUCH_ACCOUNT'))
@@ -20,6 +25,9 @@ class Profile(object):
         if not mlmmj.is_maillist_exists(mail):
             return api_render((False, 'NO_SUCH_ACCOUNT'))
 
+        # Return `304 Not Modified` if no control file changed.
+        utils.check_etag(mlmmj.get_profile_signature(mail=mail))
+
         # Get specified profile parameters.
         # If parameters are given, get values of them instead of all profile
         # parameters.
@@ -27,18 +35,8 @@ class Profile(object):
         _web_params = form.get('params', '').lower().strip().replace(' ', '').split(',')
         _web_params = [p for p in _web_params if p in settings.MLMMJ_WEB_PARAMS]
 
-        if _web_params:
-            web_params = _web_params
-        else:
-            web_params = settings.MLMMJ_WEB_PARAMS
-
-        kvs = {}
-        for _param in web_params:
-            qr = mlmmj.get_web_param_value(mail=mail, param=_param)
-            if qr[0]:
-                kvs[_param] = qr[1]['value']
-
-        return api_render((True, kvs))
+        qr = mlmmj.get_web_param_values(mail=mail, params=_web_params)
+        return api_render(qr)
 
     @api_acl
     def POST(self, mail):
@@ -196,3 +194,37 @@ class Moderators(object):
                         return api_render(qr)
 
         return api_render(True)
+
+
+class Profiles(object):
+    @api_acl
+    def GET(self):
+        """Get profiles of multiple mailing lists.
+
+        Available HTTP query parameters:
+
+        `lists`: mailing lists. Multiple mailing lists must be separated by
+                 comma.
+        `params`: profile parameters. Multiple parameters must be separated
+                  by comma. If not present, get all profile parameters.
+
+        Return a dict: {'<mail>': {'<param>': <value>, ...}, ...}.
+        Mailing lists which don't exist are not returned.
+        """
+        form = web.input()
+
+        lists = form.get('lists', '').replace(' ', '').split(',')
+        lists = {str(i).lower() for i in lists if utils.is_email(i)}
+        if not lists:
+            return api_render((True, {}))
+
+        _web_params = form.get('params', '').lower().strip().replace(' ', '').split(',')
+        _web_params = [p for p in _web_params if p in settings.MLMMJ_WEB_PARAMS]
+
+        # Check all mailing lists with one backend query.
+        qr = backend.filter_existing_maillists(mails=lists)
+        if not qr[0]:
+            return api_render(qr)
+
+        qr = mlmmj.get_profiles(lists=qr[1], params=_web_params)
+        return api_render(qr)
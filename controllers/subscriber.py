@@ -2,11 +2,11 @@ import web
 
 from controllers.decorators import api_acl
 from libs.utils import api_render
-from libs import mlmmj, utils
+from libs import mlmmj, utils, jobs, backend_cache
 import settings
 
 # Load mailing list backend.
-backend = __import__(settings.backend_api)
+backend = backend_cache.load_backend(settings.backend_api)
 
 
 class Subscribers(object):
@@ -25,11 +25,51 @@ class Subscribers(object):
                        {'<subscription1>': [<mail>, <mail>, ...],
                         '<subscription2>': [<mail>, <mail>, ...],
                         '<subscription3>': [<mail>, <mail>, ...]}
+        `limit`: if present, return at most `limit` subscribers sorted by
+                 mail address, and the cursor of next page in `_next`.
+        `after`: return subscribers after given address. Used with `limit`,
+                 it's the `_next` cursor returned by previous page.
+        `format`: if set to `ndjson`, stream subscribers as newline delimited
+                  JSON (one subscriber per line, not sorted).
+
+        Response has an `ETag` header, if it's sent back in `If-None-Match`
+        header and subscribers were not changed, `304 Not Modified` is
+        returned without body.
         """
+        if mlmmj.is_maillist_exists(mail):
+            utils.check_etag(mlmmj.get_subscribers_signature(mail=mail, with_administrators=False))
+
         # Get extra parameters.
         form = web.input()
         email_only = ('email_only' in form)
 
+        if form.get('format') == 'ndjson':
+            if email_only:
+                rows = (i[0] for i in mlmmj.iter_subscribers(mail=mail))
+            else:
+                rows = ({'mail': i[0], 'subscription': i[1]} for i in mlmmj.iter_subscribers(mail=mail))
+
+            return utils.api_render_ndjson(rows)
+
+        if 'limit' in form or 'after' in form:
+            try:
+                limit = int(form.get('limit', 100))
+            except ValueError:
+                return api_render((False, 'INVALID_LIMIT'))
+
+            if limit <= 0:
+                return api_render((False, 'INVALID_LIMIT'))
+
+            qr = mlmmj.get_subscribers_page(mail=mail,
+                                            after=form.get('after'),
+                                            limit=limit,
+                                            email_only=email_only)
+            if not qr[0]:
+                return api_render(qr)
+
+            (subscribers, _next) = qr[1]
+            return api_render({'_success': True, '_data': subscribers, '_next': _next})
+
         qr = mlmmj.get_subscribers(mail=mail, email_only=email_only)
         return api_render(qr)
 
@@ -45,43 +85,241 @@ class Subscribers(object):
         `subscribers`: subscribers' email addresses.
                        Multiple subscribers must be separated by comma.
         `subscription`: subscription version. either `normal`, `digest` or `nomail`.
+        `async`: [yes|no]. If set to `yes`, add, move and remove subscribers
+                 (in this order, same as synchronous request) in a background
+                 job and return the job id immediately in `_data.job_id`.
+                 Job status can be queried with `GET /api/jobs/<id>`, status
+                 of each added subscriber is reported in `items`.
+        `move_subscribers`: existing subscribers' email addresses, they will
+                            be moved to subscription version given in
+                            `subscription` (from other subscription versions).
+                            Multiple subscribers must be separated by comma.
+                            Number of moved subscribers is returned in
+                            `_data.moved`.
         """
         form = web.input()
 
-        if 'add_subscribers' in form:
-            subscribers = form.get('add_subscribers', '').replace(' ', '').split(',')
-            subscribers = [str(i).lower() for i in subscribers if utils.is_email(i)]
+        subscription = form.get('subscription', 'normal')
+        if subscription not in mlmmj.subscription_versions:
+            if 'move_subscribers' in form:
+                return api_render((False, 'INVALID_SUBSCRIPTION'))
 
-            require_confirm = False
-            if form.get('require_confirm') == 'yes':
-                require_confirm = True
+            subscription = 'normal'
 
-            subscription = form.get('subscription', 'normal')
-            if subscription not in ['normal', 'digest', 'nomail']:
-                subscription = 'normal'
+        kw = {'mail': mail,
+              'subscription': subscription,
+              'require_confirm': (form.get('require_confirm') == 'yes')}
 
-            qr = mlmmj.add_subscribers(mail=mail,
-                                       subscribers=subscribers,
-                                       subscription=subscription,
-                                       require_confirm=require_confirm)
+        if 'add_subscribers' in form:
+            subscribers = form.get('add_subscribers', '').replace(' ', '').split(',')
+            kw['add'] = [str(i).lower() for i in subscribers if utils.is_email(i)]
 
-            if not qr[0]:
-                return api_render(qr)
+        if 'move_subscribers' in form:
+            kw['move'] = form.get('move_subscribers', '').replace(' ', '').split(',')
 
         if 'remove_subscribers' in form:
             if form.get('remove_subscribers') == 'ALL':
-                qr = mlmmj.remove_all_subscribers(mail=mail)
+                kw['remove'] = 'ALL'
             else:
                 subscribers = form.get('remove_subscribers', '').replace(' ', '').split(',')
-                subscribers = [str(i).lower() for i in subscribers if utils.is_email(i)]
+                kw['remove'] = [str(i).lower() for i in subscribers if utils.is_email(i)]
 
-                qr = mlmmj.remove_subscribers(mail=mail, subscribers=subscribers)
+        # All operations run in same job, in same order as synchronous request.
+        if form.get('async') == 'yes':
+            qr = jobs.start_job(name='update_subscribers',
+                                func=mlmmj.update_subscribers,
+                                **kw)
 
             if not qr[0]:
                 return api_render(qr)
 
+            return api_render((True, {'job_id': qr[1]}))
+
+        qr = mlmmj.update_subscribers(**kw)
+        if not qr[0] or qr[1]:
+            return api_render(qr)
+
         return api_render(True)
 
+    @api_acl
+    def PUT(self, mail):
+        """
+        Replace subscribers of given subscription versions with the given
+        ones. Only changed subscribers are added or removed.
+
+        :param mail: email address of the mailing list account
+
+        Available form parameters:
+
+        `normal`, `digest`, `nomail`: subscribers' email addresses of the
+                subscription version. Multiple subscribers must be separated
+                by comma. Subscription version not given is not changed
+                (except that given subscribers are removed from it), empty
+                value removes all subscribers of it.
+
+        Return numbers of added and removed subscribers of each given
+        subscription version (and subscription versions which given
+        subscribers were removed from):
+        {'<subscription>': {'added': <number>, 'removed': <number>}, ...}
+        """
+        mail = str(mail).lower()
+        form = web.input()
+
+        if not mlmmj.is_maillist_exists(mail):
+            return api_render((False, 'NO_SUCH_ACCOUNT'))
+
+        subscribers = {}
+        for subscription in mlmmj.subscription_versions:
+            if subscription in form:
+                subscribers[subscription] = [i for i in form.get(subscription, '').replace(' ', '').split(',') if i]
+
+        if not subscribers:
+            return api_render((False, 'NO_SUBSCRIPTION_GIVEN'))
+
+        qr = mlmmj.sync_subscribers(mail=mail, subscribers=subscribers)
+        return api_render(qr)
+
+
+class ImportSubscribers(object):
+    @api_acl
+    def POST(self, mail):
+        """
+        Import (a large number of) subscribers without confirm. Subscribers'
+        addresses are sent as HTTP request body, one address per line, or in
+        CSV format (only first column is used).
+
+        curl -X POST --data-binary @subscribers.csv https://<server>/api/<mail>/subscribers/import?subscription=normal
+
+        :param mail: email address of the mailing list account
+
+        Available HTTP query parameters:
+
+        `subscription`: subscription version. either `normal`, `digest` or `nomail`.
+
+        Return a dict of numbers of added, duplicate and invalid subscribers:
+        {'added': <number>, 'duplicate': <number>, 'invalid': <number>}
+        """
+        mail = str(mail).lower()
+
+        if not mlmmj.is_maillist_exists(mail):
+            return api_render((False, 'NO_SUCH_ACCOUNT'))
+
+        # Don't parse request body.
+        form = web.input(_method='get')
+
+        subscription = form.get('subscription', 'normal')
+        if subscription not in mlmmj.subscription_versions:
+            subscription = 'normal'
+
+        qr = mlmmj.import_subscribers(mail=mail,
+                                      lines=utils.iter_request_body_lines(),
+                                      subscription=subscription)
+        return api_render(qr)
+
+
+class SubscribersCount(object):
+    @api_acl
+    def GET(self, mail):
+        """Get number of subscribers of each subscription version.
+
+        :param mail: email address of the mailing list account
+        """
+        mail = str(mail).lower()
+
+        if not mlmmj.is_maillist_exists(mail):
+            return api_render((False, 'NO_SUCH_ACCOUNT'))
+
+        qr = mlmmj.count_subscribers(mail=mail)
+        return api_render(qr)
+
+
+class PendingSubscribers(object):
+    @api_acl
+    def GET(self, mail):
+        """Get subscribers who were sent subscription confirm but didn't
+        confirm yet.
+
+        :param mail: email address of the mailing list account
+        """
+        mail = str(mail).lower()
+
+        if not mlmmj.is_maillist_exists(mail):
+            return api_render((False, 'NO_SUCH_ACCOUNT'))
+
+        qr = mlmmj.get_pending_subscribers(mail=mail)
+        return api_render(qr)
+
+    @api_acl
+    def DELETE(self, mail):
+        """Remove pending subscribers, they can not confirm the subscription
+        anymore.
+
+        :param mail: email address of the mailing list account
+
+        Available HTTP query parameters:
+
+        `subscribers`: subscribers' email addresses. Multiple subscribers
+                       must be separated by comma. Set to `ALL` to remove all
+                       pending subscribers.
+        """
+        mail = str(mail).lower()
+        form = web.input()
+
+        if not mlmmj.is_maillist_exists(mail):
+            return api_render((False, 'NO_SUCH_ACCOUNT'))
+
+        if form.get('subscribers') == 'ALL':
+            qr = mlmmj.remove_pending_subscribers(mail=mail)
+        else:
+            subscribers = form.get('subscribers', '').replace(' ', '').split(',')
+            subscribers = [str(i).lower() for i in subscribers if utils.is_email(i)]
+
+            qr = mlmmj.remove_pending_subscribers(mail=mail, subscribers=subscribers)
+
+        return api_render(qr)
+
+
+class MaillistsSubscribersCount(object):
+    @api_acl
+    def GET(self):
+        """Get number of subscribers of each subscription version of
+        multiple mailing lists.
+
+        Available HTTP query parameters:
+
+        `lists`: mailing lists. Multiple mailing lists must be separated by
+                 comma.
+        `domains`: count all mailing lists under given domains. Multiple
+                   domains must be separated by comma. Ignored if `lists` is
+                   present.
+
+        If neither `lists` nor `domains` is present, count all mailing lists.
+
+        Return a dict: {'<mail>': {'<subscription>': <number>, ...}, ...}
+        """
+        form = web.input()
+
+        if 'lists' in form:
+            lists = form.get('lists', '').replace(' ', '').split(',')
+            lists = {str(i).lower() for i in lists if utils.is_email(i)}
+        else:
+            domains = None
+            if 'domains' in form:
+                domains = form.get('domains', '').replace(' ', '').split(',')
+                domains = [str(i).lower() for i in domains if utils.is_domain(i)]
+
+                if not domains:
+                    return api_render((True, {}))
+
+            qr = backend.get_existing_maillists(domains=domains)
+            if not qr[0]:
+                return api_render(qr)
+
+            lists = qr[1]
+
+        qr = mlmmj.count_subscribers_of_lists(lists=lists)
+        return api_render(qr)
+
 
 class HasSubscriber(object):
     @api_acl
@@ -97,6 +335,67 @@ class HasSubscriber(object):
         return api_render(qr)
 
 
+class HasSubscribers(object):
+    @api_acl
+    def POST(self, mail):
+        """Check whether given subscribers are members of given mailing list.
+
+        :param mail: email address of the mailing list account
+
+        Available form parameters:
+
+        `subscribers`: subscribers' email addresses. Multiple subscribers
+                       must be separated by comma.
+
+        Return a dict of subscribers and their subscription versions, or
+        null if not a member:
+        {'<subscriber>': '<subscription>', '<subscriber2>': null, ...}
+        """
+        mail = str(mail).lower()
+        form = web.input()
+
+        if not mlmmj.is_maillist_exists(mail):
+            return api_render((False, 'NO_SUCH_ACCOUNT'))
+
+        subscribers = form.get('subscribers', '').replace(' ', '').split(',')
+        subscribers = [str(i).lower() for i in subscribers if utils.is_email(i)]
+
+        qr = mlmmj.has_subscribers(mail=mail, subscribers=subscribers)
+        return api_render(qr)
+
+
+class Subscriber(object):
+    @api_acl
+    def DELETE(self, subscriber):
+        """Remove subscriber from all mailing lists.
+
+        :param subscriber: subscriber's email address.
+
+        Return mailing lists which the subscriber was removed from:
+        [{'mail': '<mail>', 'subscription': '<subscription>'}, ...]
+        """
+        subscriber = str(subscriber).lower()
+
+        qr = backend.get_existing_maillists()
+        if not qr[0]:
+            return api_render(qr)
+
+        lists = qr[1]
+
+        # Query subscriber index first, fall back to check all existing
+        # mailing lists if index is not available. Subscription of every
+        # mailing list found in index is checked again before removing.
+        #
+        # Subscriptions handled by mlmmj (e.g. subscribed via email) are
+        # indexed by `tools/update_subscriber_index.py` (cron job).
+        qr = mlmmj.get_subscribed_lists(subscriber=subscriber)
+        if qr[0]:
+            lists = sorted({i['mail'] for i in qr[1]} & set(lists))
+
+        qr = mlmmj.remove_subscriber_from_lists(subscriber=subscriber, lists=lists)
+        return api_render(qr)
+
+
 class SubscribedLists(object):
     @api_acl
     def GET(self, subscriber):
@@ -120,11 +419,31 @@ class SubscribedLists(object):
         if form.get('email_only') == 'yes':
             email_only = True
 
-        # Get mail addresses of existing accounts
         if form.get('query_all_lists') == 'yes':
-            qr = backend.get_existing_maillists(domains=None)
+            domains = None
         else:
-            qr = backend.get_existing_maillists(domains=[domain])
+            domains = [domain]
+
+        # Query subscriber index first, fall back to check all existing
+        # mailing lists if index is not available.
+        qr = mlmmj.get_subscribed_lists(subscriber=subscriber, domains=domains)
+        if qr[0]:
+            subscribed_lists = []
+            for i in qr[1]:
+                if not backend.is_maillist_exists(mail=i['mail']):
+                    continue
+
+                if email_only:
+                    # Subscriber may be in multiple subscription versions.
+                    if i['mail'] not in subscribed_lists:
+                        subscribed_lists.append(i['mail'])
+                else:
+                    subscribed_lists.append(i)
+
+            return api_render((True, subscribed_lists))
+
+        # Get mail addresses of existing accounts
+        qr = backend.get_existing_maillists(domains=domains)
 
         if not qr[0]:
             return api_render(qr)
@@ -134,11 +453,12 @@ class SubscribedLists(object):
             return api_render((True, []))
 
         subscribed_lists = []
-        for i in existing_lists:
-            qr = mlmmj.has_subscriber(mail=i,
-                                      subscriber=subscriber,
-                                      subscription=None)
-            if qr:
+        _results = mlmmj.run_for_lists(mlmmj.has_subscriber,
+                                       lists=existing_lists,
+                                       subscriber=subscriber,
+                                       subscription=None)
+        for (i, qr) in _results:
+            if qr and qr[0]:
                 if email_only:
                     subscribed_lists.append(i)
                 else:
@@ -147,6 +467,52 @@ class SubscribedLists(object):
         return api_render((True, list(subscribed_lists)))
 
 
+class AdministeredLists(object):
+    @api_acl
+    def GET(self, subscriber):
+        """Get mailing lists which the given address is owner or moderator of.
+
+        :param subscriber: email address of owner/moderator.
+
+        HTTP form parameters:
+
+        `email_only`: if set to `yes`, return list of email addresses of mailing lists.
+        `query_all_lists`: If set to 'yes', will check all available mailing
+                           lists on server. If 'no', check only lists under same
+                           domain.
+        """
+        subscriber = str(subscriber).lower()
+        domain = subscriber.split('@', 1)[-1]
+
+        form = web.input()
+
+        if form.get('query_all_lists') == 'yes':
+            domains = None
+        else:
+            domains = [domain]
+
+        # Query index first, fall back to check all existing mailing lists if
+        # index is not available.
+        qr = mlmmj.get_administered_lists(address=subscriber, domains=domains)
+        if qr[0]:
+            administered = [i for i in qr[1] if backend.is_maillist_exists(mail=i['mail'])]
+        else:
+            qr = backend.get_existing_maillists(domains=domains)
+            if not qr[0]:
+                return api_render(qr)
+
+            qr = mlmmj.find_administered_lists(address=subscriber, lists=qr[1])
+            if not qr[0]:
+                return api_render(qr)
+
+            administered = qr[1]
+
+        if form.get('email_only') == 'yes':
+            administered = sorted({i['mail'] for i in administered})
+
+        return api_render((True, administered))
+
+
 class Subscribe(object):
     @api_acl
     def POST(self, subscriber):
@@ -186,3 +552,28 @@ class Subscribe(object):
                                       require_confirm=require_confirm)
 
         return api_render(qr)
+
+
+class DomainSubscribers(object):
+    @api_acl
+    def DELETE(self, domain):
+        """Remove all subscribers under given domain from all mailing lists,
+        in a background job.
+
+        :param domain: domain name of subscribers.
+
+        Return job id in `_data.job_id`, job status can be queried with
+        `GET /api/jobs/<id>`.
+        """
+        domain = str(domain).lower()
+
+        if not utils.is_domain(domain):
+            return api_render((False, 'INVALID_DOMAIN'))
+
+        qr = jobs.start_job(name='remove_domain_subscribers',
+                            func=mlmmj.remove_domain_subscribers,
+                            domain=domain)
+        if not qr[0]:
+            return api_render(qr)
+
+        return api_render((True, {'job_id': qr[1]}))
@@ -1,10 +1,23 @@
 # URL mappings
-from libs.regxes import email as e
+from libs.regxes import email as e, domain as d
 
 urls = [
+    # Metrics of current process.
+    '/api/metrics', 'controllers.metrics.Metrics',
+
+    # Status of background job.
+    '/api/jobs/([0-9a-f]{32})', 'controllers.job.Job',
+
+    # Subscriber. Must be placed before profile, email address may contain
+    # `/` and match `/api/<mail>`.
+    '/api/subscriber/(%s)$' % e, 'controllers.subscriber.Subscriber',
+
     # Profile
     '/api/(%s)$' % e, 'controllers.profile.Profile',
 
+    # Profiles of multiple mailing lists.
+    '/api/profiles', 'controllers.profile.Profiles',
+
     # Owners.
     '/api/(%s)/owners' % e, 'controllers.profile.Owners',
 
@@ -17,14 +30,40 @@ urls = [
     # Get subscribers.
     '/api/(%s)/subscribers' % e, 'controllers.subscriber.Subscribers',
 
+    # Get number of subscribers.
+    '/api/(%s)/subscribers/count' % e, 'controllers.subscriber.SubscribersCount',
+
+    # Import subscribers.
+    '/api/(%s)/subscribers/import' % e, 'controllers.subscriber.ImportSubscribers',
+
+    # Get or remove subscribers who didn't confirm subscription yet.
+    '/api/(%s)/pending_subscribers' % e, 'controllers.subscriber.PendingSubscribers',
+
     # Check whether given subscriber is member of given mailing list.
     '/api/(%s)/has_subscriber/(%s)' % (e, e), 'controllers.subscriber.HasSubscriber',
 
+    # Check whether given subscribers are members of given mailing list.
+    '/api/(%s)/has_subscribers' % e, 'controllers.subscriber.HasSubscribers',
+
     #
     # per-subscriber
     #
     # Get all subscribed mailing lists of given subscriber.
     '/api/subscriber/(%s)/subscribed' % e, 'controllers.subscriber.SubscribedLists',
+    # Get all mailing lists which given address is owner or moderator of.
+    '/api/subscriber/(%s)/administered' % e, 'controllers.subscriber.AdministeredLists',
     # Subscribe one subscriber to multiple mailing lists.
     '/api/subscriber/(%s)/subscribe' % e, 'controllers.subscriber.Subscribe',
+
+    #
+    # multiple mailing lists
+    #
+    # Get number of subscribers of multiple mailing lists.
+    '/api/subscribers/count', 'controllers.subscriber.MaillistsSubscribersCount',
+
+    #
+    # per-domain
+    #
+    # Remove all subscribers under given domain from all mailing lists.
+    '/api/domain/(%s)/subscribers' % d, 'controllers.subscriber.DomainSubscribers',
 ]
@@ -0,0 +1,362 @@
+# Cache results of existence checks of (SQL/LDAP) backend.
+#
+# `is_domain_exists()`, `is_email_exists()` and `is_maillist_exists()` of
+# backend module are replaced by cached versions, so that calls inside the
+# backend module (e.g. `add_maillist()` checks whether domain exists) are
+# cached too. Cached results of a mailing list are removed when it's created,
+# updated or removed through this backend module. Results of invalid accounts
+# and failed lookups (which are reported as existing) are not cached, backend
+# calls `skip_caching()` for them.
+#
+# If backend supports `get_maillists_changed_since()`, all existing mailing
+# lists are loaded in memory once, then refreshed in a background thread with
+# mailing lists changed since last refresh (plus a query of mail addresses of
+# all mailing lists, to find mailing lists created or removed by other
+# programs), `get_existing_maillists()` returns mailing lists stored in
+# memory.
+#
+# NOTE: uwsgi runs mlmmjadmin with multiple processes, every process has its
+# own cache, changes made by other processes (or command line tools) are
+# visible after cached results expired. That's why not existing result is not
+# cached by default (`BACKEND_CACHE_NEGATIVE_TTL = 0`).
+
+import time
+import functools
+import threading
+
+from libs import cache, utils
+from libs.logger import logger
+import settings
+
+# Key is tuple `(<function name>, <argument>)`, value is tuple
+# `(<expire time>, <result>)`.
+__results_cache = cache.LRUCache(maxsize=settings.BACKEND_CACHE_SIZE)
+
+# Functions which results are cached, and name of the checked argument.
+__cached_functions = {
+    'is_domain_exists': 'domain',
+    'is_email_exists': 'mail',
+    'is_maillist_exists': 'mail',
+}
+
+# Functions which change given mailing list.
+__updating_functions = ['add_maillist', 'update_maillist', 'remove_maillist']
+
+# Registry of existing mailing lists, created if backend supports it.
+__registry = None
+
+# `skip` is set (by `skip_caching()`) if result of the backend function called
+# in current thread must not be cached.
+__local = threading.local()
+
+
+class MaillistRegistry(object):
+    """Existing mailing lists stored in memory.
+
+    :param get_changed: function `get_maillists_changed_since()` of backend.
+    :param refresh_interval: seconds between refreshes with changed mailing
+                             lists.
+    :param reload_interval: seconds between reloading all mailing lists (with
+                            domains of them).
+    :param get_all: function `get_existing_maillists()` of backend. If given,
+                    mail addresses of all mailing lists are queried in every
+                    refresh too, mailing lists removed by other processes are
+                    removed, and mailing lists created without changing the
+                    time used by `get_changed` (e.g. by other programs) are
+                    added.
+    """
+    def __init__(self, get_changed, refresh_interval, reload_interval, get_all=None):
+        self._get_changed = get_changed
+        self._get_all = get_all
+        self.refresh_interval = refresh_interval
+        self.reload_interval = reload_interval
+
+        # Mailing lists grouped by domain (and alias domains):
+        # {<domain>: {<mail>, ...}}
+        self._domains = {}
+
+        # Domains of every mailing list (including alias domains):
+        # {<mail>: {<domain>, ...}}
+        self._lists = {}
+
+        # Returned by `get_changed()`, used in next refresh.
+        self._since = None
+
+        self._loaded = 0
+        self._refreshed = 0
+
+        self._lock = threading.Lock()
+
+        # Held while loading mailing lists from backend, so that only one
+        # thread queries backend at the same time.
+        self._load_lock = threading.RLock()
+        self._thread = None
+
+        self._stats = {'reloads': 0, 'refreshes': 0, 'errors': 0}
+
+    def __discard_domain(self, domain, mail):
+        if domain in self._domains:
+            self._domains[domain].discard(mail)
+
+            if not self._domains[domain]:
+                del self._domains[domain]
+
+    def __set(self, mail, domains):
+        """Set domains of mailing list, must be called with lock held."""
+        domains = set(domains) | {mail.split('@', 1)[-1]}
+
+        for d in self._lists.get(mail, set()) - domains:
+            self.__discard_domain(d, mail)
+
+        for d in domains:
+            self._domains.setdefault(d, set()).add(mail)
+
+        self._lists[mail] = domains
+
+    def add(self, mail):
+        with self._lock:
+            self.__set(mail, self._lists.get(mail, set()))
+
+    def discard(self, mail):
+        with self._lock:
+            for d in self._lists.pop(mail, set()):
+                self.__discard_domain(d, mail)
+
+    def load(self, full=False):
+        """Load all mailing lists, or mailing lists changed since last load."""
+        with self._load_lock:
+            qr = self._get_changed(since=None if full else self._since)
+            if not qr[0]:
+                with self._lock:
+                    self._stats['errors'] += 1
+
+                return qr
+
+            (_lists, _since) = qr[1]
+
+            _all = None
+            if self._get_all and not full:
+                qr = self._get_all()
+                if not qr[0]:
+                    with self._lock:
+                        self._stats['errors'] += 1
+
+                    return qr
+
+                _all = {str(i).lower() for i in qr[1]}
+
+            _now = time.time()
+
+            with self._lock:
+                if full:
+                    # Replace all mailing lists.
+                    self._domains = {}
+                    self._lists = {}
+                    self._loaded = _now
+                    self._stats['reloads'] += 1
+                else:
+                    self._stats['refreshes'] += 1
+
+                for (mail, _domains) in _lists.items():
+                    self.__set(mail, _domains)
+
+                if _all is not None:
+                    for mail in set(self._lists) - _all:
+                        for d in self._lists.pop(mail):
+                            self.__discard_domain(d, mail)
+
+                    for mail in _all - set(self._lists):
+                        self.__set(mail, set())
+
+                self._since = _since
+                self._refreshed = _now
+
+        return (True, )
+
+    def __run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+
+            try:
+                qr = self.load(full=(time.time() - self._loaded >= self.reload_interval))
+                if not qr[0]:
+                    logger.error("Failed to refresh existing mailing lists: {0}".format(qr[1]))
+            except Exception as e:
+                logger.error("Failed to refresh existing mailing lists: {0}".format(repr(e)))
+
+    def get(self, domains=None):
+        """Get existing mailing lists (under given domains).
+
+        Return `(True, [<mail>, ...])`.
+        """
+        if not self._loaded:
+            with self._load_lock:
+                # Loaded while waiting for the lock.
+                if not self._loaded:
+                    qr = self.load(full=True)
+                    if not qr[0]:
+                        return qr
+
+                    # Started in (forked) uwsgi process which uses it.
+                    self._thread = threading.Thread(target=self.__run, daemon=True)
+                    self._thread.start()
+
+        with self._lock:
+            if domains:
+                lists = set()
+                for d in domains:
+                    lists.update(self._domains.get(d, set()))
+            else:
+                lists = set(self._lists)
+
+        return (True, sorted(lists))
+
+    def stats(self):
+        with self._lock:
+            _stats = dict(self._stats)
+            _stats['domains'] = len(self._domains)
+            _stats['lists'] = len(self._lists)
+
+            if self._refreshed:
+                _stats['age'] = int(time.time() - self._refreshed)
+
+        return _stats
+
+
+def __get_arg(name, args, kwargs):
+    if name in kwargs:
+        return str(kwargs[name]).lower()
+    elif args:
+        return str(args[0]).lower()
+
+    return None
+
+
+def __cached(func, arg_name):
+    @functools.wraps(func)
+    def _func(*args, **kwargs):
+        _key = (func.__name__, __get_arg(arg_name, args, kwargs))
+        _now = time.time()
+
+        _cached = __results_cache.get(_key, validate=lambda v: v[0] > _now)
+        if _cached:
+            return _cached[1]
+
+        _skip = getattr(__local, 'skip', False)
+        __local.skip = False
+
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            _failed = __local.skip
+
+            # Result of outer cached function may depend on this one.
+            __local.skip = _skip or _failed
+
+        if _failed:
+            return result
+
+        if result:
+            _ttl = settings.BACKEND_CACHE_TTL
+        else:
+            _ttl = settings.BACKEND_CACHE_NEGATIVE_TTL
+
+        if _ttl > 0:
+            __results_cache.set(_key, (_now + _ttl, result))
+
+        return result
+
+    return _func
+
+
+def __invalidating(func):
+    @functools.wraps(func)
+    def _func(*args, **kwargs):
+        mail = __get_arg('mail', args, kwargs)
+
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            invalidate(mail=mail)
+
+        if __registry and result[0]:
+            if func.__name__ == 'add_maillist':
+                __registry.add(mail)
+            elif func.__name__ == 'remove_maillist':
+                __registry.discard(mail)
+
+        return result
+
+    return _func
+
+
+def __registered(func):
+    @functools.wraps(func)
+    def _func(domains=None, conn=None):
+        if conn:
+            return func(domains=domains, conn=conn)
+
+        if domains:
+            domains = [str(d).lower() for d in domains if utils.is_domain(d)]
+
+        return __registry.get(domains=domains)
+
+    return _func
+
+
+def skip_caching():
+    """Don't cache result of the backend function being called in current
+    thread. Used by backend if result is not a real lookup result, e.g.
+    account is invalid, or error while querying backend."""
+    __local.skip = True
+
+
+def invalidate(mail):
+    """Remove cached results of given mail address."""
+    for (_name, _arg_name) in __cached_functions.items():
+        if _arg_name == 'mail':
+            __results_cache.pop((_name, mail))
+
+
+def load_backend(name):
+    """Import backend module and replace its functions with cached versions.
+
+    Module is imported (and modified) only once in one process, same module
+    object is returned for every call.
+    """
+    global __registry
+
+    backend = __import__(name)
+
+    if getattr(backend, '_results_cached', False):
+        return backend
+
+    if settings.BACKEND_MAILLISTS_REFRESH_INTERVAL > 0 and hasattr(backend, 'get_maillists_changed_since'):
+        __registry = MaillistRegistry(get_changed=backend.get_maillists_changed_since,
+                                      refresh_interval=settings.BACKEND_MAILLISTS_REFRESH_INTERVAL,
+                                      reload_interval=settings.BACKEND_MAILLISTS_RELOAD_INTERVAL,
+                                      get_all=backend.get_existing_maillists)
+
+        backend.get_existing_maillists = __registered(backend.get_existing_maillists)
+
+    for (_name, _arg_name) in __cached_functions.items():
+        if hasattr(backend, _name):
+            setattr(backend, _name, __cached(getattr(backend, _name), _arg_name))
+
+    for _name in __updating_functions:
+        if hasattr(backend, _name):
+            setattr(backend, _name, __invalidating(getattr(backend, _name)))
+
+    backend._results_cached = True
+
+    return backend
+
+
+def get_metrics():
+    """Get metrics of cache of backend results."""
+    metrics = {'backend_cache': __results_cache.stats()}
+
+    if __registry:
+        metrics['maillist_registry'] = __registry.stats()
+
+    return metrics
@@ -0,0 +1,167 @@
+# Bloom filter stored on disk.
+#
+# Used to answer "is this address a subscriber?" without reading subscriber
+# files: if filter says no, it's definitely not a subscriber; if filter says
+# yes, subscriber file must be checked (it may be a false positive).
+#
+# File format:
+#
+#   MLBF1 <length of header>\n
+#   <header in JSON>
+#   <bit array>
+#
+# Filter can be queried with header loaded only, bits are read with
+# `os.pread()`, so that filter of large mailing list is not loaded in memory
+# for every query.
+
+import os
+import math
+import json
+import hashlib
+import tempfile
+
+_magic = b'MLBF1'
+
+
+def _get_signature(fd):
+    _st = os.fstat(fd)
+    return [_st.st_ino, _st.st_size, _st.st_mtime_ns]
+
+
+class BloomFilter(object):
+    """Bloom filter.
+
+    :param m: number of bits.
+    :param k: number of hash functions.
+    :param bits: bit array (bytearray). If None, bits are read from file
+                 `path` on demand.
+    :param bits_set: number of bits set to 1, used to estimate false positive
+                     rate.
+    :param meta: a dict of extra data stored in file header.
+    :param signature: signature (inode number, size, modification time) of
+                      the file loaded from or saved to. File is never
+                      modified in place, a different signature means it's
+                      not the same filter anymore.
+    """
+    def __init__(self, m, k, bits=None, bits_set=0, meta=None, path=None, offset=0, signature=None):
+        self.m = m
+        self.k = k
+        self.bits = bits
+        self.bits_set = bits_set
+        self.meta = meta or {}
+        self.path = path
+        self.offset = offset
+        self.signature = signature
+
+    @classmethod
+    def for_capacity(cls, capacity, fp_rate):
+        """Create an empty filter for given number of items and false
+        positive rate."""
+        capacity = max(capacity, 1)
+        m = math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))
+        m = max(1024, (m + 7) // 8 * 8)
+        k = max(1, round(m / capacity * math.log(2)))
+
+        return cls(m=m, k=k, bits=bytearray(m // 8))
+
+    def _positions(self, item):
+        _digest = hashlib.blake2b(item.encode('utf-8', errors='replace'), digest_size=16).digest()
+        h1 = int.from_bytes(_digest[:8], 'little')
+        h2 = int.from_bytes(_digest[8:], 'little') | 1
+
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            (_byte, _bit) = divmod(pos, 8)
+            if not self.bits[_byte] & (1 << _bit):
+                self.bits[_byte] |= (1 << _bit)
+                self.bits_set += 1
+
+    def __contains__(self, item):
+        if self.bits is not None:
+            for pos in self._positions(item):
+                (_byte, _bit) = divmod(pos, 8)
+                if not self.bits[_byte] & (1 << _bit):
+                    return False
+
+            return True
+
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            if _get_signature(fd) != self.signature:
+                raise ValueError('Bloom filter file was replaced: {0}'.format(self.path))
+
+            for pos in self._positions(item):
+                (_byte, _bit) = divmod(pos, 8)
+                _b = os.pread(fd, 1, self.offset + _byte)
+                if not _b or not _b[0] & (1 << _bit):
+                    return False
+        finally:
+            os.close(fd)
+
+        return True
+
+    def estimated_fp_rate(self):
+        """Estimate false positive rate with the fraction of bits set."""
+        return (self.bits_set / self.m) ** self.k
+
+    def load_bits(self):
+        """Load bits of filter loaded with header only."""
+        if self.bits is None:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                self.bits = bytearray(f.read(self.m // 8))
+
+    @classmethod
+    def load(cls, path, header_only=True):
+        with open(path, 'rb') as f:
+            signature = _get_signature(f.fileno())
+            _line = f.readline()
+            (_m, _length) = _line.split()
+            if _m != _magic:
+                raise ValueError('Invalid bloom filter file: {0}'.format(path))
+
+            header = json.loads(f.read(int(_length)))
+            offset = len(_line) + int(_length)
+
+            bits = None
+            if not header_only:
+                bits = bytearray(f.read(header['m'] // 8))
+
+        return cls(m=header['m'],
+                   k=header['k'],
+                   bits=bits,
+                   bits_set=header['bits_set'],
+                   meta=header['meta'],
+                   path=path,
+                   offset=offset,
+                   signature=signature)
+
+    def save(self, path):
+        """Write filter to a temporary file then rename it, readers never see
+        a partially written file."""
+        header = json.dumps({'m': self.m,
+                             'k': self.k,
+                             'bits_set': self.bits_set,
+                             'meta': self.meta}).encode()
+
+        (_fd, _tmp) = tempfile.mkstemp(prefix=os.path.basename(path) + '.tmp.', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(_fd, 'wb') as f:
+                f.write(_magic + b' ' + str(len(header)).encode() + b'\n')
+                f.write(header)
+                f.write(self.bits)
+                f.flush()
+                signature = _get_signature(f.fileno())
+
+            os.replace(_tmp, path)
+        except Exception:
+            if os.path.exists(_tmp):
+                os.remove(_tmp)
+
+            raise
+
+        self.path = path
+        self.signature = signature
+        self.offset = len(_magic) + len(str(len(header))) + 2 + len(header)
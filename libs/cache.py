@@ -0,0 +1,90 @@
+# In-process caches.
+#
+# NOTE: uwsgi runs mlmmjadmin with multiple processes, every process has its
+# own cache, so cached data must be validated (e.g. with file modification
+# time) or expired in short time.
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """Thread-safe LRU cache with bounded size.
+
+    :param maxsize: max size of all cached values. By default, size of each
+                    cached value is 1, so it's the max number of cached values.
+    :param weigh: a function used to get size of a cached value.
+    """
+    def __init__(self, maxsize, weigh=None):
+        self.maxsize = maxsize
+        self.weigh = weigh or (lambda v: 1)
+
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, validate=None):
+        """Get cached value.
+
+        :param validate: a function used to validate cached value, invalid
+                         value is removed from cache and treated as a miss.
+        """
+        with self._lock:
+            try:
+                (value, _size) = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if validate and not validate(value):
+                del self._data[key]
+                self.size -= _size
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        _size = self.weigh(value)
+
+        with self._lock:
+            if key in self._data:
+                self.size -= self._data.pop(key)[1]
+
+            # Don't cache value larger than the whole cache.
+            if _size > self.maxsize:
+                return
+
+            self._data[key] = (value, _size)
+            self.size += _size
+
+            while self.size > self.maxsize:
+                (_key, (_value, _s)) = self._data.popitem(last=False)
+                self.size -= _s
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._data:
+                self.size -= self._data.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._data),
+            'size': self.size,
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -53,6 +53,116 @@ MLMMJ_SKEL_DIR = '/usr/share/mlmmj/text.skel'
 # Default file permission for created files/directories
 MLMMJ_FILE_PERMISSION = 0o700
 
+# Directory used to store data generated by mlmmjadmin (e.g. index database).
+# NOTE: This directory must be owned by daemon user/group.
+#
+# If empty, directory `<MLMMJ_SPOOL_DIR>/.mlmmjadmin` is used.
+MLMMJADMIN_DATA_DIR = ''
+
+# Maintain a subscriber -> mailing lists index (a SQLite database stored under
+# MLMMJADMIN_DATA_DIR), it's used to find mailing lists subscribed by given
+# subscriber without reading subscriber files of all mailing lists.
+#
+# Index is used after it was fully built by script
+# `tools/update_subscriber_index.py`, please run it with cron job to catch up
+# subscription changes handled by mlmmj itself (e.g. subscribe via email).
+MLMMJ_SUBSCRIBER_INDEX = True
+
+# Max number of subscribers cached in memory (per process). Subscriber files
+# are parsed once and cached until they're modified. Set to 0 to disable cache.
+MLMMJ_SUBSCRIBERS_CACHE_SIZE = 200000
+
+# Max number of subscriber directories (one per mailing list and subscription
+# version) with number of subscribers cached in memory (per process).
+MLMMJ_SUBSCRIBERS_COUNT_CACHE_SIZE = 100000
+
+# False positive rate of bloom filters of subscribers. Bloom filter (one per
+# mailing list and subscription version) is stored under
+# `<mailing list dir>/.mlmmjadmin/`, it's used to check whether an address is
+# a subscriber without reading subscriber files. Set to 0 to disable it.
+# Bloom filters are built by script `tools/update_subscriber_index.py`, and
+# refreshed while adding/removing subscribers.
+MLMMJ_BLOOM_FILTER_FP_RATE = 0.01
+
+# Max number of bloom filters (header only) cached in memory (per process).
+MLMMJ_BLOOM_FILTER_CACHE_SIZE = 10000
+
+# Max number of lines sorted in memory while importing subscribers, more lines
+# are sorted in chunks stored in temporary files and merged.
+MLMMJ_IMPORT_SORT_CHUNK_SIZE = 100000
+
+# Max number of threads (per process) used to process multiple mailing lists
+# concurrently, e.g. checking all mailing lists subscribed by one subscriber.
+MLMMJ_LIST_WORKERS = 8
+
+# Max number of `mlmmj-sub` processes running at the same time while sending
+# subscription confirms, and seconds to wait for each of them to exit.
+MLMMJ_SUB_CONCURRENCY = 10
+MLMMJ_SUB_TIMEOUT = 60
+
+# Seconds to keep status of finished background jobs. Job status is stored
+# under `MLMMJADMIN_DATA_DIR`.
+MLMMJADMIN_JOB_EXPIRE = 86400
+
+# Connection pool of SQL backend (`bk_iredmail_sql`), every process has its own
+# pool.
+#
+# - SQL_POOL_SIZE: max number of connections, including connections in use.
+# - SQL_POOL_IDLE_TIMEOUT: seconds to keep an unused connection.
+# - SQL_POOL_CHECK_INTERVAL: connection idle longer than this (in seconds) is
+#   checked with a query before reusing it, and replaced by a new one if it
+#   doesn't work anymore (e.g. SQL server restarted, or closed the idle
+#   connection). Defaults to 0: check every time, closed connection can't be
+#   detected without a query (MySQL). Connection lost while querying is
+#   closed instead of returned to pool.
+# - SQL_POOL_WAIT_TIMEOUT: seconds to wait for a connection if all connections
+#   are in use.
+SQL_POOL_SIZE = 10
+SQL_POOL_IDLE_TIMEOUT = 300
+SQL_POOL_CHECK_INTERVAL = 0
+SQL_POOL_WAIT_TIMEOUT = 10
+
+# Connection pool of LDAP backend (`bk_iredmail_ldap`), every process has its
+# own pool. Same as `SQL_POOL_*` above, connection idle longer than
+# `LDAP_POOL_CHECK_INTERVAL` is checked with a "Who am I?" operation.
+# Lost connection is re-established (and bound again) automatically.
+LDAP_POOL_SIZE = 10
+LDAP_POOL_IDLE_TIMEOUT = 300
+LDAP_POOL_CHECK_INTERVAL = 10
+LDAP_POOL_WAIT_TIMEOUT = 10
+
+# Number of LDAP entries requested in one page while searching all mailing
+# lists, with Simple Paged Results control. Should not be larger than size
+# limit of LDAP server (OpenLDAP defaults to 500).
+LDAP_PAGE_SIZE = 500
+
+# Cache results of checking whether domain, email address or mailing list
+# exists in backend, in seconds. Cached results of a mailing list are removed
+# when it's created, updated or removed by current process, but changes made
+# by other processes are visible only after cached results expired.
+#
+# - BACKEND_CACHE_TTL: seconds to cache existing account.
+# - BACKEND_CACHE_NEGATIVE_TTL: seconds to cache not existing account.
+#   Defaults to 0 (not cached), so that account created by other process can
+#   be used immediately.
+# - BACKEND_CACHE_SIZE: max number of cached results (per process).
+BACKEND_CACHE_TTL = 60
+BACKEND_CACHE_NEGATIVE_TTL = 0
+BACKEND_CACHE_SIZE = 10000
+
+# Existing mailing lists are loaded from backend and kept in memory (per
+# process). Every BACKEND_MAILLISTS_REFRESH_INTERVAL seconds, mailing lists
+# created or modified since last refresh are loaded, and mail addresses of all
+# mailing lists are queried to find mailing lists created or removed by other
+# programs (e.g. iRedAdmin, or SQL commands which don't update the creation
+# and modification time). All mailing lists (and their alias domains) are
+# reloaded every BACKEND_MAILLISTS_RELOAD_INTERVAL seconds. Set
+# BACKEND_MAILLISTS_REFRESH_INTERVAL to 0 to always query backend.
+#
+# Supported by `bk_iredmail_sql` and `bk_iredmail_ldap` backends.
+BACKEND_MAILLISTS_REFRESH_INTERVAL = 60
+BACKEND_MAILLISTS_RELOAD_INTERVAL = 300
+
 #
 # Absolute path to mlmmj commands. If empty, will try /usr/bin and
 # /usr/local/bin automatically.
@@ -0,0 +1,183 @@
+# Background jobs.
+#
+# Long running tasks (e.g. sending subscription confirms to thousands of
+# subscribers) are executed in a background thread, API client gets a job id
+# immediately and queries job status with `GET /api/jobs/<id>`.
+#
+# Job status is stored as JSON file under `<MLMMJADMIN_DATA_DIR>/jobs/`, so
+# that it can be queried from any (uwsgi) process.
+
+import os
+import json
+import time
+import uuid
+import threading
+
+import web
+
+from libs import utils
+from libs.logger import logger
+import settings
+
+
+def _get_jobs_dir():
+    return os.path.join(utils.get_data_dir(), 'jobs')
+
+
+def _get_job_file(job_id):
+    return os.path.join(_get_jobs_dir(), job_id + '.json')
+
+
+def is_job_id(s):
+    try:
+        return uuid.UUID(hex=str(s)).hex == s
+    except ValueError:
+        return False
+
+
+class Job(object):
+    """Status of a background job."""
+    def __init__(self, name, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.name = name
+        self.status = 'running'
+        self.created = int(time.time())
+        self.updated = self.created
+        self.progress = {}
+
+        # Status of each processed item (e.g. subscriber), `{<item>: <status>}`.
+        self.items = {}
+        self.result = None
+        self.error = None
+
+        # Job status may be updated by multiple worker threads.
+        self._lock = threading.Lock()
+        self._saved = 0
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'created': self.created,
+            'updated': self.updated,
+            'progress': self.progress,
+            'items': self.items,
+            'result': self.result,
+            'error': self.error,
+        }
+
+    def save(self):
+        with self._lock:
+            self.updated = int(time.time())
+
+            # Write to a temporary file then rename it, readers never see a
+            # partially written file.
+            _path = _get_job_file(self.id)
+            _tmp = _path + '.tmp'
+            with open(_tmp, 'w') as f:
+                json.dump(self.to_dict(), f)
+
+            os.replace(_tmp, _path)
+            self._saved = time.time()
+
+    def update_progress(self, items=None, **kw):
+        """Update progress (e.g. number of processed items) of running job.
+
+        Progress is saved at most once per second, final progress is saved
+        when job is finished.
+
+        :param items: a dict of processed items and their status.
+        """
+        with self._lock:
+            self.progress.update(kw)
+
+            if items:
+                self.items.update(items)
+
+            if time.time() - self._saved < 1:
+                return
+
+        try:
+            self.save()
+        except Exception as e:
+            logger.error("Failed to update status of job {0}: {1}".format(self.id, repr(e)))
+
+
+def __remove_expired_jobs():
+    _expired = time.time() - settings.MLMMJADMIN_JOB_EXPIRE
+
+    try:
+        with os.scandir(_get_jobs_dir()) as it:
+            for entry in it:
+                if entry.name.endswith('.json') and entry.stat().st_mtime < _expired:
+                    os.remove(entry.path)
+    except Exception as e:
+        logger.error("Failed to remove expired jobs: {0}".format(repr(e)))
+
+
+def __run(job, func, ip, kwargs):
+    # `web.ctx` is thread local, copy client address used in log messages.
+    web.ctx.ip = ip
+
+    try:
+        qr = func(job=job, **kwargs)
+    except Exception as e:
+        qr = (False, repr(e))
+
+    if qr[0]:
+        job.status = 'done'
+        if len(qr) == 2:
+            job.result = qr[1]
+    else:
+        job.status = 'failed'
+        job.error = qr[1]
+
+    try:
+        job.save()
+    except Exception as e:
+        logger.error("Failed to save status of job {0}: {1}".format(job.id, repr(e)))
+
+    logger.info("[{0}] Job {1} ({2}) {3}.".format(ip, job.id, job.name, job.status))
+
+
+def start_job(name, func, **kwargs):
+    """Run `func(job=<Job>, **kwargs)` in a background thread.
+
+    `func` must return a tuple like other functions: `(True, <result>)` or
+    `(False, <error>)`.
+
+    Return `(True, <job id>)`.
+    """
+    _dir = _get_jobs_dir()
+
+    try:
+        if not os.path.exists(_dir):
+            os.makedirs(_dir, mode=settings.MLMMJ_FILE_PERMISSION, exist_ok=True)
+
+        __remove_expired_jobs()
+
+        job = Job(name=name)
+        job.save()
+    except Exception as e:
+        return (False, repr(e))
+
+    t = threading.Thread(target=__run, args=(job, func, web.ctx.get('ip'), kwargs), daemon=True)
+    t.start()
+
+    logger.info("[{0}] Started job {1} ({2}).".format(web.ctx.ip, job.id, name))
+    return (True, job.id)
+
+
+def get_job(job_id):
+    """Get status of given job. Return `(True, <dict>)`."""
+    if not is_job_id(job_id):
+        return (False, 'INVALID_JOB_ID')
+
+    try:
+        with open(_get_job_file(job_id)) as f:
+            return (True, json.load(f))
+    except FileNotFoundError:
+        return (False, 'NO_SUCH_JOB')
+    except Exception as e:
+        return (False, repr(e))
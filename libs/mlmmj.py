@@ -1,18 +1,56 @@
 import os
+import csv
+import fcntl
 import shutil
 import time
-import glob
+import heapq
+import hashlib
+import tempfile
+import threading
 import subprocess
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import web
 
-from libs import utils, form_utils
+from libs import utils, form_utils, subscriber_index, cache
+from libs.bloom import BloomFilter
 from libs.logger import logger
 import settings
 
 
 subscription_versions = ['normal', 'nomail', 'digest']
 
+# Parameters of owners and moderators, and their roles in index.
+__administrator_params = {'owner': 'owner', 'moderators': 'moderator'}
+
+# Cache of parsed subscriber files.
+# Key is tuple `(<mail>, <subscription>, <file name>)`, value is tuple
+# `(<file signature>, <frozenset of subscribers>)`.
+__subscribers_cache = cache.LRUCache(maxsize=settings.MLMMJ_SUBSCRIBERS_CACHE_SIZE,
+                                     weigh=lambda v: len(v[1]) + 1)
+
+# Cache of number of subscribers stored in subscriber files.
+# Key is tuple `(<mail>, <subscription>)`, value is a dict
+# `{<file name>: (<file signature>, <number of subscribers>)}`.
+__counts_cache = cache.LRUCache(maxsize=settings.MLMMJ_SUBSCRIBERS_COUNT_CACHE_SIZE)
+
+# Cache of bloom filters (header only) of subscribers.
+# Key is path of bloom filter file, value is tuple `(<file signature>, <BloomFilter>)`.
+__bloom_cache = cache.LRUCache(maxsize=settings.MLMMJ_BLOOM_FILTER_CACHE_SIZE)
+
+# Statistics of bloom filters.
+__bloom_stats = {'probes': 0, 'skipped': 0, 'false_positives': 0, 'rebuilds': 0, 'refreshes': 0}
+__bloom_stats_lock = threading.Lock()
+
+# Thread pool shared by operations on multiple mailing lists, created on
+# first use (in each uwsgi process).
+__executor = None
+__executor_lock = threading.Lock()
+
+# Used to mark worker threads of the shared thread pool.
+__worker_local = threading.local()
+
 
 def __get_ml_dir(mail):
     """Get absolute path of the root directory of mailing list account."""
@@ -42,6 +80,270 @@ def __get_ml_subscribers_dir(mail, subscription):
         return os.path.join(__get_ml_dir(mail=mail), 'subscribers.d')
 
 
+def __get_file_subscribers(mail, subscription, fn, path=None, cached_only=False):
+    """Get a (frozen) set of subscribers stored in given subscriber file.
+
+    Parsed subscribers are cached and validated with inode number, size and
+    modification time of the file.
+
+    @mail -- mail address of mailing list account
+    @subscription -- subscription version: normal, nomail, digest.
+    @fn -- file name, first letter of subscribers' mail addresses.
+    @path -- full path of the file.
+    @cached_only -- return None instead of reading the file if it's not cached.
+    """
+    if not path:
+        path = os.path.join(__get_ml_subscribers_dir(mail=mail, subscription=subscription), fn)
+
+    _key = (str(mail).lower(), subscription, fn)
+
+    try:
+        _st = os.stat(path)
+    except OSError:
+        # No such file.
+        __subscribers_cache.pop(_key)
+        return frozenset()
+
+    _sig = (_st.st_ino, _st.st_size, _st.st_mtime_ns)
+
+    _cached = __subscribers_cache.get(_key, validate=lambda v: v[0] == _sig)
+    if _cached:
+        return _cached[1]
+
+    if cached_only:
+        return None
+
+    with open(path, 'r', encoding='utf-8') as f:
+        _addresses = frozenset(_line.strip().lower() for _line in f if _line.strip())
+
+    __subscribers_cache.set(_key, (_sig, _addresses))
+
+    return _addresses
+
+
+def __get_file_signature(path):
+    """Return signature (inode number, size, modification time) of given
+    file, or None if file doesn't exist."""
+    try:
+        _st = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    return [_st.st_ino, _st.st_size, _st.st_mtime_ns]
+
+
+def __incr_bloom_stats(key):
+    with __bloom_stats_lock:
+        __bloom_stats[key] += 1
+
+
+def __get_bloom_path(mail, subscription):
+    """Get path of bloom filter file of subscribers of given subscription
+    version.
+
+    Sample value: /var/spool/mlmmj/<domain>/<username>/.mlmmjadmin/bloom-normal
+    """
+    return os.path.join(__get_ml_dir(mail=mail), '.mlmmjadmin', 'bloom-' + subscription)
+
+
+def __build_bloom_filter(mail, subscription, path):
+    """Build bloom filter of all subscribers of given subscription version.
+
+    Must be called with lock of bloom filter file held.
+    """
+    _dir = __get_ml_subscribers_dir(mail=mail, subscription=subscription)
+
+    # Get file signature before reading, if file is modified while reading,
+    # it's refreshed in next update.
+    _letters = {}
+    _addresses = []
+    if os.path.isdir(_dir):
+        for fn in sorted(os.listdir(_dir)):
+            _sig = __get_file_signature(os.path.join(_dir, fn))
+            if _sig:
+                _letters[fn] = _sig
+                _addresses.append(__get_file_subscribers(mail=mail, subscription=subscription, fn=fn))
+
+    # Reserve space for new subscribers.
+    _count = sum(len(i) for i in _addresses)
+    bf = BloomFilter.for_capacity(capacity=max(_count * 2, 1000),
+                                  fp_rate=settings.MLMMJ_BLOOM_FILTER_FP_RATE)
+
+    for i in _addresses:
+        for addr in i:
+            bf.add(addr)
+
+    bf.meta = {'letters': _letters}
+    bf.save(path)
+
+    __incr_bloom_stats('rebuilds')
+    return bf
+
+
+def __get_bloom_filter(mail, subscription):
+    """Get bloom filter (header only) of subscribers of given subscription
+    version. Return None if bloom filter is disabled or not built yet.
+
+    Bloom filter is never built or modified here, it's built by
+    `tools/update_subscriber_index.py` and refreshed while updating
+    subscribers.
+    """
+    if not settings.MLMMJ_BLOOM_FILTER_FP_RATE:
+        return None
+
+    path = __get_bloom_path(mail=mail, subscription=subscription)
+
+    try:
+        _sig = __get_file_signature(path)
+        if not _sig:
+            return None
+
+        _cached = __bloom_cache.get(path, validate=lambda v: v[0] == _sig)
+        if _cached:
+            return _cached[1]
+
+        bf = BloomFilter.load(path)
+        __bloom_cache.set(path, (bf.signature, bf))
+        return bf
+    except Exception as e:
+        logger.error("[{0}] {1}, failed to load bloom filter ({2}): {3}".format(web.ctx.ip, mail, subscription, repr(e)))
+        return None
+
+
+def __refresh_bloom_filter(mail, subscription, letters=None, build=False):
+    """Add subscribers stored in given (modified) subscriber files to bloom
+    filter.
+
+    Removed subscribers can not be removed from bloom filter, bloom filter is
+    rebuilt if its estimated false positive rate is too high.
+
+    :param letters: names of modified subscriber files. If None, refresh all
+                    subscriber files which were modified since last refresh.
+    :param build: build bloom filter if it doesn't exist. Otherwise nothing
+                  is done.
+    """
+    if not settings.MLMMJ_BLOOM_FILTER_FP_RATE:
+        return
+
+    path = __get_bloom_path(mail=mail, subscription=subscription)
+    _work_dir = os.path.dirname(path)
+    _dir = __get_ml_subscribers_dir(mail=mail, subscription=subscription)
+
+    try:
+        if not os.path.exists(path):
+            if not build:
+                return
+
+            os.makedirs(_work_dir, mode=settings.MLMMJ_FILE_PERMISSION, exist_ok=True)
+
+        with __lock_file(path, work_dir=_work_dir):
+            if not os.path.exists(path):
+                __build_bloom_filter(mail=mail, subscription=subscription, path=path)
+                return
+
+            bf = BloomFilter.load(path, header_only=False)
+
+            if letters is None:
+                letters = set(bf.meta['letters'])
+                if os.path.isdir(_dir):
+                    letters.update(os.listdir(_dir))
+
+            _changed = False
+            for letter in sorted(set(letters)):
+                _path = os.path.join(_dir, letter)
+                _sig = __get_file_signature(_path)
+                if bf.meta['letters'].get(letter) == _sig:
+                    # Refreshed by another thread or process.
+                    continue
+
+                _changed = True
+                if _sig:
+                    for addr in __get_file_subscribers(mail=mail, subscription=subscription, fn=letter, path=_path):
+                        bf.add(addr)
+
+                    bf.meta['letters'][letter] = _sig
+                else:
+                    bf.meta['letters'].pop(letter, None)
+
+            if not _changed:
+                return
+
+            if bf.estimated_fp_rate() > settings.MLMMJ_BLOOM_FILTER_FP_RATE * 2:
+                __build_bloom_filter(mail=mail, subscription=subscription, path=path)
+            else:
+                bf.save(path)
+                __incr_bloom_stats('refreshes')
+    except Exception as e:
+        logger.error("[{0}] {1}, failed to refresh bloom filter ({2}): {3}".format(web.ctx.ip, mail, subscription, repr(e)))
+
+
+def __bloom_might_have_subscriber(mail, subscription, subscriber):
+    """Check bloom filter whether given subscription version of mailing list
+    might have given subscriber.
+
+    Return False if it's definitely not a subscriber, True if it might be a
+    subscriber (subscriber file must be checked), or None if bloom filter is
+    not available or outdated.
+    """
+    bf = __get_bloom_filter(mail=mail, subscription=subscription)
+    if not bf:
+        return None
+
+    letter = subscriber[0]
+    _path = os.path.join(__get_ml_subscribers_dir(mail=mail, subscription=subscription), letter)
+    _sig = __get_file_signature(_path)
+    if not _sig:
+        # No subscriber file.
+        return False
+
+    if bf.meta['letters'].get(letter) != _sig:
+        # Subscriber file was modified (e.g. by mlmmj), bloom filter is
+        # refreshed by next update.
+        return None
+
+    __incr_bloom_stats('probes')
+
+    try:
+        if subscriber in bf:
+            return True
+    except Exception as e:
+        logger.error("[{0}] {1}, failed to query bloom filter ({2}): {3}".format(web.ctx.ip, mail, subscription, repr(e)))
+        return None
+
+    __incr_bloom_stats('skipped')
+    return False
+
+
+def __count_lines_in_file(path):
+    """Count non-empty lines in given file without decoding its content,
+    empty lines are skipped by subscriber parsers too."""
+    _count = 0
+
+    with open(path, 'rb') as f:
+        for _line in f:
+            if _line.strip():
+                _count += 1
+
+    return _count
+
+
+def __invalidate_index_on_error(mail, qr):
+    """Log error of subscriber index update, mark indexed data of the
+    mailing list as outdated so that it will be re-indexed."""
+    if not qr[0]:
+        logger.error("[{0}] {1}, error while updating subscriber index: {2}".format(web.ctx.ip, mail, qr[1]))
+        subscriber_index.invalidate_maillist(mail)
+
+
+def __update_administrator_index(mail, param):
+    """Update indexed owners or moderators of given mailing list with
+    addresses stored in its control file."""
+    _addresses = __get_list_param_value(mail=mail, param=param, is_email=True)
+
+    qr = subscriber_index.set_administrators(mail, __administrator_params[param], _addresses)
+    __invalidate_index_on_error(mail, qr)
+
+
 def __remove_ml_sub_dir(mail, dirname):
     if not dirname:
         return (True, )
@@ -406,6 +708,9 @@ def __update_list_param(mail, param, value, param_file=None, is_email=False):
         if not qr[0]:
             return qr
 
+    if param in __administrator_params:
+        __update_administrator_index(mail=mail, param=param)
+
     logger.info("[{0}] {1}, updated (list) parameter: {2} -> {3}".format(web.ctx.ip, mail, param, value))
     return (True, )
 
@@ -630,81 +935,426 @@ def __archive_ml(mail):
     return (True, )
 
 
-def __remove_lines_in_file(path, lines):
+class _UnsortedFileError(Exception):
+    """Raised while merging lines of a file which is not sorted."""
+
+
+class _FileLines(object):
+    """Stripped, non-empty lines of given file, file is read (line by line)
+    every time it's iterated."""
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for _line in f:
+                _line = _line.strip()
+                if _line:
+                    yield _line
+
+
+def __iter_sorted_file_lines(f):
+    """Iterate stripped, non-empty lines of an opened file.
+
+    Raise `_UnsortedFileError` if lines are not sorted, e.g. mlmmj appends
+    new subscriber to the end of subscriber file.
     """
-    Remove line from given file.
+    _prev = None
+    for _line in f:
+        _line = _line.strip()
+        if not _line:
+            continue
+
+        if _prev is not None and _line < _prev:
+            raise _UnsortedFileError()
+
+        _prev = _line
+        yield _line
+
+
+def __write_merged_lines(path, out, add_lines, remove_lines, presorted=True):
+    """Write merged lines of file `path` and sorted `add_lines` to opened file
+    `out`, excluding lines in `remove_lines`.
+
+    Return tuple `(<number of written lines>, <whether content changed>)`.
+    """
+    try:
+        f = open(path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        f = None
+
+    _count = 0
+    _changed = not presorted
+    _prev = None
+
+    try:
+        if f is None:
+            file_lines = []
+        elif presorted:
+            file_lines = __iter_sorted_file_lines(f)
+        else:
+            file_lines = sorted(_line.strip() for _line in f if _line.strip())
+
+        # Lines from file come first if they're equal.
+        _merged = heapq.merge(((_line, 0) for _line in file_lines),
+                              ((_line, 1) for _line in add_lines))
+
+        for (_line, _source) in _merged:
+            if _line == _prev or _line in remove_lines:
+                if _source == 0:
+                    # Removed or duplicate line in file.
+                    _changed = True
+
+                continue
+
+            out.write(_line + '\n')
+            _count += 1
+            _prev = _line
+
+            if _source == 1:
+                _changed = True
+    finally:
+        if f:
+            f.close()
+
+    return (_count, _changed)
+
+
+def __write_ordered_lines(path, out, add_lines, remove_lines):
+    """Write lines of file `path` in original order, then lines in
+    `add_lines` which are not in file, to opened file `out`, excluding lines
+    in `remove_lines`. Used by control files (e.g. owners) which are small,
+    and order of lines is kept.
+
+    Return tuple `(<number of written lines>, <whether content changed>)`.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            file_lines = [_line.strip() for _line in f if _line.strip()]
+    except FileNotFoundError:
+        file_lines = []
+
+    _count = 0
+    _changed = False
+    _written = set()
+
+    for (_line, _source) in [(i, 0) for i in file_lines] + [(i, 1) for i in add_lines]:
+        if _line in _written or _line in remove_lines:
+            if _source == 0:
+                # Removed or duplicate line in file.
+                _changed = True
+
+            continue
+
+        out.write(_line + '\n')
+        _count += 1
+        _written.add(_line)
+
+        if _source == 1:
+            _changed = True
+
+    return (_count, _changed)
+
+
+def __get_work_file(path, suffix='', work_dir=None):
+    """Get path of a working file (lock file, temporary file) used to update
+    given subscriber (or control) file.
+
+    Working files are stored under `<mailing list dir>/.mlmmjadmin/`, on same
+    file system but not in the directory of subscriber files, mlmmj reads all
+    files there.
+
+    :param work_dir: directory of working files. If given, working file is
+                     stored under it with same name as given file (plus
+                     suffix), used by files stored in working directory
+                     already (e.g. bloom filter).
+
+    Sample value: /var/spool/mlmmj/<domain>/<username>/.mlmmjadmin/subscribers.d-a.lock
+    """
+    if work_dir:
+        return os.path.join(work_dir, os.path.basename(path) + suffix)
+
+    _dir = os.path.dirname(path)
+    _work_dir = os.path.join(os.path.dirname(_dir), '.mlmmjadmin')
+
+    if not os.path.exists(_work_dir):
+        os.makedirs(_work_dir, mode=settings.MLMMJ_FILE_PERMISSION, exist_ok=True)
+
+    return os.path.join(_work_dir, '{0}-{1}{2}'.format(os.path.basename(_dir), os.path.basename(path), suffix))
+
+
+@contextmanager
+def __lock_file(path, work_dir=None):
+    """Acquire an exclusive advisory lock for updating given file.
+
+    Lock is held on a separate lock file, not the file itself, because file
+    is replaced while updating. Writers of different files never block each
+    other.
+
+    :param work_dir: directory of lock file, see `__get_work_file()`.
+    """
+    _fd = os.open(__get_work_file(path, suffix='.lock', work_dir=work_dir), os.O_RDWR | os.O_CREAT, 0o600)
+
+    try:
+        fcntl.flock(_fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(_fd)
+
+
+def __remove_stale_tmp_files(path):
+    """Remove temporary files left by interrupted update of given file.
+
+    Must be called with lock of the file held.
+    """
+    _prefix = os.path.basename(__get_work_file(path, suffix='.tmp.'))
+    _work_dir = os.path.dirname(__get_work_file(path))
+
+    with os.scandir(_work_dir) as it:
+        for entry in it:
+            if entry.name.startswith(_prefix):
+                os.remove(entry.path)
+
+
+def __fsync_dir(path):
+    _fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(_fd)
+    finally:
+        os.close(_fd)
+
+
+def __merge_lines_in_file(path, add_lines=None, remove_lines=None, keep_order=False, presorted=False):
+    """
+    Add and remove lines of given file. Lines are stored sorted and unique.
+
+    Lines in file and given lines are merged in one pass if file is sorted
+    already, otherwise (e.g. mlmmj appended new subscriber to the end) file
+    content is sorted in memory. New content is written to a temporary file
+    which replaces the original file, file is untouched if nothing changed,
+    and removed if no lines left.
+
+    File is updated with an exclusive lock held, concurrent updates of same
+    file are serialized, and a crash never leaves a truncated file.
 
     :param path: path to file
-    :param lines: a list/dict/tuple of lines you want to remove
+    :param add_lines: a list/set/tuple of lines you want to add
+    :param remove_lines: a list/set/tuple of lines you want to remove
+    :param keep_order: don't sort lines, keep order of lines in file and
+                       append new lines to the end. Used by control files.
+    :param presorted: `add_lines` are stripped, sorted and unique already,
+                      they're iterated (maybe twice) instead of copied in
+                      memory. Used to merge lines read from a sorted file.
     """
-    if not lines:
+    if keep_order:
+        add_lines = list(dict.fromkeys(i.strip() for i in (add_lines or []) if i.strip()))
+    elif not presorted:
+        add_lines = sorted({i.strip() for i in (add_lines or []) if i.strip()})
+
+    remove_lines = {i.strip() for i in (remove_lines or []) if i.strip()}
+
+    if not (add_lines or remove_lines):
         return (True, )
 
-    if not os.path.exists(path):
+    if not (add_lines or os.path.exists(path)):
         return (True, )
 
     try:
-        with open(path, 'r', encoding='utf-8') as _f:
-            _file_lines = _f.readlines()
-            stripped_file_lines = [line.strip() for line in _file_lines]
+        with __lock_file(path):
+            __remove_stale_tmp_files(path)
+            return __merge_lines_in_locked_file(path, add_lines, remove_lines, keep_order=keep_order)
+    except Exception as e:
+        return (False, repr(e))
+
+
+def __merge_lines_in_locked_file(path, add_lines, remove_lines, keep_order=False):
+    def _write(out):
+        if keep_order:
+            return __write_ordered_lines(path, out, add_lines, remove_lines)
+
+        try:
+            return __write_merged_lines(path, out, add_lines, remove_lines)
+        except _UnsortedFileError:
+            out.seek(0)
+            out.truncate()
+            return __write_merged_lines(path, out, add_lines, remove_lines, presorted=False)
+
+    return __rewrite_locked_file(path, _write)
+
+
+def __rewrite_locked_file(path, write):
+    """Rewrite given file with a temporary file.
 
-        given_lines = [line.strip() for line in lines]
-        filtered_lines = set(stripped_file_lines) - set(given_lines)
+    :param path: path to file
+    :param write: a function which writes new content to given file object,
+                  and returns a tuple `(<number of lines>, <changed>)`.
+    """
+    _tmp_file = __get_work_file(path, suffix='.tmp.')
+    (_fd, _tmp_path) = tempfile.mkstemp(prefix=os.path.basename(_tmp_file),
+                                        dir=os.path.dirname(_tmp_file))
 
-        if filtered_lines:
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(filtered_lines) + '\n')
+    try:
+        with os.fdopen(_fd, 'w', encoding='utf-8') as _tmp:
+            (_count, _changed) = write(_tmp)
+
+            if _changed and _count:
+                _tmp.flush()
+                os.fsync(_tmp.fileno())
+
+        if not _changed:
+            os.remove(_tmp_path)
+        elif _count:
+            os.replace(_tmp_path, path)
+            __fsync_dir(os.path.dirname(path))
         else:
-            # Remove file
+            os.remove(_tmp_path)
+
             qr = __remove_file(path=path)
             if not qr[0]:
                 return qr
 
         return (True, )
+    except Exception:
+        if os.path.exists(_tmp_path):
+            os.remove(_tmp_path)
+
+        raise
+
+
+def __has_matched_line(path, func):
+    """Return True if any line of given file is matched by given function.
+    File is read line by line without lock."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for _line in f:
+            _line = _line.strip()
+            if _line and func(_line):
+                return True
+
+    return False
+
+
+def __filter_lines_in_file(path, func):
+    """Remove lines matched by given function from given file. File is read
+    line by line.
+
+    File is scanned without lock first, it's locked and rewritten only if
+    any line is matched, other files (and their modification time) are
+    untouched.
+
+    :param path: path to file
+    :param func: a function which returns True if given line (without line
+                 break) should be removed.
+
+    Return `(True, [<removed line>, ...])`.
+    """
+    try:
+        if not __has_matched_line(path, func):
+            return (True, [])
+
+        with __lock_file(path):
+            __remove_stale_tmp_files(path)
+            return __filter_lines_in_locked_file(path, func)
+    except FileNotFoundError:
+        return (True, [])
     except Exception as e:
         return (False, repr(e))
 
 
-def __add_lines_in_file(f, lines):
+def __filter_lines_in_locked_file(path, func):
+    """Same as `__filter_lines_in_file()`, but must be called with lock of
+    the file held."""
+    removed = []
+
+    def _write(out):
+        _count = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for _line in f:
+                _line = _line.strip()
+                if not _line:
+                    continue
+
+                if func(_line):
+                    removed.append(_line)
+                else:
+                    out.write(_line + '\n')
+                    _count += 1
+
+        return (_count, bool(removed))
+
+    try:
+        qr = __rewrite_locked_file(path, _write)
+    except FileNotFoundError:
+        return (True, [])
+
+    if not qr[0]:
+        return qr
+
+    return (True, removed)
+
+
+def __remove_lines_in_file(path, lines, keep_order=False):
+    """
+    Remove line from given file.
+
+    :param path: path to file
+    :param lines: a list/dict/tuple of lines you want to remove
+    :param keep_order: keep order of lines in file instead of sorting them.
+    """
+    return __merge_lines_in_file(path=path, remove_lines=lines, keep_order=keep_order)
+
+
+def __add_lines_in_file(f, lines, keep_order=False):
     """
     Add lines to given file.
 
     @f -- path to file
-    @lines -- a list/dict/tuple of lines you want to remove
-    @sort_before_saving -- A switch to sort lines before saving.
+    @lines -- a list/dict/tuple of lines you want to add
+    @keep_order -- keep order of lines in file and append new lines to the end.
     """
-    if not lines:
-        return (True, )
+    return __merge_lines_in_file(path=f, add_lines=lines, keep_order=keep_order)
 
-    file_lines = []
-    try:
-        if os.path.exists(f):
-            with open(f, 'r', encoding='utf-8') as _f:
-                file_lines = _f.readlines()
 
-        lines = [i + '\n' for i in lines]
-        file_lines += lines
+def __get_pending_confirm_files(mail):
+    """Get subscription confirm files (of subscribers who didn't confirm yet)
+    under `<mailing list dir>/subconf/`, with one directory scan.
 
-        # Remove duplicate lines.
-        file_lines = list(set(file_lines))
+    Confirm file name is `<16 random chars>-<subscriber>`, with `@` in
+    subscriber address replaced by `=`.
 
-        with open(f, 'w', encoding='utf-8') as nf:
-            nf.write(''.join(file_lines))
+    Return a dict: `{<subscriber>: [<path>, <path>, ...]}`.
+    """
+    _dir = os.path.join(__get_ml_dir(mail=mail), 'subconf')
 
-        return (True, )
-    except Exception as e:
-        return (False, repr(e))
+    pending = {}
+    try:
+        with os.scandir(_dir) as it:
+            for entry in it:
+                _name = entry.name
+                if len(_name) < 18 or _name[16] != '-' or '=' not in _name:
+                    continue
+
+                addr = '@'.join(_name[17:].rsplit('=', 1)).lower()
+                if not utils.is_email(addr):
+                    continue
+
+                pending.setdefault(addr, []).append(entry.path)
+    except FileNotFoundError:
+        pass
+
+    return pending
 
 
 def __add_subscribers_with_confirm(mail,
                                    subscribers,
-                                   subscription='normal'):
+                                   subscription='normal',
+                                   job=None):
     """
     Add subscribers with confirm.
 
     @mail -- mail address of mailing list
     @subscribers -- a list/tuple/set of subscribers' mail addresses
     @subscription -- subscription version (normal, digest, nomail)
+    @job -- a `libs.jobs.Job` object used to report progress
     """
     _dir = __get_ml_dir(mail)
 
@@ -732,27 +1382,63 @@ def __add_subscribers_with_confirm(mail,
     elif subscription == 'nomail':
         _cmd.append('-n')
 
-    # Directory used to store subscription confirm notifications
-    _subconf_dir = os.path.join(_dir, 'subconf')
+    # Confirm files generated before this request, they will be removed.
+    try:
+        _pending = __get_pending_confirm_files(mail)
+    except Exception as e:
+        return (False, repr(e))
 
-    _error = {}
-    for addr in subscribers:
+    def _send_confirm(addr):
+        # Remove confirm file generated before this request
+        for _f in _pending.get(addr, []):
+            qr = __remove_file(path=_f)
+            if not qr[0]:
+                return qr[1]
+
+        # Send new confirm
         try:
-            # Remove confirm file generated before this request
-            _old_conf_files = glob.glob(os.path.join(_subconf_dir, '????????????????-' + addr.replace('@', '=')))
-            for _f in _old_conf_files:
-                qr = __remove_file(path=_f)
-                if not qr[0]:
-                    return qr
+            p = subprocess.run(_cmd + ['-a', addr],
+                               stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE,
+                               timeout=settings.MLMMJ_SUB_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return 'TIMEOUT'
+
+        if p.returncode != 0:
+            return 'exit code {0}: {1}'.format(p.returncode, p.stderr.decode(errors='replace').strip())
+
+        return None
+
+    _error = {}
+    _ip = web.ctx.get('ip')
 
-            # Send new confirm
-            _new_cmd = _cmd[:] + ['-a', addr]
-            subprocess.Popen(_new_cmd, stdout=subprocess.PIPE)
+    def _worker(addr):
+        # `web.ctx` is thread local, copy client address used in log messages.
+        web.ctx.ip = _ip
 
-            logger.debug("[{0}] {1}, queued confirm mail for {2}.".format(web.ctx.ip, mail, addr))
+        try:
+            err = _send_confirm(addr)
         except Exception as e:
-            logger.error("[{0}] {1}, error while subscribing {2}: {3}".format(web.ctx.ip, mail, addr, e))
-            _error[addr] = repr(e)
+            err = repr(e)
+
+        if err:
+            logger.error("[{0}] {1}, error while subscribing {2}: {3}".format(_ip, mail, addr, err))
+            _error[addr] = err
+        else:
+            logger.debug("[{0}] {1}, sent confirm mail to {2}.".format(_ip, mail, addr))
+
+        _done.append(addr)
+        if job:
+            job.update_progress(items={addr: err or 'CONFIRM_SENT'},
+                                processed=len(_done),
+                                failed=len(_error))
+
+    # Run limited number of `mlmmj-sub` processes at the same time, and wait
+    # for all of them to exit.
+    _done = []
+    _workers = max(1, min(settings.MLMMJ_SUB_CONCURRENCY, len(subscribers)))
+    with ThreadPoolExecutor(max_workers=_workers) as executor:
+        list(executor.map(_worker, subscribers))
 
     if not _error:
         return (True, )
@@ -760,37 +1446,158 @@ def __add_subscribers_with_confirm(mail,
         return (False, repr(_error))
 
 
-def has_subscriber(mail, subscriber, subscription=None):
-    """
-    Check whether mailing list `<mail>` has subscriber `<subscriber>`.
-    Return `(True, <subscription>)` or `False`.
+def get_pending_subscribers(mail):
+    """Get subscribers who were sent subscription confirm but didn't confirm
+    yet.
+
+    Return `(True, [{'mail': <subscriber>, 'time': <timestamp>}, ...])`,
+    sorted by subscriber address, `time` is the time of latest confirm.
     """
     mail = str(mail).lower()
-    subscriber = str(subscriber).lower()
 
-    if subscription:
-        subscriptions = [subscription]
-    else:
-        subscriptions = subscription_versions
+    try:
+        _pending = __get_pending_confirm_files(mail)
+
+        subscribers = []
+        for addr in sorted(_pending):
+            _times = []
+            for _path in _pending[addr]:
+                try:
+                    _times.append(int(os.stat(_path).st_mtime))
+                except FileNotFoundError:
+                    # Confirmed (or expired) while reading.
+                    pass
+
+            if _times:
+                subscribers.append({'mail': addr, 'time': max(_times)})
+
+        return (True, subscribers)
+    except Exception as e:
+        return (False, repr(e))
 
-    for subscription in subscriptions:
-        _sub_dir = __get_ml_subscribers_dir(mail=mail, subscription=subscription)
-        _sub_file = os.path.join(_sub_dir, subscriber[0])
 
-        if os.path.exists(_sub_file):
-            with open(_sub_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.strip() == subscriber:
-                        return (True, subscription)
+def remove_pending_subscribers(mail, subscribers=None):
+    """Remove subscription confirms of given subscribers, they can not confirm
+    the subscription anymore.
 
-    return False
+    :param mail: mail address of mailing list account
+    :param subscribers: a list/tuple/set of subscribers' mail addresses. If
+                        not given, remove all pending subscribers.
 
+    Return `(True, {'removed': <number of removed subscribers>})`.
+    """
+    mail = str(mail).lower()
 
-def is_maillist_exists(mail):
-    if __has_ml_dir(mail):
-        return True
-    else:
-        return False
+    try:
+        _pending = __get_pending_confirm_files(mail)
+    except Exception as e:
+        return (False, repr(e))
+
+    if subscribers is None:
+        subscribers = list(_pending)
+    else:
+        subscribers = [str(i).lower() for i in subscribers if str(i).lower() in _pending]
+
+    for addr in subscribers:
+        for _path in _pending[addr]:
+            qr = __remove_file(path=_path)
+            if not qr[0]:
+                return qr
+
+    if subscribers:
+        logger.info("[{0}] {1}, removed pending subscribers: {2}.".format(web.ctx.ip, mail, ', '.join(subscribers)))
+
+    return (True, {'removed': len(subscribers)})
+
+
+def has_subscriber(mail, subscriber, subscription=None):
+    """
+    Check whether mailing list `<mail>` has subscriber `<subscriber>`.
+    Return `(True, <subscription>)` or `False`.
+    """
+    mail = str(mail).lower()
+    subscriber = str(subscriber).lower()
+
+    if subscription:
+        subscriptions = [subscription]
+    else:
+        subscriptions = subscription_versions
+
+    for subscription in subscriptions:
+        # Query bloom filter only if subscriber file is not cached.
+        _cached = __get_file_subscribers(mail=mail, subscription=subscription, fn=subscriber[0], cached_only=True)
+        if _cached is not None:
+            if subscriber in _cached:
+                return (True, subscription)
+
+            continue
+
+        _maybe = __bloom_might_have_subscriber(mail=mail, subscription=subscription, subscriber=subscriber)
+        if _maybe is False:
+            continue
+
+        if subscriber in __get_file_subscribers(mail=mail, subscription=subscription, fn=subscriber[0]):
+            return (True, subscription)
+
+        if _maybe:
+            __incr_bloom_stats('false_positives')
+
+    return False
+
+
+def has_subscribers(mail, subscribers):
+    """
+    Check whether mailing list `<mail>` has given subscribers. Subscribers
+    are grouped by first letter, each subscriber file is read at most once.
+
+    Return `(True, {<subscriber>: <subscription>, ...})`. If subscriber is not
+    a member, `<subscription>` is None.
+    """
+    mail = str(mail).lower()
+    subscribers = {str(i).lower() for i in subscribers if utils.is_email(i)}
+
+    result = {i: None for i in subscribers}
+
+    grouped_subscribers = {}
+    for i in subscribers:
+        grouped_subscribers.setdefault(i[0], set()).add(i)
+
+    try:
+        for (letter, addresses) in grouped_subscribers.items():
+            for subscription in subscription_versions:
+                # Query bloom filter only if subscriber file is not cached.
+                if __get_file_subscribers(mail=mail, subscription=subscription, fn=letter, cached_only=True) is None:
+                    _maybe = {i: __bloom_might_have_subscriber(mail=mail, subscription=subscription, subscriber=i)
+                              for i in addresses}
+                else:
+                    _maybe = {i: None for i in addresses}
+
+                _candidates = {i for i in addresses if _maybe[i] is not False}
+                if not _candidates:
+                    continue
+
+                _found = _candidates & __get_file_subscribers(mail=mail, subscription=subscription, fn=letter)
+                for i in _found:
+                    result[i] = subscription
+
+                for i in _candidates - _found:
+                    if _maybe[i]:
+                        __incr_bloom_stats('false_positives')
+
+                addresses = addresses - _found
+                if not addresses:
+                    break
+    except Exception as e:
+        return (False, repr(e))
+
+    return (True, result)
+
+
+def is_maillist_exists(mail):
+    if __has_ml_dir(mail):
+        return True
+    else:
+        return False
 
 
 # This is the function we can get both web parameter and mlmmj parameter names.
@@ -810,6 +1617,113 @@ def get_web_param_value(mail, param):
         return (False, 'INVALID_PARAM')
 
 
+def __build_web_param_table():
+    """Map web parameter names to tuple `(<mlmmj param>, <type>, <is_email>)`."""
+    table = {}
+    for (param, _mlmmj_param) in settings.MLMMJ_WEB_PARAMS.items():
+        if param in settings.MLMMJ_OTHER_WEB_PARAMS:
+            _v = settings.MLMMJ_OTHER_PARAM_MAP[param]
+            table[param] = (_v['mlmmj_param'], _v['type'], _v.get('is_email', False))
+        else:
+            table[param] = (_mlmmj_param, __get_param_type(param=_mlmmj_param), False)
+
+    return table
+
+
+# Web parameters and their mlmmj parameters, used to read profile.
+__web_param_table = __build_web_param_table()
+
+
+def __read_param_files(mail, params):
+    """Read values of given mlmmj parameters of types other than boolean,
+    with one directory scan of `control/`.
+
+    :param mail: mail address of mailing list account
+    :param params: a list/tuple/set of mlmmj parameter names.
+
+    Return a tuple `(<set of existing param files>, {<param>: <content>})`.
+    Content of missing or unreadable file is not returned.
+    """
+    _control_dir = os.path.join(__get_ml_dir(mail=mail), 'control')
+
+    _existing = set()
+    try:
+        with os.scandir(_control_dir) as it:
+            for entry in it:
+                _existing.add(entry.name)
+    except FileNotFoundError:
+        pass
+
+    contents = {}
+    for param in set(params) & _existing:
+        try:
+            with open(os.path.join(_control_dir, param), 'r', encoding='utf-8') as f:
+                contents[param] = f.read()
+        except IOError:
+            pass
+        except Exception as e:
+            logger.error("[{0}] {1}, error while getting parameter value: {2}, {3}".format(web.ctx.ip, mail, param, e))
+
+    return (_existing, contents)
+
+
+def get_web_param_values(mail, params=None):
+    """Get values of given web parameters (or all web parameters if not
+    given) with one directory scan, returns same values as calling
+    `get_web_param_value()` for each parameter.
+
+    :param mail: mail address of mailing list account
+    :param params: a list/tuple/set of web parameter names. Invalid names
+                   are ignored.
+
+    Return `(True, {<web param>: <value>, ...})`.
+    """
+    if not utils.is_email(mail):
+        return (False, 'INVALID_MAIL')
+
+    if not params:
+        params = settings.MLMMJ_WEB_PARAMS
+
+    params = [i for i in params if i in __web_param_table]
+
+    # Value of boolean parameter is presence of its file, no need to read it.
+    _files = {__web_param_table[i][0] for i in params if __web_param_table[i][1] != 'boolean'}
+    (_existing, _contents) = __read_param_files(mail=mail, params=_files)
+
+    kvs = {}
+    for param in params:
+        (_mlmmj_param, _param_type, _is_email) = __web_param_table[param]
+        _content = _contents.get(_mlmmj_param)
+
+        if _param_type == 'boolean':
+            _value = 'yes' if _mlmmj_param in _existing else 'no'
+        elif _param_type == 'list':
+            _value = []
+            if _content:
+                _value = [_line.strip() for _line in _content.split('\n')]
+                _value = [_line for _line in _value if _line]
+
+                if _is_email:
+                    _value = [str(i).lower() for i in _value]
+
+                if param == 'extra_addresses' and mail in _value:
+                    _value.remove(mail)
+
+                _value.sort()
+        elif _content is None:
+            _value = ''
+        elif _param_type == 'text':
+            # Full content is used by mlmmj.
+            _value = _content.rstrip('\n')
+        else:
+            # Only first line is used by mlmmj.
+            _value = _content.split('\n', 1)[0]
+
+        kvs[param] = _value
+
+    return (True, kvs)
+
+
 def add_maillist_from_web_form(mail, form):
     """Add a mailing list based on data submited from web form.
 
@@ -940,6 +1854,9 @@ def delete_ml(mail, archive=True):
     """
     _ml_dir = __get_ml_dir(mail=mail)
 
+    qr = subscriber_index.remove_maillist(mail)
+    __invalidate_index_on_error(mail, qr)
+
     if os.path.exists(_ml_dir):
         if archive in [True, 'yes']:
             qr = __archive_ml(mail=mail)
@@ -976,12 +1893,15 @@ def get_subscribers(mail, email_only=False):
         _dir = __get_ml_subscribers_dir(mail=mail, subscription=subscription)
 
         try:
-            fns = os.listdir(_dir)
+            fns = sorted(os.listdir(_dir))
         except:
             continue
 
         for fn in fns:
-            _addresses = [str(i).lower().strip() for i in open(os.path.join(_dir, fn)).readlines()]
+            _addresses = sorted(__get_file_subscribers(mail=mail,
+                                                       subscription=subscription,
+                                                       fn=fn,
+                                                       path=os.path.join(_dir, fn)))
 
             if email_only:
                 subscribers += _addresses
@@ -994,6 +1914,175 @@ def get_subscribers(mail, email_only=False):
     return (True, subscribers)
 
 
+def count_subscribers(mail):
+    """Count subscribers of all subscription versions.
+
+    Only non-empty lines in subscriber files are counted, number of lines of
+    each subscriber file is cached until it's modified.
+
+    Return `(True, {'normal': <number>, 'nomail': <number>, 'digest': <number>})`.
+
+    :param mail: mail address of mailing list account
+    """
+    mail = str(mail).lower()
+
+    counts = {}
+    for subscription in subscription_versions:
+        _dir = __get_ml_subscribers_dir(mail=mail, subscription=subscription)
+        _key = (mail, subscription)
+        _cached = __counts_cache.get(_key) or {}
+
+        _files = {}
+        try:
+            with os.scandir(_dir) as it:
+                for entry in it:
+                    _st = entry.stat()
+                    _sig = (_st.st_ino, _st.st_size, _st.st_mtime_ns)
+
+                    if entry.name in _cached and _cached[entry.name][0] == _sig:
+                        _files[entry.name] = _cached[entry.name]
+                        continue
+
+                    try:
+                        _files[entry.name] = (_sig, __count_lines_in_file(entry.path))
+                    except OSError:
+                        # File was removed.
+                        continue
+        except OSError:
+            # No such directory.
+            pass
+
+        __counts_cache.set(_key, _files)
+        counts[subscription] = sum(v[1] for v in _files.values())
+
+    return (True, counts)
+
+
+def __count_list_subscribers(mail):
+    if not __has_ml_dir(mail=mail):
+        return (False, 'NO_SUCH_ACCOUNT')
+
+    return count_subscribers(mail=mail)
+
+
+def count_subscribers_of_lists(lists):
+    """Count subscribers of multiple mailing lists, mailing lists are
+    processed concurrently.
+
+    @lists -- a list/tuple/set of mailing lists
+
+    Return `(True, {<mail>: {<subscription>: <number>, ...}, ...})`. Mailing
+    lists which don't exist are not returned.
+    """
+    lists = sorted({str(i).lower() for i in lists if utils.is_email(i)})
+
+    counts = {}
+    for (ml, qr) in run_for_lists(__count_list_subscribers, lists=lists):
+        if qr[0]:
+            counts[ml] = qr[1]
+        elif qr[1] != 'NO_SUCH_ACCOUNT':
+            return (False, repr({ml: qr[1]}))
+
+    return (True, counts)
+
+
+def iter_sorted_subscribers(mail, after=None):
+    """Iterate subscribers of all subscription versions, sorted by mail
+    address. Subscriber files are read one letter at a time.
+
+    Yield dict `{'mail': <subscriber>, 'subscription': <subscription>}`.
+
+    :param mail: mail address of mailing list account
+    :param after: if given, iterate only subscribers after this address.
+    """
+    mail = str(mail).lower()
+
+    fns = {}
+    for subscription in subscription_versions:
+        _dir = __get_ml_subscribers_dir(mail=mail, subscription=subscription)
+
+        try:
+            fns[subscription] = set(os.listdir(_dir))
+        except OSError:
+            fns[subscription] = set()
+
+    for fn in sorted(set().union(*fns.values())):
+        if after and fn < after[0]:
+            continue
+
+        _subscribers = []
+        for subscription in subscription_versions:
+            if fn in fns[subscription]:
+                _addresses = __get_file_subscribers(mail=mail, subscription=subscription, fn=fn)
+                _subscribers += [(i, subscription) for i in _addresses]
+
+        _subscribers.sort()
+
+        for (_addr, subscription) in _subscribers:
+            if after and _addr <= after:
+                continue
+
+            yield {'mail': _addr, 'subscription': subscription}
+
+
+def iter_subscribers(mail):
+    """Iterate subscribers of all subscription versions by reading
+    subscriber files line by line. Subscribers are NOT sorted.
+
+    Yield tuple `(<subscriber>, <subscription>)`.
+
+    :param mail: mail address of mailing list account
+    """
+    for subscription in subscription_versions:
+        _dir = __get_ml_subscribers_dir(mail=mail, subscription=subscription)
+
+        try:
+            fns = sorted(os.listdir(_dir))
+        except OSError:
+            continue
+
+        for fn in fns:
+            try:
+                with open(os.path.join(_dir, fn), 'r', encoding='utf-8') as f:
+                    for _line in f:
+                        _addr = _line.strip().lower()
+                        if _addr:
+                            yield (_addr, subscription)
+            except OSError:
+                # File was removed.
+                continue
+
+
+def get_subscribers_page(mail, after=None, limit=100, email_only=False):
+    """Get one page of subscribers sorted by mail address.
+
+    :param mail: mail address of mailing list account
+    :param after: return subscribers after this address (the cursor).
+    :param limit: max number of subscribers.
+    :param email_only: if True, return a list of subscribers' mail addresses.
+
+    Return `(True, (<subscribers>, <cursor of next page>))`. Cursor is None if
+    there's no more subscribers.
+    """
+    if after:
+        after = str(after).lower()
+
+    subscribers = []
+    _cursor = None
+    for i in iter_sorted_subscribers(mail=mail, after=after):
+        if len(subscribers) >= limit:
+            # There's more.
+            _cursor = subscribers[-1] if email_only else subscribers[-1]['mail']
+            break
+
+        if email_only:
+            subscribers.append(i['mail'])
+        else:
+            subscribers.append(i)
+
+    return (True, (subscribers, _cursor))
+
+
 def remove_subscribers(mail, subscribers):
     """Remove multiple subscribers from given mailing list.
 
@@ -1025,6 +2114,11 @@ def remove_subscribers(mail, subscribers):
             if not qr[0]:
                 return qr
 
+        __refresh_bloom_filter(mail=mail, subscription=subscription, letters=grouped_subscribers)
+
+    qr = subscriber_index.remove_subscribers(mail, subscribers)
+    __invalidate_index_on_error(mail, qr)
+
     return (True, )
 
 
@@ -1036,30 +2130,41 @@ def remove_all_subscribers(mail):
     """
     mail = mail.lower()
 
-    _dirs = [__get_ml_subscribers_dir(mail=mail, subscription=i) for i in subscription_versions]
     try:
-        for _dir in _dirs:
-            for fn in os.listdir(_dir):
+        for subscription in subscription_versions:
+            _dir = __get_ml_subscribers_dir(mail=mail, subscription=subscription)
+            _letters = os.listdir(_dir)
+            for fn in _letters:
                 _path = os.path.join(_dir, fn)
-                qr = __remove_file(path=_path)
+                with __lock_file(_path):
+                    qr = __remove_file(path=_path)
+
                 if not qr[0]:
                     return qr
+
+            __refresh_bloom_filter(mail=mail, subscription=subscription, letters=_letters)
     except Exception as e:
         return (False, repr(e))
 
+    qr = subscriber_index.remove_all_subscribers(mail)
+    __invalidate_index_on_error(mail, qr)
+
     return (True, )
 
 
 def add_subscribers(mail,
                     subscribers,
                     subscription='normal',
-                    require_confirm=True):
+                    require_confirm=True,
+                    job=None):
     """Add subscribers to given subscription version of mailing list.
 
     :param mail: mail address of mailing list account
     :param subscribers: a list/tuple/set of subscribers' email addresses
     :param subscription: subscription version: normal, nomail, digest.
     :param require_confirm: subscription version: normal, nomail, digest.
+    :param job: a `libs.jobs.Job` object used to report progress, used when
+                it's running as a background job.
     """
     mail = mail.lower()
     subscribers = [str(i).lower() for i in subscribers if utils.is_email(i)]
@@ -1070,7 +2175,8 @@ def add_subscribers(mail,
     if require_confirm:
         qr = __add_subscribers_with_confirm(mail=mail,
                                             subscribers=subscribers,
-                                            subscription=subscription)
+                                            subscription=subscription,
+                                            job=job)
 
         if not qr[0]:
             logger.error("[{0}] {1} Failed to add subscribers (require "
@@ -1096,13 +2202,565 @@ def add_subscribers(mail,
             if not qr[0]:
                 logger.error('[{0}] {1} Failed to add subscribers to file: '
                              'error={2}'.format(web.ctx.ip, mail, qr[1]))
+
+                if job:
+                    job.update_progress(items={i: qr[1] for i in grouped_subscribers[letter]})
+
                 return qr
 
+            if job:
+                job.update_progress(items={i: 'ADDED' for i in grouped_subscribers[letter]})
+
+        __refresh_bloom_filter(mail=mail, subscription=subscription, letters=grouped_subscribers)
+
         logger.info('[{0}] {1}, added subscribers without confirming: {2}.'.format(web.ctx.ip, mail, ', '.join(subscribers)))
 
+        qr = subscriber_index.add_subscribers(mail, subscribers, subscription)
+        __invalidate_index_on_error(mail, qr)
+
     return (True, )
 
 
+def update_subscribers(mail,
+                       add=None,
+                       move=None,
+                       remove=None,
+                       subscription='normal',
+                       require_confirm=True,
+                       job=None):
+    """Add, move and remove subscribers of mailing list, in this order.
+    Stop at the first failed operation.
+
+    :param mail: mail address of mailing list account
+    :param add: a list/tuple/set of subscribers to add to given subscription
+                version.
+    :param move: a list/tuple/set of subscribers to move to given
+                 subscription version.
+    :param remove: a list/tuple/set of subscribers to remove, or `ALL` to
+                   remove all subscribers.
+    :param subscription: subscription version: normal, nomail, digest.
+    :param require_confirm: send subscription confirm to added subscribers.
+    :param job: a `libs.jobs.Job` object, status of each added subscriber is
+                reported in `job.items`.
+
+    Return `(True, <dict>)`. If subscribers are moved, numbers of moved,
+    unchanged and not found subscribers are returned in `moved`,
+    `unchanged` and `not_found`.
+    """
+    result = {}
+
+    if add:
+        qr = add_subscribers(mail=mail,
+                             subscribers=add,
+                             subscription=subscription,
+                             require_confirm=require_confirm,
+                             job=job)
+        if not qr[0]:
+            return qr
+
+    if move is not None:
+        qr = move_subscribers(mail=mail, subscribers=move, subscription=subscription)
+        if not qr[0]:
+            return qr
+
+        result.update(qr[1])
+
+    if remove:
+        if remove == 'ALL':
+            qr = remove_all_subscribers(mail=mail)
+        else:
+            qr = remove_subscribers(mail=mail, subscribers=remove)
+
+        if not qr[0]:
+            return qr
+
+    return (True, result)
+
+
+def __iter_sorted_unique_lines(lines, tmp_dir):
+    """Sort (a large number of) lines, yield sorted and unique lines.
+
+    At most `settings.MLMMJ_IMPORT_SORT_CHUNK_SIZE` lines are held in memory,
+    more lines are sorted in chunks stored in temporary files under
+    `tmp_dir`, then merged.
+    """
+    _chunk_files = []
+    _chunk = []
+
+    def _save_chunk():
+        (_fd, _path) = tempfile.mkstemp(prefix='chunk-', dir=tmp_dir)
+        with os.fdopen(_fd, 'w', encoding='utf-8') as f:
+            f.write(''.join(i + '\n' for i in sorted(_chunk)))
+
+        _chunk_files.append(_path)
+        _chunk.clear()
+
+    for _line in lines:
+        _chunk.append(_line)
+
+        if len(_chunk) >= settings.MLMMJ_IMPORT_SORT_CHUNK_SIZE:
+            _save_chunk()
+
+    if _chunk_files:
+        if _chunk:
+            _save_chunk()
+
+        _sorted = heapq.merge(*[_FileLines(i) for i in _chunk_files])
+    else:
+        _sorted = sorted(_chunk)
+
+    try:
+        _prev = None
+        for _line in _sorted:
+            if _line != _prev:
+                yield _line
+                _prev = _line
+    finally:
+        for i in _chunk_files:
+            os.remove(i)
+
+
+def __iter_sorted_file_subscribers(path, tmp_dir):
+    """Yield sorted subscribers (in lower cases) stored in given subscriber
+    file. File is read line by line, it's sorted with temporary files under
+    `tmp_dir` if it's not sorted (e.g. mlmmj appended new subscriber)."""
+    _sorted = True
+    try:
+        _prev = None
+        for _line in _FileLines(path):
+            _line = _line.lower()
+            if _prev is not None and _line < _prev:
+                _sorted = False
+                break
+
+            _prev = _line
+    except FileNotFoundError:
+        return
+
+    _lines = (i.lower() for i in _FileLines(path))
+    if _sorted:
+        yield from _lines
+    else:
+        yield from __iter_sorted_unique_lines(_lines, tmp_dir)
+
+
+def import_subscribers(mail, lines, subscription='normal'):
+    """Add (a large number of) subscribers without confirm.
+
+    Subscribers are grouped by first letter into temporary files while
+    reading, then subscribers of each letter are sorted (in chunks with
+    temporary files), existing subscribers of all subscription versions are
+    excluded while streaming sorted subscriber files, and new subscribers are
+    merged into subscriber file. Each subscriber file is updated only once,
+    memory usage doesn't grow with number of subscribers.
+
+    :param mail: mail address of mailing list account
+    :param lines: an iterable object of lines in CSV format (or one address
+                  per line), only first column is used as subscriber address.
+    :param subscription: subscription version: normal, nomail, digest.
+
+    Return `(True, {'added': <number>, 'duplicate': <number>, 'invalid': <number>})`.
+    Subscriber is a duplicate if it's already subscribed to any subscription
+    version, or it appears more than once.
+    """
+    mail = str(mail).lower()
+
+    result = {'added': 0, 'duplicate': 0, 'invalid': 0}
+
+    with tempfile.TemporaryDirectory(prefix='mlmmjadmin-import-') as _tmp_dir:
+        # Group subscribers by first letter in temporary files.
+        _tmp_files = {}
+        _counts = {}
+        try:
+            for row in csv.reader(lines):
+                if not row or not row[0].strip():
+                    continue
+
+                _addr = row[0].strip().lower()
+                if not utils.is_email(_addr):
+                    result['invalid'] += 1
+                    continue
+
+                _letter = _addr[0]
+                if _letter not in _tmp_files:
+                    _tmp_files[_letter] = open(os.path.join(_tmp_dir, '%04x' % ord(_letter)),
+                                               'w',
+                                               encoding='utf-8')
+                    _counts[_letter] = 0
+
+                _tmp_files[_letter].write(_addr + '\n')
+                _counts[_letter] += 1
+        except Exception as e:
+            return (False, repr(e))
+        finally:
+            for f in _tmp_files.values():
+                f.close()
+
+        _dir = __get_ml_subscribers_dir(mail=mail, subscription=subscription)
+        for _letter in sorted(_tmp_files):
+            _new_path = _tmp_files[_letter].name + '.new'
+            _added = 0
+
+            try:
+                # Exclude subscribers of all subscription versions.
+                _existing = heapq.merge(*[
+                    __iter_sorted_file_subscribers(os.path.join(__get_ml_subscribers_dir(mail=mail, subscription=i), _letter), _tmp_dir)
+                    for i in subscription_versions
+                ])
+                _current = next(_existing, None)
+
+                with open(_new_path, 'w', encoding='utf-8') as f:
+                    for _addr in __iter_sorted_unique_lines(_FileLines(_tmp_files[_letter].name), _tmp_dir):
+                        while _current is not None and _current < _addr:
+                            _current = next(_existing, None)
+
+                        if _addr == _current:
+                            continue
+
+                        f.write(_addr + '\n')
+                        _added += 1
+            except Exception as e:
+                return (False, repr(e))
+
+            result['duplicate'] += _counts[_letter] - _added
+
+            if not _added:
+                continue
+
+            # New subscribers are sorted, they're merged with subscriber file
+            # in one pass.
+            qr = __merge_lines_in_file(path=os.path.join(_dir, _letter), add_lines=_FileLines(_new_path), presorted=True)
+            if not qr[0]:
+                logger.error('[{0}] {1} Failed to import subscribers: error={2}'.format(web.ctx.ip, mail, qr[1]))
+                return qr
+
+            result['added'] += _added
+
+            __refresh_bloom_filter(mail=mail, subscription=subscription, letters=[_letter])
+
+            _chunk = []
+            for _addr in _FileLines(_new_path):
+                _chunk.append(_addr)
+
+                if len(_chunk) >= 10000:
+                    qr = subscriber_index.add_subscribers(mail, _chunk, subscription)
+                    __invalidate_index_on_error(mail, qr)
+                    _chunk = []
+
+            qr = subscriber_index.add_subscribers(mail, _chunk, subscription)
+            __invalidate_index_on_error(mail, qr)
+
+    logger.info('[{0}] {1}, imported subscribers ({2}): added={3}, duplicate={4}, invalid={5}.'.format(
+        web.ctx.ip, mail, subscription, result['added'], result['duplicate'], result['invalid']))
+
+    return (True, result)
+
+
+def move_subscribers(mail, subscribers, subscription='normal'):
+    """Move subscribers to given subscription version.
+
+    For each letter, subscriber files of all subscription versions are locked
+    (in same order by all writers), subscribers are added to the file of new
+    subscription version first, then removed from old ones. Subscriber is
+    always subscribed to at least one subscription version while moving.
+
+    :param mail: mail address of mailing list account
+    :param subscribers: a list/tuple/set of subscribers' mail addresses
+    :param subscription: new subscription version: normal, nomail, digest.
+
+    Return `(True, {'moved': <number>, 'unchanged': <number>, 'not_found': <number>})`.
+    `unchanged` are subscribers already subscribed to given subscription
+    version, `not_found` are not subscribers.
+    """
+    if subscription not in subscription_versions:
+        return (False, 'INVALID_SUBSCRIPTION')
+
+    mail = str(mail).lower()
+    subscribers = {str(i).lower() for i in subscribers if utils.is_email(i)}
+
+    grouped_subscribers = {}
+    for i in subscribers:
+        grouped_subscribers.setdefault(i[0], set()).add(i)
+
+    result = {'moved': 0, 'unchanged': 0, 'not_found': 0}
+    _old_versions = [i for i in subscription_versions if i != subscription]
+
+    for (letter, addresses) in sorted(grouped_subscribers.items()):
+        _path = os.path.join(__get_ml_subscribers_dir(mail=mail, subscription=subscription), letter)
+        _old_paths = {i: os.path.join(__get_ml_subscribers_dir(mail=mail, subscription=i), letter)
+                      for i in _old_versions}
+
+        try:
+            with ExitStack() as stack:
+                for path in sorted([_path] + list(_old_paths.values())):
+                    stack.enter_context(__lock_file(path))
+                    __remove_stale_tmp_files(path)
+
+                # Read subscriber files with locks held.
+                _existing = __get_file_subscribers(mail=mail, subscription=subscription, fn=letter, path=_path)
+                _moved = {}
+                for (_subscription, path) in _old_paths.items():
+                    # Subscribers already subscribed to new subscription
+                    # version are removed from old ones too.
+                    _found = addresses & __get_file_subscribers(mail=mail,
+                                                                subscription=_subscription,
+                                                                fn=letter,
+                                                                path=path)
+                    if _found:
+                        _moved[_subscription] = _found
+
+                _all_moved = set().union(*_moved.values())
+                _added = _all_moved - _existing
+
+                result['unchanged'] += len(addresses & _existing)
+                result['moved'] += len(_added)
+                result['not_found'] += len(addresses - _existing - _all_moved)
+
+                if not _all_moved:
+                    continue
+
+                if _added:
+                    qr = __merge_lines_in_locked_file(_path, sorted(_added), set())
+                    if not qr[0]:
+                        return qr
+
+                for (_subscription, _found) in _moved.items():
+                    # Subscribers are compared in lower cases, remove lines
+                    # in file in any cases.
+                    qr = __filter_lines_in_locked_file(_old_paths[_subscription],
+                                                       func=lambda line: line.lower() in _found)
+                    if not qr[0]:
+                        return qr
+        except Exception as e:
+            logger.error('[{0}] {1} Failed to move subscribers: error={2}'.format(web.ctx.ip, mail, repr(e)))
+            return (False, repr(e))
+
+        if not _all_moved:
+            continue
+
+        __refresh_bloom_filter(mail=mail, subscription=subscription, letters=[letter])
+
+        qr = subscriber_index.add_subscribers(mail, _added, subscription)
+        __invalidate_index_on_error(mail, qr)
+
+        for (_subscription, _found) in _moved.items():
+            __refresh_bloom_filter(mail=mail, subscription=_subscription, letters=[letter])
+
+            qr = subscriber_index.remove_subscribers(mail, _found, _subscription)
+            __invalidate_index_on_error(mail, qr)
+
+        logger.info('[{0}] {1}, moved subscribers to {2}: {3}.'.format(web.ctx.ip, mail, subscription, ', '.join(sorted(_all_moved))))
+
+    return (True, result)
+
+
+def sync_subscribers(mail, subscribers):
+    """Replace subscribers of given subscription versions, only subscribers
+    files which have different subscribers are updated.
+
+    :param mail: mail address of mailing list account
+    :param subscribers: a dict of desired subscribers, key is subscription
+                        version, value is a list/tuple/set of subscribers'
+                        mail addresses. Subscription versions not given are
+                        not changed, except that given subscribers are
+                        removed from them.
+
+    For each letter, subscriber files of all subscription versions are locked
+    (in same order by all writers) and changes are computed with locks held.
+    Subscribers are added first, then removed, so subscriber moved from one
+    subscription version to another one is never unsubscribed while updating.
+
+    Return `(True, {<subscription>: {'added': <number>, 'removed': <number>}, ...})`,
+    subscription versions not given are included only if subscribers were
+    removed from them.
+    """
+    mail = str(mail).lower()
+
+    # {<subscription>: {<letter>: {<subscriber>, ...}}}
+    desired = {}
+    _seen = set()
+    for (subscription, addresses) in subscribers.items():
+        if subscription not in subscription_versions:
+            return (False, 'INVALID_SUBSCRIPTION')
+
+        desired[subscription] = {}
+        for addr in {str(i).strip().lower() for i in addresses}:
+            if not utils.is_email(addr):
+                continue
+
+            if addr in _seen:
+                return (False, 'SUBSCRIBER_IN_MULTIPLE_SUBSCRIPTIONS')
+
+            _seen.add(addr)
+            desired[subscription].setdefault(addr[0], set()).add(addr)
+
+    _dirs = {i: __get_ml_subscribers_dir(mail=mail, subscription=i) for i in subscription_versions}
+
+    _letters = set()
+    for (subscription, grouped) in desired.items():
+        _letters.update(grouped)
+
+        if os.path.isdir(_dirs[subscription]):
+            _letters.update(os.listdir(_dirs[subscription]))
+
+    def _get_changes(letter, paths):
+        """Return `{<subscription>: (<added subscribers>, <removed subscribers>)}`."""
+        _synced = set().union(*[i.get(letter, set()) for i in desired.values()])
+
+        changes = {}
+        for subscription in subscription_versions:
+            _current = __get_file_subscribers(mail=mail, subscription=subscription, fn=letter, path=paths[subscription])
+
+            if subscription in desired:
+                _desired = desired[subscription].get(letter, set())
+                _added = _desired - _current
+                _removed = _current - _desired
+            else:
+                # Given subscribers are removed from other subscription
+                # versions.
+                _added = set()
+                _removed = _current & _synced
+
+            if _added or _removed:
+                changes[subscription] = (_added, _removed)
+
+        return changes
+
+    result = {i: {'added': 0, 'removed': 0} for i in desired}
+    for letter in sorted(_letters):
+        _paths = {i: os.path.join(_dirs[i], letter) for i in subscription_versions}
+
+        try:
+            # Files without changes are not locked.
+            if not _get_changes(letter, _paths):
+                continue
+
+            with ExitStack() as stack:
+                for path in sorted(_paths.values()):
+                    stack.enter_context(__lock_file(path))
+                    __remove_stale_tmp_files(path)
+
+                # Compute changes again with locks held.
+                _changes = _get_changes(letter, _paths)
+
+                for (subscription, (_added, _removed)) in _changes.items():
+                    if _added:
+                        qr = __merge_lines_in_locked_file(_paths[subscription], sorted(_added), set())
+                        if not qr[0]:
+                            return qr
+
+                for (subscription, (_added, _removed)) in _changes.items():
+                    if _removed:
+                        # Subscribers are compared in lower cases, remove
+                        # lines in file in any cases.
+                        qr = __filter_lines_in_locked_file(_paths[subscription],
+                                                           func=lambda line: line.lower() in _removed)
+                        if not qr[0]:
+                            return qr
+        except Exception as e:
+            logger.error('[{0}] {1} Failed to sync subscribers: error={2}'.format(web.ctx.ip, mail, repr(e)))
+            return (False, repr(e))
+
+        for (subscription, (_added, _removed)) in _changes.items():
+            _result = result.setdefault(subscription, {'added': 0, 'removed': 0})
+            _result['added'] += len(_added)
+            _result['removed'] += len(_removed)
+
+            __refresh_bloom_filter(mail=mail, subscription=subscription, letters=[letter])
+
+            if _added:
+                qr = subscriber_index.add_subscribers(mail, _added, subscription)
+                __invalidate_index_on_error(mail, qr)
+
+            if _removed:
+                qr = subscriber_index.remove_subscribers(mail, _removed, subscription)
+                __invalidate_index_on_error(mail, qr)
+
+    logger.info('[{0}] {1}, synced subscribers: {2}.'.format(web.ctx.ip, mail, result))
+
+    return (True, result)
+
+
+def __get_executor():
+    global __executor
+
+    with __executor_lock:
+        if __executor is None:
+            __executor = ThreadPoolExecutor(max_workers=settings.MLMMJ_LIST_WORKERS,
+                                            thread_name_prefix='mlmmj-lists')
+
+    return __executor
+
+
+def __get_list_runner(func, kwargs):
+    """Return a function which runs `func(mail=<mail>, **kwargs)` for one
+    mailing list in a worker thread, exception is returned as error."""
+    ip = web.ctx.get('ip')
+
+    def _run(mail):
+        # `web.ctx` is thread local, copy client address used in log messages.
+        web.ctx.ip = ip
+
+        _nested = getattr(__worker_local, 'busy', False)
+        __worker_local.busy = True
+        try:
+            return func(mail=mail, **kwargs)
+        except Exception as e:
+            logger.error("[{0}] {1}, error while processing mailing list: {2}".format(ip, mail, repr(e)))
+            return (False, repr(e))
+        finally:
+            __worker_local.busy = _nested
+
+    return _run
+
+
+def __run_sequentially(lists):
+    # Called in a worker thread, run sequentially instead of waiting for
+    # other workers (which may never be available).
+    return len(lists) <= 1 or getattr(__worker_local, 'busy', False) or settings.MLMMJ_LIST_WORKERS <= 1
+
+
+def run_for_lists(func, lists, **kwargs):
+    """Run `func(mail=<mail>, **kwargs)` for each given mailing list
+    concurrently, with the thread pool shared by all requests.
+
+    Return a list of `(<mail>, <result>)` in same order as given mailing
+    lists. If `func` raises an exception, result is `(False, repr(<exception>))`.
+    """
+    lists = list(lists)
+    _run = __get_list_runner(func, kwargs)
+
+    if __run_sequentially(lists):
+        return [(mail, _run(mail)) for mail in lists]
+
+    _futures = [__get_executor().submit(_run, mail) for mail in lists]
+    return [(mail, f.result()) for (mail, f) in zip(lists, _futures)]
+
+
+def iter_for_lists(func, lists, **kwargs):
+    """Same as `run_for_lists()`, but yield `(<mail>, <result>)` as soon as
+    each mailing list is processed (not in same order as given mailing
+    lists). Mailing lists not processed yet are cancelled if caller stops
+    iterating.
+    """
+    lists = list(lists)
+    _run = __get_list_runner(func, kwargs)
+
+    if __run_sequentially(lists):
+        for mail in lists:
+            yield (mail, _run(mail))
+
+        return
+
+    _futures = {__get_executor().submit(_run, mail): mail for mail in lists}
+    try:
+        for f in as_completed(_futures):
+            yield (_futures[f], f.result())
+    finally:
+        for f in _futures:
+            f.cancel()
+
+
 def subscribe_to_lists(subscriber,
                        lists,
                        subscription='normal',
@@ -1119,15 +2777,418 @@ def subscribe_to_lists(subscriber,
     if not lists:
         return (True, )
 
-    for ml in lists:
-        qr = add_subscribers(mail=ml,
+    _results = run_for_lists(add_subscribers,
+                             lists=lists,
                              subscribers=[subscriber],
                              subscription=subscription,
                              require_confirm=require_confirm)
+
+    _error = {ml: qr[1] for (ml, qr) in _results if not qr[0]}
+    if _error:
+        return (False, repr(_error))
+
+    return (True, )
+
+
+def __get_profile(mail, params=None):
+    if not __has_ml_dir(mail=mail):
+        return (False, 'NO_SUCH_ACCOUNT')
+
+    return get_web_param_values(mail=mail, params=params)
+
+
+def get_profiles(lists, params=None):
+    """Get profiles of multiple mailing lists, control files of mailing
+    lists are read concurrently.
+
+    @lists -- a list/tuple/set of mailing lists
+    @params -- a list/tuple/set of web parameter names. If empty, get all
+               parameters.
+
+    Return `(True, {<mail>: {<web param>: <value>, ...}, ...})`. Mailing
+    lists which don't exist are not returned.
+    """
+    lists = sorted({str(i).lower() for i in lists if utils.is_email(i)})
+
+    profiles = {}
+    for (ml, qr) in run_for_lists(__get_profile, lists=lists, params=params):
+        if qr[0]:
+            profiles[ml] = qr[1]
+        elif qr[1] != 'NO_SUCH_ACCOUNT':
+            return (False, repr({ml: qr[1]}))
+
+    return (True, profiles)
+
+
+def __remove_subscriber_from_list(mail, subscriber):
+    """Remove subscriber from subscription versions of mailing list which
+    have it, other subscriber files are untouched.
+
+    Return `(True, [<subscription>, ...])`.
+    """
+    _subscriptions = [i for i in subscription_versions if has_subscriber(mail=mail, subscriber=subscriber, subscription=i)]
+
+    for subscription in _subscriptions:
+        _path = os.path.join(__get_ml_subscribers_dir(mail=mail, subscription=subscription), subscriber[0])
+        qr = __remove_lines_in_file(path=_path, lines=[subscriber])
         if not qr[0]:
             return qr
 
-    return (True, )
+        __refresh_bloom_filter(mail=mail, subscription=subscription, letters=[subscriber[0]])
+
+        qr = subscriber_index.remove_subscribers(mail, [subscriber], subscription)
+        __invalidate_index_on_error(mail, qr)
+
+    if _subscriptions:
+        logger.info("[{0}] {1}, removed subscriber {2} ({3}).".format(web.ctx.ip, mail, subscriber, ', '.join(_subscriptions)))
+
+    return (True, _subscriptions)
+
+
+def remove_subscriber_from_lists(subscriber, lists):
+    """Remove one subscriber from multiple mailing lists. Only subscriber
+    files which contain the subscriber are updated.
+
+    :param subscriber: mail address of subscriber
+    :param lists: a list/tuple/set of mailing lists
+
+    Return `(True, [{'mail': <mail>, 'subscription': <subscription>}, ...])`,
+    mailing lists which the subscriber was removed from.
+    """
+    subscriber = str(subscriber).lower()
+    lists = [str(i).lower() for i in lists if utils.is_email(i)]
+
+    removed = []
+    _error = {}
+    for (ml, qr) in run_for_lists(__remove_subscriber_from_list, lists=lists, subscriber=subscriber):
+        if qr[0]:
+            removed += [{'mail': ml, 'subscription': i} for i in qr[1]]
+        else:
+            _error[ml] = qr[1]
+
+    if _error:
+        return (False, repr(_error))
+
+    return (True, removed)
+
+
+def __remove_domain_subscribers_from_list(mail, domain):
+    """Remove all subscribers under given domain from mailing list.
+
+    Return `(True, <number of removed subscribers>)`.
+    """
+    _suffix = '@' + domain
+    _count = 0
+
+    for subscription in subscription_versions:
+        _dir = __get_ml_subscribers_dir(mail=mail, subscription=subscription)
+        if not os.path.isdir(_dir):
+            continue
+
+        for fn in sorted(os.listdir(_dir)):
+            qr = __filter_lines_in_file(path=os.path.join(_dir, fn),
+                                        func=lambda line: line.lower().endswith(_suffix))
+            if not qr[0]:
+                return qr
+
+            if qr[1]:
+                _count += len(qr[1])
+
+                __refresh_bloom_filter(mail=mail, subscription=subscription, letters=[fn])
+
+                qr = subscriber_index.remove_subscribers(mail, qr[1], subscription)
+                __invalidate_index_on_error(mail, qr)
+
+    if _count:
+        logger.info("[{0}] {1}, removed {2} subscribers under domain {3}.".format(web.ctx.ip, mail, _count, domain))
+
+    return (True, _count)
+
+
+def remove_domain_subscribers(domain, job=None):
+    """Remove all subscribers under given domain from all mailing lists
+    stored under mlmmj spool directory.
+
+    All subscriber files are read line by line, and mailing lists are
+    processed concurrently.
+
+    :param domain: domain name of subscribers
+    :param job: a `libs.jobs.Job` object used to report progress, used when
+                it's running as a background job.
+
+    Return `(True, {'lists': <number of updated mailing lists>, 'removed': <number of removed subscribers>})`.
+    """
+    domain = str(domain).lower()
+    if not utils.is_domain(domain):
+        return (False, 'INVALID_DOMAIN')
+
+    qr = get_maillists_on_spool()
+    if not qr[0]:
+        return qr
+
+    lists = qr[1]
+    result = {'lists': 0, 'removed': 0}
+    _done = []
+    _lock = threading.Lock()
+
+    if job:
+        job.update_progress(lists_total=len(lists), lists_done=0, removed=0)
+
+    def _remove(mail):
+        qr = __remove_domain_subscribers_from_list(mail=mail, domain=domain)
+
+        with _lock:
+            _done.append(mail)
+            if qr[0] and qr[1]:
+                result['lists'] += 1
+                result['removed'] += qr[1]
+
+            _progress = {'lists_done': len(_done), 'removed': result['removed']}
+
+        if job:
+            job.update_progress(**_progress)
+
+        return qr
+
+    _error = {ml: qr[1] for (ml, qr) in run_for_lists(_remove, lists=lists) if not qr[0]}
+    if _error:
+        return (False, repr(_error))
+
+    return (True, result)
+
+
+def get_maillists_on_spool():
+    """Get mail addresses of all mailing lists stored under mlmmj spool
+    directory."""
+    all_lists = []
+
+    try:
+        domains = [i for i in os.listdir(settings.MLMMJ_SPOOL_DIR) if not i.startswith('.')]
+    except Exception as e:
+        return (False, repr(e))
+
+    for domain in domains:
+        _dir = os.path.join(settings.MLMMJ_SPOOL_DIR, domain)
+        if not os.path.isdir(_dir):
+            continue
+
+        try:
+            for fn in os.listdir(_dir):
+                mail = fn + '@' + domain
+                if utils.is_email(mail) and os.path.isdir(os.path.join(_dir, fn)):
+                    all_lists.append(mail.lower())
+        except Exception as e:
+            return (False, repr(e))
+
+    all_lists.sort()
+
+    return (True, all_lists)
+
+
+def __get_dir_stats(path, prefix):
+    """Return a list of `(<prefix>, <file name>, <inode>, <size>, <modification time>)`
+    of files under given directory."""
+    _stats = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                _st = entry.stat()
+                _stats.append((prefix, entry.name, _st.st_ino, _st.st_size, _st.st_mtime_ns))
+    except OSError:
+        pass
+
+    return _stats
+
+
+def get_subscribers_signature(mail, with_administrators=True):
+    """Get signature of all subscriber files (and control files of owners and
+    moderators) of given mailing list.
+
+    Signature is generated with name, inode, size and modification time of
+    files, it changes when any subscriber file is created, removed, modified
+    or replaced.
+
+    :param with_administrators: include control files of owners and moderators.
+    """
+    _stats = []
+    for subscription in subscription_versions:
+        _dir = __get_ml_subscribers_dir(mail=mail, subscription=subscription)
+        _stats += __get_dir_stats(_dir, prefix=subscription)
+
+    if with_administrators:
+        for param in sorted(__administrator_params):
+            try:
+                _st = os.stat(__get_param_file(mail=mail, param=param))
+                _stats.append(('control', param, _st.st_ino, _st.st_size, _st.st_mtime_ns))
+            except OSError:
+                continue
+
+    _stats.sort()
+
+    return hashlib.md5(repr(_stats).encode()).hexdigest()
+
+
+def get_profile_signature(mail):
+    """Get signature of all control files of given mailing list, it changes
+    when any control file is created, removed or modified."""
+    _dir = os.path.join(__get_ml_dir(mail=mail), 'control')
+    _stats = sorted(__get_dir_stats(_dir, prefix='control'))
+
+    return hashlib.md5(repr(_stats).encode()).hexdigest()
+
+
+def update_subscriber_index(lists=None, force=False):
+    """Re-index subscribers of mailing lists changed since last indexing,
+    and build (or refresh) bloom filters of subscribers.
+
+    :param lists: a list/tuple/set of mailing lists. If not given, all
+                  mailing lists stored under mlmmj spool directory are
+                  indexed, and indexed data of mailing lists which don't exist
+                  anymore are removed.
+    :param force: re-index all given mailing lists even if not changed.
+
+    Return (True, {'indexed': [<mail>, ...], 'removed': [<mail>, ...]}).
+    """
+    full = not lists
+
+    if full:
+        qr = get_maillists_on_spool()
+        if not qr[0]:
+            return qr
+
+        lists = qr[1]
+    else:
+        lists = [str(i).lower() for i in lists if utils.is_email(i)]
+
+    qr = subscriber_index.get_signatures()
+    if not qr[0]:
+        return qr
+
+    signatures = qr[1]
+
+    indexed = []
+    for ml in lists:
+        # Build bloom filters, or refresh them with subscriber files modified
+        # by mlmmj.
+        for subscription in subscription_versions:
+            __refresh_bloom_filter(mail=ml, subscription=subscription, build=True)
+
+        _signature = get_subscribers_signature(mail=ml)
+        if (not force) and signatures.get(ml) == _signature:
+            continue
+
+        _subscribers = {}
+        for i in get_subscribers(mail=ml)[1]:
+            _subscribers.setdefault(i['subscription'], []).append(i['mail'])
+
+        _administrators = {}
+        for (param, role) in __administrator_params.items():
+            _administrators[role] = __get_list_param_value(mail=ml, param=param, is_email=True)
+
+        qr = subscriber_index.reset_maillist(mail=ml,
+                                             subscribers=_subscribers,
+                                             signature=_signature,
+                                             administrators=_administrators)
+        if not qr[0]:
+            return qr
+
+        indexed.append(ml)
+
+    removed = []
+    if full:
+        removed = sorted(set(signatures) - set(lists))
+        for ml in removed:
+            qr = subscriber_index.remove_maillist(ml)
+            if not qr[0]:
+                return qr
+
+        qr = subscriber_index.mark_ready()
+        if not qr[0]:
+            return qr
+
+    return (True, {'indexed': indexed, 'removed': removed})
+
+
+def get_subscribed_lists(subscriber, domains=None):
+    """Get mailing lists subscribed by given subscriber from subscriber index.
+
+    Return `(True, [{'mail': <mail>, 'subscription': <subscription>}, ...])`,
+    or `(False, 'INDEX_NOT_READY')` if index is disabled or not built yet.
+
+    :param subscriber: mail address of subscriber
+    :param domains: a list/tuple/set of domain names. If given, return only
+                    mailing lists under these domains.
+    """
+    if not subscriber_index.is_ready():
+        return (False, 'INDEX_NOT_READY')
+
+    return subscriber_index.get_subscribed_lists(subscriber=subscriber, domains=domains)
+
+
+def get_administered_lists(address, domains=None):
+    """Get mailing lists which given address is owner or moderator of, from
+    index.
+
+    Return `(True, [{'mail': <mail>, 'role': <role>}, ...])`, or
+    `(False, 'INDEX_NOT_READY')` if index is disabled or not built yet.
+
+    :param address: mail address of owner/moderator
+    :param domains: a list/tuple/set of domain names. If given, return only
+                    mailing lists under these domains.
+    """
+    if not subscriber_index.is_ready(k='administrators_built'):
+        return (False, 'INDEX_NOT_READY')
+
+    return subscriber_index.get_administered_lists(address=address, domains=domains)
+
+
+def __get_administrator_roles(mail, address):
+    _roles = []
+    for (param, role) in sorted(__administrator_params.items()):
+        if address in __get_list_param_value(mail=mail, param=param, is_email=True):
+            _roles.append(role)
+
+    return (True, _roles)
+
+
+def find_administered_lists(address, lists):
+    """Find mailing lists which given address is owner or moderator of, by
+    reading control files of given mailing lists.
+
+    Return `(True, [{'mail': <mail>, 'role': <role>}, ...])`.
+    """
+    address = str(address).lower()
+
+    administered = []
+    _error = {}
+    for (ml, qr) in run_for_lists(__get_administrator_roles, lists=lists, address=address):
+        if qr[0]:
+            administered += [{'mail': ml, 'role': i} for i in qr[1]]
+        else:
+            _error[ml] = qr[1]
+
+    if _error:
+        return (False, repr(_error))
+
+    return (True, administered)
+
+
+def get_metrics():
+    """Get metrics of in-process caches."""
+    with __bloom_stats_lock:
+        _bloom_stats = dict(__bloom_stats)
+
+    # Observed false positive rate of queries of non-subscribers.
+    _negatives = _bloom_stats['skipped'] + _bloom_stats['false_positives']
+    _bloom_stats['fp_rate'] = settings.MLMMJ_BLOOM_FILTER_FP_RATE
+    _bloom_stats['observed_fp_rate'] = _bloom_stats['false_positives'] / _negatives if _negatives else 0
+
+    return {
+        'subscribers_cache': __subscribers_cache.stats(),
+        'subscribers_count_cache': __counts_cache.stats(),
+        'bloom_filter': _bloom_stats,
+        'bloom_filter_cache': __bloom_cache.stats(),
+    }
 
 
 def get_owners(mail):
@@ -1148,7 +3209,11 @@ def add_owners(mail, owners):
     """
     f = __get_param_file(mail=mail, param="owner")
 
-    return __add_lines_in_file(f=f, lines=owners)
+    qr = __add_lines_in_file(f=f, lines=owners, keep_order=True)
+    if qr[0]:
+        __update_administrator_index(mail=mail, param="owner")
+
+    return qr
 
 
 def remove_owners(mail, owners):
@@ -1159,7 +3224,11 @@ def remove_owners(mail, owners):
     """
     f = __get_param_file(mail=mail, param="owner")
 
-    return __remove_lines_in_file(path=f, lines=owners)
+    qr = __remove_lines_in_file(path=f, lines=owners, keep_order=True)
+    if qr[0]:
+        __update_administrator_index(mail=mail, param="owner")
+
+    return qr
 
 
 def reset_owners(mail, owners):
@@ -1189,7 +3258,11 @@ def add_moderators(mail, moderators):
     """
     f = __get_param_file(mail=mail, param="moderators")
 
-    return __add_lines_in_file(f=f, lines=moderators)
+    qr = __add_lines_in_file(f=f, lines=moderators, keep_order=True)
+    if qr[0]:
+        __update_administrator_index(mail=mail, param="moderators")
+
+    return qr
 
 
 def remove_moderators(mail, moderators):
@@ -1200,7 +3273,11 @@ def remove_moderators(mail, moderators):
     """
     f = __get_param_file(mail=mail, param="moderators")
 
-    return __remove_lines_in_file(path=f, lines=moderators)
+    qr = __remove_lines_in_file(path=f, lines=moderators, keep_order=True)
+    if qr[0]:
+        __update_administrator_index(mail=mail, param="moderators")
+
+    return qr
 
 def reset_moderators(mail, moderators):
     """Reset moderators to given addresses.
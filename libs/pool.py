@@ -0,0 +1,193 @@
+# Pool of connections to SQL/LDAP servers.
+#
+# NOTE: uwsgi runs mlmmjadmin with multiple processes, every process has its
+# own pool. Connections are created on demand, so pool created before uwsgi
+# forks worker processes doesn't share connections between processes.
+
+import time
+import threading
+
+from libs.logger import logger
+
+
+class PoolTimeoutError(Exception):
+    """No connection is available in given time."""
+
+
+class ConnectionPool(object):
+    """Thread-safe connection pool with bounded size.
+
+    :param connect: a function used to create a new connection.
+    :param close: a function used to close a connection.
+    :param ping: a function used to check whether connection still works,
+                 returns True or False. Connection idle longer than
+                 `check_interval` seconds is checked before reusing it.
+    :param is_broken: a function used to check whether a connection returned
+                      to pool can be reused (e.g. it's closed by server, or
+                      left in an unfinished transaction), broken connection
+                      is closed instead.
+    :param max_size: max number of connections, including connections in use.
+    :param idle_timeout: seconds to keep an unused connection.
+    :param check_interval: seconds. Set to 0 to check connection every time.
+    :param wait_timeout: seconds to wait for a connection if all connections
+                         are in use, `PoolTimeoutError` is raised on timeout.
+    """
+    def __init__(self,
+                 connect,
+                 close,
+                 ping=None,
+                 is_broken=None,
+                 max_size=10,
+                 idle_timeout=300,
+                 check_interval=10,
+                 wait_timeout=10):
+        self._connect = connect
+        self._close = close
+        self._ping = ping
+        self._is_broken = is_broken
+
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.wait_timeout = wait_timeout
+
+        # Idle connections and the time they were returned: [(<conn>, <time>), ...].
+        # The most recently used one is reused first, so that connections
+        # not needed anymore expire.
+        self._idle = []
+
+        # Number of connections, including connections in use.
+        self._size = 0
+        self._cond = threading.Condition()
+
+        self._stats = {
+            'requests': 0,
+            'created': 0,
+            'closed': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'wait_timeouts': 0,
+            'check_failures': 0,
+            'broken': 0,
+        }
+
+    def __close(self, conn):
+        try:
+            self._close(conn)
+        except Exception:
+            pass
+
+        with self._cond:
+            self._stats['closed'] += 1
+
+    def __pop_expired(self):
+        """Remove idle connections which expired, must be called with lock held."""
+        _expired = time.time() - self.idle_timeout
+
+        _conns = []
+        while self._idle and self._idle[0][1] < _expired:
+            _conns.append(self._idle.pop(0)[0])
+
+        self._size -= len(_conns)
+        return _conns
+
+    def acquire(self):
+        """Get an idle connection, or create a new one."""
+        _start = time.time()
+        _waited = False
+        conn = None
+
+        with self._cond:
+            _expired = self.__pop_expired()
+
+            while True:
+                if self._idle:
+                    (conn, _last_used) = self._idle.pop()
+                    break
+
+                if self._size < self.max_size:
+                    # Reserve a slot for new connection.
+                    self._size += 1
+                    break
+
+                if not _waited:
+                    _waited = True
+                    self._stats['waits'] += 1
+
+                _remaining = _start + self.wait_timeout - time.time()
+                if _remaining <= 0:
+                    self._stats['wait_timeouts'] += 1
+                    raise PoolTimeoutError('No connection available in {0} seconds'.format(self.wait_timeout))
+
+                self._cond.wait(_remaining)
+
+            self._stats['requests'] += 1
+            if _waited:
+                self._stats['wait_seconds'] += time.time() - _start
+
+        for _conn in _expired:
+            self.__close(_conn)
+
+        if conn is not None:
+            if not self._ping or time.time() - _last_used < self.check_interval:
+                return conn
+
+            try:
+                if self._ping(conn):
+                    return conn
+            except Exception:
+                pass
+
+            # Reconnect, the slot of broken connection is reused.
+            logger.info('Connection in pool is broken, reconnecting.')
+            with self._cond:
+                self._stats['check_failures'] += 1
+
+            self.__close(conn)
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+
+            raise
+
+        with self._cond:
+            self._stats['created'] += 1
+
+        return conn
+
+    def release(self, conn):
+        """Return connection to pool."""
+        _broken = False
+        if self._is_broken:
+            try:
+                _broken = self._is_broken(conn)
+            except Exception:
+                _broken = True
+
+        with self._cond:
+            if _broken:
+                self._stats['broken'] += 1
+                self._size -= 1
+                _expired = [conn]
+            else:
+                self._idle.append((conn, time.time()))
+                _expired = self.__pop_expired()
+
+            self._cond.notify()
+
+        for _conn in _expired:
+            self.__close(_conn)
+
+    def stats(self):
+        with self._cond:
+            _stats = dict(self._stats)
+            _stats['size'] = self._size
+            _stats['idle'] = len(self._idle)
+            _stats['in_use'] = self._size - len(self._idle)
+            _stats['max_size'] = self.max_size
+
+        return _stats
@@ -0,0 +1,341 @@
+# Reverse index of subscribers: subscriber -> mailing lists, and
+# administrators: owner/moderator -> mailing lists.
+#
+# Subscribers are stored by mlmmj in plain text files under each mailing list
+# directory, finding all mailing lists subscribed by one address requires
+# reading subscriber files of every mailing list. This index is a SQLite
+# database maintained by mlmmjadmin while adding/removing subscribers, so that
+# the lookup is a single query no matter how many mailing lists we have.
+# Same for owners and moderators stored in `control/owner` and
+# `control/moderators`.
+#
+# Subscription changes handled by mlmmj itself (e.g. subscribe or unsubscribe
+# via email) are not seen by mlmmjadmin, please run script
+# `tools/update_subscriber_index.py` with cron job to catch up.
+
+import os
+import sqlite3
+import threading
+
+from libs import utils
+from libs.logger import logger
+import settings
+
+# Per-thread SQLite connections. SQLite connection can not be shared by threads.
+__local = threading.local()
+
+__schema = [
+    """CREATE TABLE IF NOT EXISTS subscribers (
+        subscriber VARCHAR(255) NOT NULL,
+        mail VARCHAR(255) NOT NULL,
+        subscription VARCHAR(10) NOT NULL,
+        PRIMARY KEY (subscriber, mail, subscription)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_subscribers_mail ON subscribers (mail)",
+    # Signature of subscriber files of indexed mailing lists, used to detect
+    # mailing lists changed by mlmmj.
+    """CREATE TABLE IF NOT EXISTS lists (
+        mail VARCHAR(255) NOT NULL PRIMARY KEY,
+        signature VARCHAR(255) NOT NULL DEFAULT ''
+    )""",
+    # Owners and moderators. `role` is `owner` or `moderator`.
+    """CREATE TABLE IF NOT EXISTS administrators (
+        address VARCHAR(255) NOT NULL,
+        mail VARCHAR(255) NOT NULL,
+        role VARCHAR(10) NOT NULL,
+        PRIMARY KEY (address, mail, role)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_administrators_mail ON administrators (mail)",
+    """CREATE TABLE IF NOT EXISTS meta (
+        k VARCHAR(255) NOT NULL PRIMARY KEY,
+        v VARCHAR(255) NOT NULL DEFAULT ''
+    )""",
+]
+
+
+def __get_db_path():
+    return os.path.join(utils.get_data_dir(), 'index.sqlite')
+
+
+def get_conn():
+    """Get (per-thread) SQLite connection of index database."""
+    conn = getattr(__local, 'conn', None)
+    if conn:
+        return conn
+
+    _dir = utils.get_data_dir()
+    if not os.path.exists(_dir):
+        os.makedirs(_dir, mode=settings.MLMMJ_FILE_PERMISSION, exist_ok=True)
+
+    conn = sqlite3.connect(__get_db_path(), timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    with conn:
+        for sql in __schema:
+            conn.execute(sql)
+
+    __local.conn = conn
+    return conn
+
+
+def is_enabled():
+    return settings.MLMMJ_SUBSCRIBER_INDEX
+
+
+def is_ready(k='built'):
+    """Return True if index is enabled and was fully built at least once.
+
+    Before that, callers must query subscriber files directly.
+
+    :param k: `built` for subscribers, `administrators_built` for owners and
+              moderators.
+    """
+    if not is_enabled():
+        return False
+
+    try:
+        conn = get_conn()
+        row = conn.execute("SELECT v FROM meta WHERE k=? LIMIT 1", (k, )).fetchone()
+        if row:
+            return True
+    except Exception as e:
+        logger.error("Error while querying subscriber index: {0}".format(repr(e)))
+
+    return False
+
+
+def mark_ready():
+    try:
+        conn = get_conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta (k, v) VALUES ('built', '1')")
+            conn.execute("INSERT OR REPLACE INTO meta (k, v) VALUES ('administrators_built', '1')")
+        return (True, )
+    except Exception as e:
+        return (False, repr(e))
+
+
+def add_subscribers(mail, subscribers, subscription='normal'):
+    """Add subscribers of given subscription version of mailing list to index.
+
+    :param mail: mail address of mailing list account
+    :param subscribers: a list/tuple/set of subscribers' mail addresses
+    :param subscription: subscription version: normal, nomail, digest.
+    """
+    if not (is_enabled() and subscribers):
+        return (True, )
+
+    mail = str(mail).lower()
+    rows = [(str(i).lower(), mail, subscription) for i in subscribers]
+
+    try:
+        conn = get_conn()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO subscribers (subscriber, mail, subscription) "
+                             "VALUES (?, ?, ?)", rows)
+        return (True, )
+    except Exception as e:
+        return (False, repr(e))
+
+
+def remove_subscribers(mail, subscribers, subscription=None):
+    """Remove subscribers of mailing list from index.
+
+    :param mail: mail address of mailing list account
+    :param subscribers: a list/tuple/set of subscribers' mail addresses
+    :param subscription: subscription version. If not given, remove from all
+                         subscription versions.
+    """
+    if not (is_enabled() and subscribers):
+        return (True, )
+
+    mail = str(mail).lower()
+
+    try:
+        conn = get_conn()
+        with conn:
+            if subscription:
+                rows = [(str(i).lower(), mail, subscription) for i in subscribers]
+                conn.executemany("DELETE FROM subscribers "
+                                 "WHERE subscriber=? AND mail=? AND subscription=?", rows)
+            else:
+                rows = [(str(i).lower(), mail) for i in subscribers]
+                conn.executemany("DELETE FROM subscribers WHERE subscriber=? AND mail=?", rows)
+        return (True, )
+    except Exception as e:
+        return (False, repr(e))
+
+
+def remove_all_subscribers(mail):
+    """Remove all subscribers of given mailing list from index."""
+    if not is_enabled():
+        return (True, )
+
+    mail = str(mail).lower()
+
+    try:
+        conn = get_conn()
+        with conn:
+            conn.execute("DELETE FROM subscribers WHERE mail=?", (mail, ))
+        return (True, )
+    except Exception as e:
+        return (False, repr(e))
+
+
+def remove_maillist(mail):
+    """Remove all index data of given mailing list."""
+    if not is_enabled():
+        return (True, )
+
+    mail = str(mail).lower()
+
+    try:
+        conn = get_conn()
+        with conn:
+            conn.execute("DELETE FROM subscribers WHERE mail=?", (mail, ))
+            conn.execute("DELETE FROM administrators WHERE mail=?", (mail, ))
+            conn.execute("DELETE FROM lists WHERE mail=?", (mail, ))
+        return (True, )
+    except Exception as e:
+        return (False, repr(e))
+
+
+def reset_maillist(mail, subscribers, signature='', administrators=None):
+    """Replace all indexed subscribers (and administrators) of given mailing
+    list.
+
+    :param mail: mail address of mailing list account
+    :param subscribers: a dict of subscribers, key is subscription version,
+                        value is a list/tuple/set of subscribers' mail addresses.
+    :param signature: signature of subscriber files.
+    :param administrators: a dict of administrators, key is role (`owner`,
+                           `moderator`), value is a list/tuple/set of mail
+                           addresses.
+    """
+    mail = str(mail).lower()
+
+    rows = []
+    for (subscription, addresses) in subscribers.items():
+        rows += [(str(i).lower(), mail, subscription) for i in addresses]
+
+    admin_rows = []
+    for (role, addresses) in (administrators or {}).items():
+        admin_rows += [(str(i).lower(), mail, role) for i in addresses]
+
+    try:
+        conn = get_conn()
+        with conn:
+            conn.execute("DELETE FROM subscribers WHERE mail=?", (mail, ))
+            conn.executemany("INSERT OR IGNORE INTO subscribers (subscriber, mail, subscription) "
+                             "VALUES (?, ?, ?)", rows)
+
+            if administrators is not None:
+                conn.execute("DELETE FROM administrators WHERE mail=?", (mail, ))
+                conn.executemany("INSERT OR IGNORE INTO administrators (address, mail, role) "
+                                 "VALUES (?, ?, ?)", admin_rows)
+
+            conn.execute("INSERT OR REPLACE INTO lists (mail, signature) VALUES (?, ?)", (mail, signature))
+        return (True, )
+    except Exception as e:
+        return (False, repr(e))
+
+
+def get_signatures():
+    """Return a dict of indexed mailing lists and signature of their
+    subscriber files: {<mail>: <signature>}."""
+    try:
+        conn = get_conn()
+        rows = conn.execute("SELECT mail, signature FROM lists").fetchall()
+        return (True, {r[0]: r[1] for r in rows})
+    except Exception as e:
+        return (False, repr(e))
+
+
+def invalidate_maillist(mail):
+    """Mark indexed data of given mailing list as outdated, it will be
+    re-indexed by `tools/update_subscriber_index.py`."""
+    if not is_enabled():
+        return (True, )
+
+    try:
+        conn = get_conn()
+        with conn:
+            conn.execute("UPDATE lists SET signature='' WHERE mail=?", (str(mail).lower(), ))
+        return (True, )
+    except Exception as e:
+        return (False, repr(e))
+
+
+def get_subscribed_lists(subscriber, domains=None):
+    """Get mailing lists subscribed by given subscriber.
+
+    :param subscriber: mail address of subscriber
+    :param domains: a list/tuple/set of domain names. If given, return only
+                    mailing lists under these domains.
+
+    Return (True, [{'mail': <mail>, 'subscription': <subscription>}, ...]).
+    """
+    subscriber = str(subscriber).lower()
+
+    try:
+        conn = get_conn()
+        # One row for each subscription version of mailing list.
+        rows = conn.execute("SELECT DISTINCT mail, subscription FROM subscribers "
+                            "WHERE subscriber=? ORDER BY mail, subscription", (subscriber, )).fetchall()
+    except Exception as e:
+        return (False, repr(e))
+
+    if domains:
+        domains = {str(d).lower() for d in domains}
+        rows = [r for r in rows if r[0].split('@', 1)[-1] in domains]
+
+    return (True, [{'mail': r[0], 'subscription': r[1]} for r in rows])
+
+
+def set_administrators(mail, role, addresses):
+    """Replace indexed owners or moderators of given mailing list.
+
+    :param mail: mail address of mailing list account
+    :param role: `owner` or `moderator`
+    :param addresses: a list/tuple/set of mail addresses
+    """
+    if not is_enabled():
+        return (True, )
+
+    mail = str(mail).lower()
+    rows = [(str(i).lower(), mail, role) for i in addresses]
+
+    try:
+        conn = get_conn()
+        with conn:
+            conn.execute("DELETE FROM administrators WHERE mail=? AND role=?", (mail, role))
+            conn.executemany("INSERT OR IGNORE INTO administrators (address, mail, role) "
+                             "VALUES (?, ?, ?)", rows)
+        return (True, )
+    except Exception as e:
+        return (False, repr(e))
+
+
+def get_administered_lists(address, domains=None):
+    """Get mailing lists which given address is owner or moderator of.
+
+    :param address: mail address of owner/moderator
+    :param domains: a list/tuple/set of domain names. If given, return only
+                    mailing lists under these domains.
+
+    Return (True, [{'mail': <mail>, 'role': <role>}, ...]).
+    """
+    address = str(address).lower()
+
+    try:
+        conn = get_conn()
+        rows = conn.execute("SELECT mail, role FROM administrators "
+                            "WHERE address=? ORDER BY mail, role", (address, )).fetchall()
+    except Exception as e:
+        return (False, repr(e))
+
+    if domains:
+        domains = {str(d).lower() for d in domains}
+        rows = [r for r in rows if r[0].split('@', 1)[-1] in domains]
+
+    return (True, [{'mail': r[0], 'role': r[1]} for r in rows])
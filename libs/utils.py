@@ -1,5 +1,8 @@
 # encoding: utf-8
+import os
+import codecs
 import json
+import hashlib
 from typing import Union, List, Tuple, Set, Dict, Any
 import web
 
@@ -154,16 +157,97 @@ def is_domain(s):
         return False
 
 
+def get_data_dir():
+    """Get directory used to store mlmmjadmin data."""
+    if settings.MLMMJADMIN_DATA_DIR:
+        return settings.MLMMJADMIN_DATA_DIR
+
+    return os.path.join(settings.MLMMJ_SPOOL_DIR, '.mlmmjadmin')
+
+
 def get_auth_token():
     _token = web.ctx.env.get(auth_token_name)
     return _token
 
 
+def iter_request_body_lines(chunk_size=65536):
+    """Iterate lines (without line break) of HTTP request body, body is
+    read chunk by chunk instead of loading it in memory."""
+    env = web.ctx.env
+    stream = env['wsgi.input']
+
+    if env.get('HTTP_TRANSFER_ENCODING') == 'chunked':
+        remaining = None
+    else:
+        remaining = web.intget(env.get('CONTENT_LENGTH'), 0)
+
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    _buf = ''
+
+    while remaining is None or remaining > 0:
+        if remaining is None:
+            _chunk = stream.read(chunk_size)
+        else:
+            _chunk = stream.read(min(chunk_size, remaining))
+            remaining -= len(_chunk)
+
+        if not _chunk:
+            break
+
+        _lines = (_buf + decoder.decode(_chunk)).splitlines(True)
+
+        # Last line may be incomplete.
+        _buf = ''
+        if _lines and not _lines[-1].endswith(('\n', '\r')):
+            _buf = _lines.pop()
+
+        for _line in _lines:
+            yield _line.rstrip('\r\n')
+
+    _buf += decoder.decode(b'', final=True)
+    if _buf:
+        yield _buf
+
+
+def check_etag(signature):
+    """Set `ETag` header generated with given signature of data and query
+    string of current request, and raise `304 Not Modified` if client
+    already has the same version (`If-None-Match`).
+
+    Must be called before reading data used to render the response.
+    """
+    _etag = hashlib.md5((signature + web.ctx.query).encode()).hexdigest()
+    web.modified(etag=_etag)
+
+
 def _render_json(d):
     web.header('Content-Type', 'application/json')
     return json.dumps(d)
 
 
+def api_render_ndjson(rows, chunk_size=1000):
+    """Render (and stream) rows as newline delimited JSON.
+
+    :param rows: an iterable object of JSON serializable objects.
+    :param chunk_size: number of rows sent in one chunk.
+    """
+    web.header('Content-Type', 'application/x-ndjson')
+
+    def _chunks():
+        _lines = []
+        for row in rows:
+            _lines.append(json.dumps(row) + '\n')
+
+            if len(_lines) >= chunk_size:
+                yield ''.join(_lines)
+                _lines = []
+
+        if _lines:
+            yield ''.join(_lines)
+
+    return _chunks()
+
+
 def api_render(data):
     """Convert given data to a dict and render it."""
     if isinstance(data, dict):
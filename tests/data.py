@@ -9,6 +9,10 @@ ml = listname + '@' + domain
 
 # urls
 url_ml = '/api/' + ml
+url_subscribers = url_ml + '/subscribers'
+
+# Subscribers
+subscribers = ['sub01@a.io', 'sub02@b.io', 'sub03@a.io', 'sub04@c.io', 'sub05@a.io']
 
 # Not exist domain
 domain_not_exist = 'not-exist-test-domain.com'
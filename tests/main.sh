@@ -10,6 +10,12 @@ fi
 
 modules="
     test_mlmmj.py
+    test_subscriber.py
+    test_mlmmj_files.py
+    test_bloom.py
+    test_pool.py
+    test_backend_cache.py
+    test_mlmmj_lists.py
     test_cleanup.py
 "
 
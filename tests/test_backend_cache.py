@@ -0,0 +1,154 @@
+import sys
+import types
+
+from libs import backend_cache, utils
+
+
+def fake_backend(monkeypatch, name):
+    """Create a backend module which counts queries, lookup of domain
+    `error.io` fails."""
+    backend = types.ModuleType(name)
+    backend.queries = []
+
+    def is_domain_exists(domain, conn=None):
+        if not utils.is_domain(domain):
+            backend_cache.skip_caching()
+            return True
+
+        backend.queries.append(domain)
+
+        if domain == 'error.io':
+            backend_cache.skip_caching()
+            return True
+
+        return domain == 'exist.io'
+
+    def is_maillist_exists(mail, conn=None):
+        backend.queries.append(mail)
+
+        # Calls another cached function.
+        return is_domain_exists(mail.split('@', 1)[-1])
+
+    backend.is_domain_exists = is_domain_exists
+    backend.is_maillist_exists = is_maillist_exists
+
+    monkeypatch.setitem(sys.modules, name, backend)
+    return backend_cache.load_backend(name)
+
+
+def test_cached_lookups(monkeypatch):
+    backend = fake_backend(monkeypatch, 'bk_fake_cached')
+
+    assert backend.is_domain_exists('exist.io') is True
+    assert backend.is_domain_exists('exist.io') is True
+    assert backend.queries == ['exist.io']
+
+
+def test_failed_lookups_not_cached(monkeypatch):
+    backend = fake_backend(monkeypatch, 'bk_fake_failed')
+
+    assert backend.is_domain_exists('error.io') is True
+    assert backend.is_domain_exists('error.io') is True
+    assert backend.queries == ['error.io', 'error.io']
+
+    # Invalid domain.
+    assert backend.is_domain_exists('invalid') is True
+    assert backend.is_domain_exists('invalid') is True
+    assert backend.queries == ['error.io', 'error.io']
+
+    # Result depends on a failed lookup.
+    assert backend.is_maillist_exists('ml@error.io') is True
+    assert backend.is_maillist_exists('ml@error.io') is True
+    assert backend.queries[-2:] == ['ml@error.io', 'error.io']
+    assert backend.queries.count('ml@error.io') == 2
+
+    # Failed lookup doesn't affect next lookups.
+    assert backend.is_maillist_exists('ml@exist.io') is True
+    assert backend.is_maillist_exists('ml@exist.io') is True
+    assert backend.queries.count('ml@exist.io') == 1
+
+
+class FakeChanges(object):
+    """Mailing lists changed since given time, `since` is a counter."""
+    def __init__(self):
+        self.lists = {}
+        self.changed = {}
+        self.since = 0
+
+    def update(self, mail, domains):
+        self.lists[mail] = domains
+        self.changed[mail] = self.since + 1
+
+    def remove(self, mail):
+        del self.lists[mail]
+
+    def get_changed(self, since=None):
+        self.since += 1
+        lists = {k: v for (k, v) in self.lists.items() if since is None or self.changed[k] > since}
+        return (True, (lists, self.since))
+
+
+def test_registry():
+    changes = FakeChanges()
+    changes.update('ml1@a.io', ['a.io', 'alias.io'])
+    changes.update('ml2@b.io', ['b.io'])
+
+    registry = backend_cache.MaillistRegistry(get_changed=changes.get_changed,
+                                              refresh_interval=3600,
+                                              reload_interval=3600)
+
+    assert registry.get() == (True, ['ml1@a.io', 'ml2@b.io'])
+    assert registry.get(domains=['b.io']) == (True, ['ml2@b.io'])
+
+    # Mailing list found with alias domain.
+    assert registry.get(domains=['alias.io']) == (True, ['ml1@a.io'])
+
+    # Alias domain removed.
+    changes.update('ml1@a.io', ['a.io'])
+    changes.update('ml3@b.io', ['b.io'])
+    assert registry.load() == (True, )
+    assert registry.get(domains=['alias.io']) == (True, [])
+    assert registry.get(domains=['a.io', 'b.io']) == (True, ['ml1@a.io', 'ml2@b.io', 'ml3@b.io'])
+
+    # Mailing list removed by other process is found by full reload.
+    changes.remove('ml2@b.io')
+    assert registry.load() == (True, )
+    assert 'ml2@b.io' in registry.get()[1]
+
+    assert registry.load(full=True) == (True, )
+    assert registry.get() == (True, ['ml1@a.io', 'ml3@b.io'])
+
+    # Updated by current process.
+    registry.add('ml4@c.io')
+    registry.discard('ml1@a.io')
+    assert registry.get() == (True, ['ml3@b.io', 'ml4@c.io'])
+    assert registry.get(domains=['a.io']) == (True, [])
+
+    _stats = registry.stats()
+    assert (_stats['domains'], _stats['lists']) == (2, 2)
+
+
+def test_registry_get_all():
+    changes = FakeChanges()
+    changes.update('ml1@a.io', ['a.io', 'alias.io'])
+    changes.update('ml2@b.io', ['b.io'])
+
+    registry = backend_cache.MaillistRegistry(get_changed=changes.get_changed,
+                                              refresh_interval=3600,
+                                              reload_interval=3600,
+                                              get_all=lambda: (True, list(changes.lists)))
+    assert registry.get() == (True, ['ml1@a.io', 'ml2@b.io'])
+
+    # Removed, and created without changing creation time (e.g. by other
+    # programs).
+    changes.remove('ml2@b.io')
+    changes.lists['ml3@c.io'] = ['c.io']
+    changes.changed['ml3@c.io'] = 0
+
+    assert registry.load() == (True, )
+    assert registry.get() == (True, ['ml1@a.io', 'ml3@c.io'])
+    assert registry.get(domains=['b.io']) == (True, [])
+    assert registry.get(domains=['c.io']) == (True, ['ml3@c.io'])
+
+    # Alias domains are kept.
+    assert registry.get(domains=['alias.io']) == (True, ['ml1@a.io'])
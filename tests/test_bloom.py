@@ -0,0 +1,83 @@
+import os
+import pytest
+
+from libs.bloom import BloomFilter
+
+members = ['sub{0:05d}@a.io'.format(i) for i in range(5000)]
+non_members = ['not{0:05d}@b.io'.format(i) for i in range(5000)]
+
+
+def new_filter():
+    bf = BloomFilter.for_capacity(capacity=len(members), fp_rate=0.01)
+    for i in members:
+        bf.add(i)
+
+    return bf
+
+
+def test_no_false_negatives(tmp_path):
+    bf = new_filter()
+    assert all(i in bf for i in members)
+
+    path = str(tmp_path / 'bloom-normal')
+    bf.save(path)
+
+    # Bits are read from file.
+    bf = BloomFilter.load(path)
+    assert bf.bits is None
+    assert all(i in bf for i in members)
+
+    bf = BloomFilter.load(path, header_only=False)
+    assert all(i in bf for i in members)
+
+
+def test_false_positive_rate():
+    bf = new_filter()
+    assert bf.estimated_fp_rate() < 0.02
+
+    _false_positives = len([i for i in non_members if i in bf])
+    assert _false_positives < len(non_members) * 0.03
+
+
+def test_header_round_trip(tmp_path):
+    bf = new_filter()
+    bf.meta = {'letters': {'s': [1, 2, 3]}}
+
+    path = str(tmp_path / 'bloom-normal')
+    bf.save(path)
+
+    loaded = BloomFilter.load(path, header_only=False)
+    assert (loaded.m, loaded.k, loaded.bits_set) == (bf.m, bf.k, bf.bits_set)
+    assert loaded.meta == bf.meta
+    assert loaded.bits == bf.bits
+    assert loaded.offset == bf.offset
+    assert loaded.signature == bf.signature
+
+    # Bits loaded later are same.
+    loaded = BloomFilter.load(path)
+    loaded.load_bits()
+    assert loaded.bits == bf.bits
+
+    # No temporary file left.
+    assert os.listdir(str(tmp_path)) == ['bloom-normal']
+
+
+def test_replaced_file(tmp_path):
+    path = str(tmp_path / 'bloom-normal')
+    new_filter().save(path)
+
+    bf = BloomFilter.load(path)
+
+    # File is replaced by a new filter.
+    _new = new_filter()
+    _new.add('new@a.io')
+    _new.save(path)
+
+    with pytest.raises(ValueError):
+        assert members[0] in bf
+
+    with open(path, 'wb') as f:
+        f.write(b'invalid 2\n{}')
+
+    with pytest.raises(ValueError):
+        BloomFilter.load(path)
@@ -1,5 +1,9 @@
 # encoding: utf-8
-from . import get, put, debug
+import os
+import requests
+import settings
+from libs import mlmmj
+from . import get, put, debug, base_url, api_headers
 from .utils import create_ml, remove_ml
 from . import data
 
@@ -51,6 +55,70 @@ def test_update_ml():
         assert params[k] == _data[k]
 
 
+def test_get_ml_params():
+    _json = get(url=data.url_ml + '?params=owner,moderated,footer_text,invalid')
+    assert _json['_success'] is True
+    assert sorted(_json['_data']) == ['footer_text', 'moderated', 'owner']
+    assert isinstance(_json['_data']['owner'], list)
+    assert _json['_data']['moderated'] in ['yes', 'no']
+
+
+def test_get_profiles():
+    _json = get(url=data.url_ml + '?params=owner,moderated')
+    _profile = _json['_data']
+
+    _json = get(url='/api/profiles?lists=%s,not-exist@%s&params=owner,moderated' % (data.ml, data.domain))
+    assert _json['_success'] is True
+    assert _json['_data'] == {data.ml: _profile}
+
+    _json = get(url='/api/profiles?lists=invalid')
+    assert _json['_data'] == {}
+
+
+def test_profile_etag():
+    r = requests.get(base_url + data.url_ml, headers=api_headers)
+    _etag = r.headers['ETag']
+
+    _headers = dict(api_headers)
+    _headers['If-None-Match'] = _etag
+    r = requests.get(base_url + data.url_ml, headers=_headers)
+    assert r.status_code == 304
+    assert not r.content
+
+    # Different query returns different content.
+    r = requests.get(base_url + data.url_ml + '?params=owner', headers=_headers)
+    assert r.status_code == 200
+
+    _moderated = get(url=data.url_ml)['_data']['moderated']
+    _json = put(url=data.url_ml, data={'moderated': {'yes': 'no', 'no': 'yes'}[_moderated]})
+    assert _json['_success'] is True
+
+    r = requests.get(base_url + data.url_ml, headers=_headers)
+    assert r.status_code == 200
+    assert r.headers['ETag'] != _etag
+
+    _json = put(url=data.url_ml, data={'moderated': _moderated})
+    assert _json['_success'] is True
+
+
+def test_profile_signature_replaced_file():
+    _sig = mlmmj.get_profile_signature(mail=data.ml)
+
+    # Control file replaced with same size and modification time.
+    _path = os.path.join(settings.MLMMJ_SPOOL_DIR, data.domain, data.listname, 'control', 'owner')
+    _st = os.stat(_path)
+    with open(_path) as f:
+        _content = f.read()
+
+    with open(_path + '.new', 'w') as f:
+        f.write(_content)
+
+    os.utime(_path + '.new', ns=(_st.st_atime_ns, _st.st_mtime_ns))
+    os.replace(_path + '.new', _path)
+
+    assert mlmmj.get_profile_signature(mail=data.ml) != _sig
+
+
 def test_archive_ml():
     # TODO How to get path of archived ml directory?
     # TODO How to verify path exists?
@@ -0,0 +1,171 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from libs import mlmmj
+
+merge_lines_in_file = getattr(mlmmj, '__merge_lines_in_file')
+
+
+def subscriber_file(tmp_path, lines=None):
+    _dir = tmp_path / 'subscribers.d'
+    _dir.mkdir()
+
+    path = str(_dir / 's')
+    if lines is not None:
+        with open(path, 'w') as f:
+            f.write(''.join(i + '\n' for i in lines))
+
+    return path
+
+
+def read_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def test_merge_sorted_file(tmp_path):
+    path = subscriber_file(tmp_path, ['sub01@a.io', 'sub03@a.io', 'sub05@a.io'])
+
+    qr = merge_lines_in_file(path,
+                             add_lines=['sub04@a.io', 'sub02@a.io', 'sub03@a.io'],
+                             remove_lines=['sub05@a.io', 'not-exist@a.io'])
+    assert qr == (True, )
+    assert read_lines(path) == ['sub01@a.io', 'sub02@a.io', 'sub03@a.io', 'sub04@a.io']
+
+    # Nothing changed, file is not replaced.
+    _inode = os.stat(path).st_ino
+    qr = merge_lines_in_file(path, add_lines=['sub01@a.io'], remove_lines=['not-exist@a.io'])
+    assert qr == (True, )
+    assert os.stat(path).st_ino == _inode
+
+    # File is removed if no lines left.
+    qr = merge_lines_in_file(path, remove_lines=read_lines(path))
+    assert qr == (True, )
+    assert not os.path.exists(path)
+
+
+def test_merge_unsorted_file(tmp_path):
+    # mlmmj appends new subscriber to the end, and may leave duplicate lines.
+    path = subscriber_file(tmp_path, ['sub03@a.io', 'sub01@a.io', '', 'sub05@a.io', 'sub01@a.io'])
+
+    qr = merge_lines_in_file(path, add_lines=['sub02@a.io'], remove_lines=['sub05@a.io'])
+    assert qr == (True, )
+    assert read_lines(path) == ['sub01@a.io', 'sub02@a.io', 'sub03@a.io']
+
+    # Unsorted file is sorted even if no lines are added or removed.
+    path = str(tmp_path / 'subscribers.d' / 't')
+    with open(path, 'w') as f:
+        f.write('sub02@a.io\nsub01@a.io\n')
+
+    qr = merge_lines_in_file(path, add_lines=['sub01@a.io'])
+    assert qr == (True, )
+    assert read_lines(path) == ['sub01@a.io', 'sub02@a.io']
+
+
+def test_merge_new_file(tmp_path):
+    path = subscriber_file(tmp_path)
+
+    # Removing lines from a file which doesn't exist.
+    assert merge_lines_in_file(path, remove_lines=['sub01@a.io']) == (True, )
+    assert not os.path.exists(path)
+
+    assert merge_lines_in_file(path, add_lines=['sub02@a.io', 'sub01@a.io']) == (True, )
+    assert read_lines(path) == ['sub01@a.io', 'sub02@a.io']
+
+    # No temporary file left in working directory.
+    assert [i for i in os.listdir(str(tmp_path / '.mlmmjadmin')) if '.tmp.' in i] == []
+
+
+def test_merge_keep_order(tmp_path):
+    _dir = tmp_path / 'control'
+    _dir.mkdir()
+    path = str(_dir / 'owner')
+
+    with open(path, 'w') as f:
+        f.write('owner3@a.io\nowner1@a.io\nowner2@a.io\n')
+
+    qr = merge_lines_in_file(path,
+                             add_lines=['owner5@a.io', 'owner1@a.io', 'owner4@a.io'],
+                             remove_lines=['owner2@a.io'],
+                             keep_order=True)
+    assert qr == (True, )
+    assert read_lines(path) == ['owner3@a.io', 'owner1@a.io', 'owner5@a.io', 'owner4@a.io']
+
+
+def test_concurrent_merge(tmp_path):
+    path = subscriber_file(tmp_path, ['sub{0:03d}@a.io'.format(i) for i in range(0, 400, 2)])
+
+    # Writers add and remove different lines of same file at the same time.
+    def _add(n):
+        return merge_lines_in_file(path, add_lines=['sub{0:03d}@a.io'.format(i) for i in range(n, 400, 8)])
+
+    def _remove(n):
+        return merge_lines_in_file(path, remove_lines=['sub{0:03d}@a.io'.format(i) for i in range(n, 400, 8)])
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        _futures = [executor.submit(_add, 1),
+                    executor.submit(_add, 3),
+                    executor.submit(_add, 5),
+                    executor.submit(_add, 7),
+                    executor.submit(_remove, 0),
+                    executor.submit(_remove, 4)]
+        assert [f.result() for f in _futures] == [(True, )] * 6
+
+    _expected = ['sub{0:03d}@a.io'.format(i) for i in range(400) if i % 4 != 0]
+    assert read_lines(path) == _expected
+
+
+def test_stale_tmp_file(tmp_path):
+    path = subscriber_file(tmp_path, ['sub01@a.io'])
+
+    # Temporary file left by an interrupted update.
+    _tmp = getattr(mlmmj, '__get_work_file')(path, suffix='.tmp.') + 'abcd'
+    with open(_tmp, 'w') as f:
+        f.write('sub02@a.io\n')
+
+    assert merge_lines_in_file(path, add_lines=['sub03@a.io']) == (True, )
+    assert read_lines(path) == ['sub01@a.io', 'sub03@a.io']
+    assert not os.path.exists(_tmp)
+
+
+def test_filter_not_matched_file(tmp_path):
+    filter_lines_in_file = getattr(mlmmj, '__filter_lines_in_file')
+    path = subscriber_file(tmp_path, ['sub01@a.io', 'sub02@b.io'])
+    _st = os.stat(path)
+
+    # File without matched lines is not locked nor rewritten.
+    qr = filter_lines_in_file(path, func=lambda line: line.endswith('@c.io'))
+    assert qr == (True, [])
+    assert (os.stat(path).st_ino, os.stat(path).st_mtime_ns) == (_st.st_ino, _st.st_mtime_ns)
+    assert not os.path.exists(str(tmp_path / '.mlmmjadmin'))
+
+    qr = filter_lines_in_file(path, func=lambda line: line.endswith('@b.io'))
+    assert qr == (True, ['sub02@b.io'])
+    assert read_lines(path) == ['sub01@a.io']
+
+    # File doesn't exist.
+    qr = filter_lines_in_file(str(tmp_path / 'subscribers.d' / 'x'), func=lambda line: True)
+    assert qr == (True, [])
+
+
+def test_sort_lines_in_chunks(tmp_path, monkeypatch):
+    iter_sorted_unique_lines = getattr(mlmmj, '__iter_sorted_unique_lines')
+    monkeypatch.setattr(mlmmj.settings, 'MLMMJ_IMPORT_SORT_CHUNK_SIZE', 3)
+
+    _lines = ['sub{0:02d}@a.io'.format(i) for i in [5, 1, 9, 3, 1, 7, 2, 9, 8, 4]]
+    assert list(iter_sorted_unique_lines(_lines, str(tmp_path))) == sorted(set(_lines))
+
+    # Temporary files of chunks are removed.
+    assert os.listdir(str(tmp_path)) == []
+
+    assert list(iter_sorted_unique_lines(['b', 'a', 'b'], str(tmp_path))) == ['a', 'b']
+
+
+def test_sorted_file_subscribers(tmp_path, monkeypatch):
+    iter_sorted_file_subscribers = getattr(mlmmj, '__iter_sorted_file_subscribers')
+    monkeypatch.setattr(mlmmj.settings, 'MLMMJ_IMPORT_SORT_CHUNK_SIZE', 2)
+
+    path = subscriber_file(tmp_path, ['sub03@a.io', 'Sub01@a.io', '', 'sub02@a.io'])
+    assert list(iter_sorted_file_subscribers(path, str(tmp_path))) == ['sub01@a.io', 'sub02@a.io', 'sub03@a.io']
+
+    assert list(iter_sorted_file_subscribers(path + '-not-exist', str(tmp_path))) == []
@@ -0,0 +1,93 @@
+import time
+import threading
+
+from libs import mlmmj
+
+lists = ['list{0:02d}@a.io'.format(i) for i in range(20)]
+
+
+def test_run_for_lists():
+    _threads = set()
+
+    def _func(mail, suffix):
+        _threads.add(threading.current_thread().name)
+
+        # Mailing lists processed first return last.
+        time.sleep(0.01 * (20 - int(mail[4:6])) / 20)
+
+        if mail == lists[3]:
+            raise ValueError('invalid')
+
+        if mail == lists[5]:
+            return (False, 'ERROR')
+
+        return (True, mail + suffix)
+
+    _results = mlmmj.run_for_lists(_func, lists=lists, suffix='-ok')
+
+    # Results are returned in same order as mailing lists.
+    assert [i[0] for i in _results] == lists
+    assert _results[0] == (lists[0], (True, lists[0] + '-ok'))
+    assert _results[3] == (lists[3], (False, repr(ValueError('invalid'))))
+    assert _results[5] == (lists[5], (False, 'ERROR'))
+
+    # Processed in worker threads concurrently.
+    assert len(_threads) > 1
+    assert threading.current_thread().name not in _threads
+
+
+def test_run_for_lists_nested():
+    # Called in a worker thread, mailing lists are processed in same thread
+    # instead of waiting for other workers.
+    def _inner(mail):
+        return (True, threading.current_thread().name)
+
+    def _outer(mail):
+        _name = threading.current_thread().name
+        _results = mlmmj.run_for_lists(_inner, lists=lists)
+        return (True, all(qr[1] == _name for (_mail, qr) in _results))
+
+    _results = mlmmj.run_for_lists(_outer, lists=lists[:10])
+    assert all(qr == (True, True) for (_mail, qr) in _results)
+
+
+def test_iter_for_lists():
+    _started = []
+
+    def _func(mail):
+        _started.append(mail)
+
+        # First mailing list is the slowest one.
+        if mail == lists[0]:
+            time.sleep(0.2)
+
+        return (True, mail)
+
+    # Results are returned once processed.
+    _order = [mail for (mail, qr) in mlmmj.iter_for_lists(_func, lists=lists[:4])]
+    assert _order[-1] == lists[0]
+    assert sorted(_order) == lists[:4]
+
+    # Mailing lists not processed yet are cancelled.
+    _started.clear()
+    _results = mlmmj.iter_for_lists(_func, lists=lists * 10)
+    next(_results)
+    _results.close()
+    time.sleep(0.3)
+    assert len(_started) < len(lists) * 10
+
+
+def test_subscribe_to_lists_errors(monkeypatch):
+    def _add_subscribers(mail, subscribers, subscription, require_confirm):
+        if mail in lists[:2]:
+            return (False, 'ERROR')
+
+        return (True, )
+
+    monkeypatch.setattr(mlmmj, 'add_subscribers', _add_subscribers)
+
+    qr = mlmmj.subscribe_to_lists(subscriber='sub01@a.io', lists=lists[:5] + ['invalid'])
+    assert qr == (False, repr({lists[0]: 'ERROR', lists[1]: 'ERROR'}))
+
+    qr = mlmmj.subscribe_to_lists(subscriber='sub01@a.io', lists=lists[2:5])
+    assert qr == (True, )
@@ -0,0 +1,179 @@
+import time
+import threading
+import pytest
+
+from libs.pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConn(object):
+    def __init__(self, n):
+        self.n = n
+        self.closed = False
+        self.alive = True
+        self.broken = False
+
+
+class FakeServer(object):
+    def __init__(self):
+        self.conns = []
+        self.refuse = False
+
+    def connect(self):
+        if self.refuse:
+            raise ConnectionError('refused')
+
+        conn = FakeConn(len(self.conns))
+        self.conns.append(conn)
+        return conn
+
+    def close(self, conn):
+        conn.closed = True
+
+    def ping(self, conn):
+        return conn.alive
+
+    def is_broken(self, conn):
+        return conn.broken
+
+
+def new_pool(server, **kw):
+    return ConnectionPool(connect=server.connect,
+                          close=server.close,
+                          ping=server.ping,
+                          is_broken=server.is_broken,
+                          **kw)
+
+
+def test_acquire_release():
+    server = FakeServer()
+    pool = new_pool(server, max_size=2)
+
+    conn = pool.acquire()
+    assert pool.stats()['in_use'] == 1
+
+    pool.release(conn)
+    assert pool.stats()['idle'] == 1
+
+    # Idle connection is reused.
+    assert pool.acquire() is conn
+    pool.release(conn)
+
+    _stats = pool.stats()
+    assert (_stats['requests'], _stats['created'], _stats['size']) == (2, 1, 1)
+
+
+def test_timeout():
+    server = FakeServer()
+    pool = new_pool(server, max_size=1, wait_timeout=0.1)
+
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+    assert pool.stats()['wait_timeouts'] == 1
+
+    # Waiting thread gets the connection once it's returned.
+    threading.Timer(0.05, pool.release, args=(conn, )).start()
+    pool.wait_timeout = 2
+    assert pool.acquire() is conn
+    assert pool.stats()['waits'] == 2
+
+
+def test_broken_connection():
+    server = FakeServer()
+    pool = new_pool(server, max_size=1)
+
+    conn = pool.acquire()
+    conn.broken = True
+    pool.release(conn)
+
+    # Broken connection is closed instead of returned to pool.
+    assert conn.closed
+    assert pool.stats()['broken'] == 1
+    assert pool.stats()['size'] == 0
+
+    _new = pool.acquire()
+    assert _new is not conn
+    pool.release(_new)
+
+
+def test_ping_failure():
+    server = FakeServer()
+    pool = new_pool(server, max_size=1, check_interval=0)
+
+    conn = pool.acquire()
+    pool.release(conn)
+
+    # Connection closed by server is replaced.
+    conn.alive = False
+    _new = pool.acquire()
+    assert _new is not conn
+    assert conn.closed
+    assert pool.stats()['check_failures'] == 1
+    assert pool.stats()['size'] == 1
+
+
+def test_connect_failure():
+    server = FakeServer()
+    pool = new_pool(server, max_size=1, wait_timeout=0.1)
+
+    server.refuse = True
+    with pytest.raises(ConnectionError):
+        pool.acquire()
+
+    # Slot reserved for failed connection is freed.
+    assert pool.stats()['size'] == 0
+
+    server.refuse = False
+    conn = pool.acquire()
+    pool.release(conn)
+
+
+def test_idle_timeout():
+    server = FakeServer()
+    pool = new_pool(server, max_size=2, idle_timeout=0.05)
+
+    conn = pool.acquire()
+    pool.release(conn)
+    time.sleep(0.1)
+
+    # Expired connection is closed.
+    _new = pool.acquire()
+    assert _new is not conn
+    assert conn.closed
+    assert pool.stats()['closed'] == 1
+
+
+def test_dead_connection():
+    # Connection closed by server still looks open (e.g. `open` of MySQLdb),
+    # only a query detects it.
+    server = FakeServer()
+
+    def _ping(conn):
+        if not conn.alive:
+            raise ConnectionError('server has gone away')
+
+        return True
+
+    pool = ConnectionPool(connect=server.connect,
+                          close=server.close,
+                          ping=_ping,
+                          is_broken=server.is_broken,
+                          max_size=1,
+                          check_interval=0)
+
+    conn = pool.acquire()
+    pool.release(conn)
+
+    # Server closed the idle connection, it's replaced before reusing.
+    conn.alive = False
+    _new = pool.acquire()
+    assert _new is not conn
+    assert conn.closed
+    assert pool.stats()['check_failures'] == 1
+
+    # Connection lost while querying is closed instead of returned to pool.
+    _new.broken = True
+    pool.release(_new)
+    assert _new.closed
+    assert pool.stats()['size'] == 0
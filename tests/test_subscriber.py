@@ -0,0 +1,429 @@
+import os
+import json
+import time
+import requests
+import settings
+from . import get, post, put, delete, debug, base_url, api_headers
+from .utils import create_ml
+from . import data
+
+
+def test_add_subscribers():
+    create_ml(_remove_ml=False)
+
+    _json = post(url=data.url_subscribers, data={'add_subscribers': ','.join(data.subscribers),
+                                                 'require_confirm': 'no'})
+    assert _json['_success'] is True
+
+    _json = get(url=data.url_subscribers + '?email_only')
+    assert _json['_success'] is True
+    assert _json['_data'] == sorted(data.subscribers)
+
+    for i in data.subscribers:
+        _json = get(url=data.url_ml + '/has_subscriber/' + i)
+        assert _json['_success'] is True
+        assert _json['_data'] == 'normal'
+
+
+def test_has_subscribers():
+    _json = post(url=data.url_ml + '/has_subscribers',
+                 data={'subscribers': ','.join(data.subscribers[:2] + ['nobody@a.io', 'nobody@z.io'])})
+    assert _json['_success'] is True
+    assert _json['_data'] == {data.subscribers[0]: 'normal',
+                              data.subscribers[1]: 'normal',
+                              'nobody@a.io': None,
+                              'nobody@z.io': None}
+
+
+def test_subscribed_lists():
+    for i in data.subscribers:
+        _json = get(url='/api/subscriber/{}/subscribed?query_all_lists=yes&email_only=yes'.format(i))
+        assert _json['_success'] is True
+
+        if data.ml not in _json['_data']:
+            debug(_json)
+
+        assert data.ml in _json['_data']
+
+
+def test_paginate_subscribers():
+    _subscribers = []
+    _url = data.url_subscribers + '?email_only&limit=2'
+    while True:
+        _json = get(url=_url)
+        assert _json['_success'] is True
+        assert len(_json['_data']) <= 2
+
+        _subscribers += _json['_data']
+        if not _json['_next']:
+            break
+
+        _url = data.url_subscribers + '?email_only&limit=2&after=' + _json['_next']
+
+    assert _subscribers == sorted(data.subscribers)
+
+
+def test_stream_subscribers():
+    r = requests.get(base_url + data.url_subscribers + '?format=ndjson', headers=api_headers)
+    _rows = [json.loads(i) for i in r.text.splitlines()]
+
+    assert sorted(i['mail'] for i in _rows) == sorted(data.subscribers)
+    assert {i['subscription'] for i in _rows} == {'normal'}
+
+
+def test_subscribers_etag():
+    r = requests.get(base_url + data.url_subscribers, headers=api_headers)
+    _etag = r.headers['ETag']
+
+    _headers = dict(api_headers)
+    _headers['If-None-Match'] = _etag
+    r = requests.get(base_url + data.url_subscribers, headers=_headers)
+    assert r.status_code == 304
+    assert not r.content
+
+    # Different query returns different content.
+    r = requests.get(base_url + data.url_subscribers + '?email_only', headers=_headers)
+    assert r.status_code == 200
+
+    _json = post(url=data.url_subscribers, data={'add_subscribers': 'etag@e.io', 'require_confirm': 'no'})
+    assert _json['_success'] is True
+
+    r = requests.get(base_url + data.url_subscribers, headers=_headers)
+    assert r.status_code == 200
+    assert r.headers['ETag'] != _etag
+    assert {'mail': 'etag@e.io', 'subscription': 'normal'} in r.json()['_data']
+
+    _json = post(url=data.url_subscribers, data={'remove_subscribers': 'etag@e.io'})
+    assert _json['_success'] is True
+
+
+def test_count_subscribers():
+    _json = get(url=data.url_subscribers + '/count')
+    assert _json['_success'] is True
+    assert _json['_data'] == {'normal': len(data.subscribers), 'digest': 0, 'nomail': 0}
+
+    _json = get(url='/api/subscribers/count?lists={0},not-exist@{1}'.format(data.ml, data.domain))
+    assert _json['_success'] is True
+    assert _json['_data'] == {data.ml: {'normal': len(data.subscribers), 'digest': 0, 'nomail': 0}}
+
+    # Empty lines are not counted.
+    _path_z = os.path.join(settings.MLMMJ_SPOOL_DIR, data.domain, data.listname, 'subscribers.d', 'z')
+    with open(_path_z, 'w') as f:
+        f.write('\nzz@z.io\n  \n\n')
+
+    try:
+        _json = get(url=data.url_subscribers + '/count')
+        assert _json['_data']['normal'] == len(data.subscribers) + 1
+
+        _json = get(url=data.url_subscribers + '?email_only')
+        assert len(_json['_data']) == len(data.subscribers) + 1
+    finally:
+        os.remove(_path_z)
+
+
+def test_sync_subscribers():
+    _json = post(url=data.url_subscribers, data={'add_subscribers': 'keep@k.io', 'require_confirm': 'no'})
+    assert _json['_success'] is True
+
+    _path_k = os.path.join(settings.MLMMJ_SPOOL_DIR, data.domain, data.listname, 'subscribers.d', 'k')
+    _mtime_k = os.stat(_path_k).st_mtime_ns
+
+    _normal = data.subscribers[:4] + ['new01@d.io', 'keep@k.io']
+    _json = put(url=data.url_subscribers, data={'normal': ','.join(_normal),
+                                                'digest': data.subscribers[4]})
+    assert _json['_success'] is True
+    assert _json['_data'] == {'normal': {'added': 1, 'removed': 1},
+                              'digest': {'added': 1, 'removed': 0}}
+
+    _json = get(url=data.url_ml + '/has_subscriber/' + data.subscribers[4])
+    assert _json['_data'] == 'digest'
+
+    _json = get(url=data.url_ml + '/has_subscriber/new01@d.io')
+    assert _json['_data'] == 'normal'
+
+    # Subscriber file without changes is not rewritten.
+    assert os.stat(_path_k).st_mtime_ns == _mtime_k
+
+    # Restore subscribers.
+    _json = put(url=data.url_subscribers, data={'normal': ','.join(data.subscribers), 'digest': ''})
+    assert _json['_success'] is True
+    assert _json['_data'] == {'normal': {'added': 1, 'removed': 2},
+                              'digest': {'added': 0, 'removed': 1}}
+
+    _json = get(url=data.url_subscribers + '?email_only')
+    assert _json['_data'] == sorted(data.subscribers)
+
+    # Subscriber stored in mixed cases (e.g. added by mlmmj) is removed.
+    _path_m = os.path.join(settings.MLMMJ_SPOOL_DIR, data.domain, data.listname, 'subscribers.d', 'm')
+    with open(_path_m, 'w') as f:
+        f.write('Mixed@M.io\n')
+
+    _json = put(url=data.url_subscribers, data={'normal': ','.join(data.subscribers)})
+    assert _json['_success'] is True
+    assert _json['_data'] == {'normal': {'added': 0, 'removed': 1}}
+    assert not os.path.exists(_path_m)
+
+    # Given subscriber is removed from subscription version not given.
+    _json = post(url=data.url_subscribers, data={'add_subscribers': 'nomail@n.io',
+                                                 'subscription': 'nomail',
+                                                 'require_confirm': 'no'})
+    assert _json['_success'] is True
+
+    _json = put(url=data.url_subscribers, data={'normal': ','.join(data.subscribers + ['nomail@n.io'])})
+    assert _json['_success'] is True
+    assert _json['_data'] == {'normal': {'added': 1, 'removed': 0},
+                              'nomail': {'added': 0, 'removed': 1}}
+
+    _json = get(url=data.url_ml + '/has_subscriber/nomail@n.io')
+    assert _json['_data'] == 'normal'
+
+    _json = put(url=data.url_subscribers, data={'normal': ','.join(data.subscribers)})
+    assert _json['_data'] == {'normal': {'added': 0, 'removed': 1}}
+
+    _json = put(url=data.url_subscribers, data={'normal': 'dup@a.io', 'nomail': 'dup@a.io'})
+    assert _json['_success'] is False
+    assert _json['_msg'] == 'SUBSCRIBER_IN_MULTIPLE_SUBSCRIPTIONS'
+
+
+def test_move_subscribers():
+    _json = post(url=data.url_subscribers, data={'move_subscribers': data.subscribers[0] + ',not-sub@a.io',
+                                                 'subscription': 'digest'})
+    assert _json['_success'] is True
+    assert _json['_data'] == {'moved': 1, 'unchanged': 0, 'not_found': 1}
+
+    _json = get(url=data.url_ml + '/has_subscriber/' + data.subscribers[0])
+    assert _json['_data'] == 'digest'
+
+    _json = post(url=data.url_subscribers, data={'move_subscribers': data.subscribers[0],
+                                                 'subscription': 'digest'})
+    assert _json['_data'] == {'moved': 0, 'unchanged': 1, 'not_found': 0}
+
+    _json = post(url=data.url_subscribers, data={'move_subscribers': data.subscribers[0],
+                                                 'subscription': 'invalid'})
+    assert _json['_success'] is False
+    assert _json['_msg'] == 'INVALID_SUBSCRIPTION'
+
+    # Move back.
+    _json = post(url=data.url_subscribers, data={'move_subscribers': data.subscribers[0]})
+    assert _json['_data'] == {'moved': 1, 'unchanged': 0, 'not_found': 0}
+
+    _json = get(url=data.url_ml + '/has_subscriber/' + data.subscribers[0])
+    assert _json['_data'] == 'normal'
+
+    # Subscriber stored in mixed cases (e.g. added by mlmmj) is moved.
+    _path_m = os.path.join(settings.MLMMJ_SPOOL_DIR, data.domain, data.listname, 'subscribers.d', 'm')
+    with open(_path_m, 'w') as f:
+        f.write('Mixed@M.io\n')
+
+    _json = post(url=data.url_subscribers, data={'move_subscribers': 'mixed@m.io',
+                                                 'subscription': 'digest'})
+    assert _json['_data'] == {'moved': 1, 'unchanged': 0, 'not_found': 0}
+    assert not os.path.exists(_path_m)
+
+    _json = get(url=data.url_ml + '/has_subscriber/mixed@m.io')
+    assert _json['_data'] == 'digest'
+
+    _json = post(url=data.url_subscribers, data={'remove_subscribers': 'mixed@m.io'})
+    assert _json['_success'] is True
+
+
+def test_import_subscribers():
+    _body = '\n'.join(['imp01@a.io', '"IMP02@b.io",Name', 'invalid', data.subscribers[0], 'imp01@a.io', ''])
+    r = requests.post(base_url + data.url_subscribers + '/import?subscription=digest',
+                      data=_body.encode(),
+                      headers=api_headers)
+    _json = r.json()
+    assert _json['_success'] is True
+    assert _json['_data'] == {'added': 2, 'duplicate': 2, 'invalid': 1}
+
+    for i in ['imp01@a.io', 'imp02@b.io']:
+        _json = get(url=data.url_ml + '/has_subscriber/' + i)
+        assert _json['_data'] == 'digest'
+
+    _json = post(url=data.url_subscribers, data={'remove_subscribers': 'imp01@a.io,imp02@b.io'})
+    assert _json['_success'] is True
+
+    # Existing subscriber stored in mixed cases in an unsorted file (e.g.
+    # added by mlmmj) is a duplicate.
+    _path_i = os.path.join(settings.MLMMJ_SPOOL_DIR, data.domain, data.listname, 'subscribers.d', 'i')
+    with open(_path_i, 'w') as f:
+        f.write('imp05@a.io\nImp03@a.io\n')
+
+    _body = '\n'.join(['imp04@a.io', 'imp03@a.io', 'imp06@a.io', 'imp04@a.io'])
+    r = requests.post(base_url + data.url_subscribers + '/import',
+                      data=_body.encode(),
+                      headers=api_headers)
+    assert r.json()['_data'] == {'added': 2, 'duplicate': 2, 'invalid': 0}
+
+    with open(_path_i) as f:
+        assert f.read().splitlines() == ['Imp03@a.io', 'imp04@a.io', 'imp05@a.io', 'imp06@a.io']
+
+    _json = post(url=data.url_subscribers, data={'remove_subscribers': 'imp04@a.io,imp05@a.io,imp06@a.io'})
+    assert _json['_success'] is True
+
+    os.remove(_path_i)
+
+
+def test_add_subscribers_async():
+    _json = post(url=data.url_subscribers, data={'add_subscribers': 'async01@a.io,async02@b.io',
+                                                 'require_confirm': 'no',
+                                                 'async': 'yes'})
+    assert _json['_success'] is True
+    job_id = _json['_data']['job_id']
+
+    for _ in range(50):
+        _json = get(url='/api/jobs/' + job_id)
+        assert _json['_success'] is True
+        if _json['_data']['status'] != 'running':
+            break
+
+        time.sleep(0.1)
+
+    assert _json['_data']['status'] == 'done'
+    assert _json['_data']['items'] == {'async01@a.io': 'ADDED', 'async02@b.io': 'ADDED'}
+
+    for i in ['async01@a.io', 'async02@b.io']:
+        _json = get(url=data.url_ml + '/has_subscriber/' + i)
+        assert _json['_data'] == 'normal'
+
+    # Subscribers are added before removed.
+    _json = post(url=data.url_subscribers, data={'add_subscribers': 'async03@a.io',
+                                                 'remove_subscribers': 'async01@a.io,async02@b.io,async03@a.io',
+                                                 'require_confirm': 'no',
+                                                 'async': 'yes'})
+    job_id = _json['_data']['job_id']
+
+    for _ in range(50):
+        _json = get(url='/api/jobs/' + job_id)
+        if _json['_data']['status'] != 'running':
+            break
+
+        time.sleep(0.1)
+
+    assert _json['_data']['status'] == 'done'
+
+    for i in ['async01@a.io', 'async02@b.io', 'async03@a.io']:
+        _json = get(url=data.url_ml + '/has_subscriber/' + i)
+        assert _json['_success'] is False
+
+    _json = get(url='/api/jobs/' + '0' * 32)
+    assert _json['_msg'] == 'NO_SUCH_JOB'
+
+
+def test_pending_subscribers():
+    # Confirm files are generated by `mlmmj-sub`, create them directly.
+    _dir = os.path.join(settings.MLMMJ_SPOOL_DIR, data.domain, data.listname, 'subconf')
+    for (cookie, addr) in [('a' * 16, 'pend01@a.io'), ('b' * 16, 'pend02@b.io'), ('c' * 16, 'pend01@a.io')]:
+        with open(os.path.join(_dir, cookie + '-' + addr.replace('@', '=')), 'w') as f:
+            f.write(addr + '\n')
+
+    _url = data.url_ml + '/pending_subscribers'
+    _json = get(url=_url)
+    assert _json['_success'] is True
+    assert [i['mail'] for i in _json['_data']] == ['pend01@a.io', 'pend02@b.io']
+
+    _json = delete(url=_url + '?subscribers=pend01@a.io')
+    assert _json['_success'] is True
+    assert _json['_data'] == {'removed': 1}
+
+    _json = get(url=_url)
+    assert [i['mail'] for i in _json['_data']] == ['pend02@b.io']
+
+    _json = delete(url=_url + '?subscribers=ALL')
+    assert _json['_data'] == {'removed': 1}
+    assert os.listdir(_dir) == []
+
+
+def test_administered_lists():
+    _url = '/api/subscriber/{}/administered?query_all_lists=yes'
+
+    _json = get(url=_url.format('1@x.io'))
+    assert _json['_success'] is True
+    assert {'mail': data.ml, 'role': 'owner'} in _json['_data']
+
+    _json = put(url=data.url_ml + '/owners', data={'add_owners': 'admin@a.io'})
+    assert _json['_success'] is True
+
+    _json = put(url=data.url_ml + '/moderators', data={'add_moderators': 'admin@a.io'})
+    assert _json['_success'] is True
+
+    _json = get(url=_url.format('admin@a.io') + '&email_only=yes')
+    assert data.ml in _json['_data']
+
+    _json = get(url=_url.format('admin@a.io'))
+    assert [i['role'] for i in _json['_data'] if i['mail'] == data.ml] == ['moderator', 'owner']
+
+    _json = put(url=data.url_ml + '/owners', data={'remove_owners': 'admin@a.io'})
+    assert _json['_success'] is True
+
+    _json = put(url=data.url_ml + '/moderators', data={'remove_moderators': 'admin@a.io'})
+    assert _json['_success'] is True
+
+    _json = get(url=_url.format('admin@a.io'))
+    assert data.ml not in [i['mail'] for i in _json['_data']]
+
+
+def test_remove_subscriber_from_all_lists():
+    _json = post(url=data.url_subscribers, data={'add_subscribers': 'gone@a.io',
+                                                 'subscription': 'digest',
+                                                 'require_confirm': 'no'})
+    assert _json['_success'] is True
+
+    _json = delete(url='/api/subscriber/gone@a.io')
+    assert _json['_success'] is True
+    assert _json['_data'] == [{'mail': data.ml, 'subscription': 'digest'}]
+
+    _json = get(url=data.url_ml + '/has_subscriber/gone@a.io')
+    assert _json['_success'] is False
+
+    _json = delete(url='/api/subscriber/gone@a.io')
+    assert _json['_success'] is True
+    assert _json['_data'] == []
+
+
+def test_remove_domain_subscribers():
+    _json = post(url=data.url_subscribers, data={'add_subscribers': 'p1@purge.io,p2@purge.io,p3@notpurge.io',
+                                                 'require_confirm': 'no'})
+    assert _json['_success'] is True
+
+    _json = delete(url='/api/domain/purge.io/subscribers')
+    assert _json['_success'] is True
+    job_id = _json['_data']['job_id']
+
+    for _ in range(50):
+        _json = get(url='/api/jobs/' + job_id)
+        if _json['_data']['status'] != 'running':
+            break
+
+        time.sleep(0.1)
+
+    assert _json['_data']['status'] == 'done'
+    assert _json['_data']['result']['removed'] == 2
+
+    _json = post(url=data.url_ml + '/has_subscribers', data={'subscribers': 'p1@purge.io,p2@purge.io,p3@notpurge.io'})
+    assert _json['_data'] == {'p1@purge.io': None, 'p2@purge.io': None, 'p3@notpurge.io': 'normal'}
+
+    _json = post(url=data.url_subscribers, data={'remove_subscribers': 'p3@notpurge.io'})
+    assert _json['_success'] is True
+
+
+def test_remove_subscribers():
+    _removed = data.subscribers[:2]
+    _json = post(url=data.url_subscribers, data={'remove_subscribers': ','.join(_removed)})
+    assert _json['_success'] is True
+
+    _json = get(url=data.url_subscribers + '?email_only')
+    assert _json['_success'] is True
+    assert _json['_data'] == sorted(data.subscribers[2:])
+
+    for i in _removed:
+        _json = get(url='/api/subscriber/{}/subscribed?query_all_lists=yes&email_only=yes'.format(i))
+        assert _json['_success'] is True
+        assert data.ml not in _json['_data']
+
+    _json = post(url=data.url_subscribers, data={'remove_subscribers': 'ALL'})
+    assert _json['_success'] is True
+
+    _json = get(url=data.url_subscribers + '?email_only')
+    assert _json['_success'] is True
+    assert _json['_data'] == []
@@ -13,8 +13,10 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/../backends')
 
 import web
 web.config.debug = False
+web.ctx.ip = '127.0.0.1'
 
 from libs.utils import is_email, is_domain, bytes2str, str2bytes
+from libs.mlmmj import iter_for_lists
 import settings
 
 usage = """Usage:
@@ -51,7 +53,9 @@ verify_ssl = False
 api_auth_token = settings.api_auth_tokens[0]
 api_headers = {settings.API_AUTH_TOKEN_HEADER_NAME: api_auth_token}
 
-# SQL/LDAP connection cursor.
+# SQL/LDAP connection cursor, used to query mailing lists in main thread.
+# Mailing lists are synced in worker threads, every worker gets its own
+# connection from pool.
 conn = None
 backend = None
 
@@ -65,13 +69,17 @@ elif settings.backend_api == 'bk_iredmail_ldap' or settings.backend_cli == 'bk_i
     import ldap
     backend = "ldap"
 
-    from bk_iredmail_ldap import LDAPWrap
+    from bk_iredmail_ldap import LDAPWrap, iter_search
     _wrap = LDAPWrap()
     conn = _wrap.conn
 else:
     print("mlmmjadmin is not configured to interactive with SQL/LDAP. Exit.")
     sys.exit()
 
+if conn is None:
+    print("Cannot connect to SQL/LDAP server, see log file for details. Exit.")
+    sys.exit()
+
 # Available mailing lists.
 mls = []
 
@@ -86,10 +94,11 @@ if "-A" in args:
     elif backend == "ldap":
         _filter = "(&(objectClass=mailList)(accountStatus=active)(enabledService=mlmmj))"
         try:
-            qr = conn.search_s(settings.iredmail_ldap_basedn,
-                               ldap.SCOPE_SUBTREE,
-                               _filter,
-                               ["mail"])
+            qr = iter_search(settings.iredmail_ldap_basedn,
+                             ldap.SCOPE_SUBTREE,
+                             _filter,
+                             ["mail"],
+                             conn=conn)
             for (_dn, _ldif) in qr:
                 mls += [bytes2str(i).lower() for i in _ldif["mail"]]
         except Exception as e:
@@ -119,10 +128,11 @@ else:
             for d in domains:
                 _filter = "(&(objectClass=mailList)(accountStatus=active)(enabledService=mlmmj))"
                 try:
-                    qr = conn.search_s("domainName={},{}".format(d, settings.iredmail_ldap_basedn),
-                                       ldap.SCOPE_SUBTREE,
-                                       _filter,
-                                       ["mail"])
+                    qr = iter_search("domainName={},{}".format(d, settings.iredmail_ldap_basedn),
+                                     ldap.SCOPE_SUBTREE,
+                                     _filter,
+                                     ["mail"],
+                                     conn=conn)
                     for (_dn, _ldif) in qr:
                         mls += [bytes2str(i).lower() for i in _ldif["mail"]]
                 except Exception as e:
@@ -134,6 +144,10 @@ else:
 
     print("Syncing {} mailing lists.".format(len(mls)))
 
+# Return connection of main thread to pool.
+conn = None
+_wrap = None
+
 
 # Get profile of mailing list.
 def get_profile(mail):
@@ -178,26 +192,30 @@ def __sync_addresses(mail, addresses, address_type):
         sql_table = _map[address_type]["table"]
         sql_column = _map[address_type]["column"]
 
-        conn.delete(sql_table,
-                    vars={"mail": mail},
-                    where="address=$mail")
-
-        if addresses:
-            rows = []
-            for i in addresses:
-                row = {
-                    "address": mail,
-                    sql_column: i,
-                    "domain": mail.split("@", 1)[-1],
-                    "dest_domain": i.split("@", 1)[-1],
-                }
-                rows.append(row)
-
-            try:
-                conn.multiple_insert(sql_table, rows)
-            except Exception as e:
-                msg = "Error while updating {}: {}".format(sql_table, repr(e))
-                return (False, msg)
+        rows = []
+        for i in addresses:
+            row = {
+                "address": mail,
+                sql_column: i,
+                "domain": mail.split("@", 1)[-1],
+                "dest_domain": i.split("@", 1)[-1],
+            }
+            rows.append(row)
+
+        _wrap = SQLWrap()
+        _conn = _wrap.conn
+
+        try:
+            with _conn.transaction():
+                _conn.delete(sql_table,
+                             vars={"mail": mail},
+                             where="address=$mail")
+
+                if rows:
+                    _conn.multiple_insert(sql_table, rows)
+        except Exception as e:
+            msg = "Error while updating {}: {}".format(sql_table, repr(e))
+            return (False, msg)
 
     elif backend == "ldap":
         _domain = mail.split("@", 1)[-1]
@@ -212,16 +230,13 @@ def __sync_addresses(mail, addresses, address_type):
         elif address_type == "moderator":
             mod_attr = [(ldap.MOD_REPLACE, "listModerator", str2bytes(addresses))]
 
+        _wrap = LDAPWrap()
+        _conn = _wrap.conn
+
         try:
-            conn.modify_s(ldn, mod_attr)
+            _conn.modify_s(ldn, mod_attr)
         except ldap.OBJECT_CLASS_VIOLATION:
-            print("<<< ERROR >>> Seems your OpenLDAP server doesn't support "
-                  "`listOwner` and `listModerator` attributes which were "
-                  "introduced in iRedMail-1.4.0, please follow iRedMail "
-                  "upgrade tutorial to update LDAP schema file "
-                  "`iredmail.schema` first: "
-                  "https://docs.iredmail.org/iredmail.releases.html")
-            sys.exit()
+            return (False, "OBJECT_CLASS_VIOLATION")
         except Exception as e:
             msg = "Error while updating {} of mailing list {}: {}".format(address_type, mail, repr(e))
             return (False, msg)
@@ -241,29 +256,56 @@ def sync_moderators(mail, moderators):
                             address_type="moderator")
 
 
-for mail in mls:
+def sync_list(mail):
+    # Messages of one mailing list are printed together when it's synced.
+    msgs = []
+
     qr = get_profile(mail)
     if not qr[0]:
-        print("Error while getting profile: {} -> {}".format(mail, qr[1]))
-        continue
+        msgs.append("Error while getting profile: {} -> {}".format(mail, qr[1]))
+        return (True, msgs)
 
     p = qr[1]
     owners = p.get("owners", [])
     qr = sync_owners(mail, owners)
     if qr[0]:
-        print("[OK] {}: Synced owners.".format(mail))
+        msgs.append("[OK] {}: Synced owners.".format(mail))
     else:
         if qr[1] == "OBJECT_CLASS_VIOLATION":
-            print("<<< SKIP >>> Please update OpenLDAP schema file `iredmail.schema` first.")
-        else:
-            print("<<< ERROR >>> {}: Failed to sync owners: {}".format(mail, qr[1]))
+            return qr
+
+        msgs.append("<<< ERROR >>> {}: Failed to sync owners: {}".format(mail, qr[1]))
 
     moderators = p.get("moderators", [])
     qr = sync_moderators(mail, moderators)
     if qr[0]:
-        print("[OK] {}: Synced moderators.".format(mail))
+        msgs.append("[OK] {}: Synced moderators.".format(mail))
     else:
         if qr[1] == "OBJECT_CLASS_VIOLATION":
-            print("<<< SKIP >>> Please update OpenLDAP schema file `iredmail.schema` first.")
-        else:
-            print("<<< ERROR >>> {}: Failed to sync moderators: {}".format(mail, qr[1]))
+            return qr
+
+        msgs.append("<<< ERROR >>> {}: Failed to sync moderators: {}".format(mail, qr[1]))
+
+    return (True, msgs)
+
+
+# Sync mailing lists concurrently, print messages of each mailing list once
+# it's synced.
+_results = iter_for_lists(sync_list, lists=mls)
+for (mail, qr) in _results:
+    if qr[0]:
+        for msg in qr[1]:
+            print(msg)
+    elif qr[1] == "OBJECT_CLASS_VIOLATION":
+        # Cancel mailing lists not synced yet.
+        _results.close()
+
+        print("<<< ERROR >>> Seems your OpenLDAP server doesn't support "
+              "`listOwner` and `listModerator` attributes which were "
+              "introduced in iRedMail-1.4.0, please follow iRedMail "
+              "upgrade tutorial to update LDAP schema file "
+              "`iredmail.schema` first: "
+              "https://docs.iredmail.org/iredmail.releases.html")
+        sys.exit()
+    else:
+        print("<<< ERROR >>> {}: {}".format(mail, qr[1]))
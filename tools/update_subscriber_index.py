@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Purpose: Build or update the subscriber -> mailing lists index, and the
+#          owner/moderator -> mailing lists index used by mlmmjadmin
+#          (`MLMMJ_SUBSCRIBER_INDEX` in settings.py).
+#
+# Only mailing lists with changed subscriber files (or control files of
+# owners and moderators) are re-indexed, so it's
+# cheap to run it with cron job (e.g. every 5 minutes) to catch up
+# subscription changes handled by mlmmj itself (e.g. subscribe via email).
+#
+# Bloom filters of subscribers (`MLMMJ_BLOOM_FILTER_FP_RATE` in settings.py)
+# are built (or refreshed) by this script too.
+#
+# If it's running as root, it runs as daemon user (`run_as_user` and
+# `run_as_group` in settings.py) like mlmmjadmin does, so that index and bloom
+# filter files created by it can be updated by mlmmjadmin.
+
+import sys
+import os
+import pwd
+import grp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + '/..')
+
+import web
+web.config.debug = False
+
+from libs import mlmmj
+from libs.utils import is_email
+import settings
+
+usage = """Usage:
+
+    python3 update_subscriber_index.py [-A] [-f] [email] [email] [...]
+
+Arguments:
+
+    -A: Index all mailing lists stored under mlmmj spool directory, and remove
+        indexed data of mailing lists which don't exist anymore.
+    -f: Re-index mailing lists even if subscriber files were not changed.
+
+Samples:
+
+    *) Index all mailing lists (note: `-A` in upper case, not `-a`):
+
+        python3 update_subscriber_index.py -A
+
+    *) Re-index given mailing lists:
+
+        python3 update_subscriber_index.py -f list1@domain.com list2@domain.com
+"""
+
+if len(sys.argv) < 2:
+    print(usage)
+    sys.exit()
+
+if not settings.MLMMJ_SUBSCRIBER_INDEX:
+    print("Subscriber index is disabled (MLMMJ_SUBSCRIBER_INDEX in settings.py). Exit.")
+    sys.exit()
+
+# Run as daemon user.
+if os.getuid() == 0:
+    os.umask(0o077)
+    os.setgid(grp.getgrnam(settings.run_as_group).gr_gid)
+    os.setuid(pwd.getpwnam(settings.run_as_user).pw_uid)
+
+# Functions in `libs.mlmmj` log client address of API request.
+web.ctx.ip = '127.0.0.1'
+
+args = sys.argv[1:]
+force = ('-f' in args)
+
+if '-A' in args:
+    mls = None
+else:
+    mls = [i.lower() for i in args if is_email(i)]
+    if not mls:
+        print("No valid email address(es) of mailing lists given on command line. Abort.")
+        sys.exit()
+
+qr = mlmmj.update_subscriber_index(lists=mls, force=force)
+if not qr[0]:
+    print("<<< ERROR >>> {}".format(qr[1]))
+    sys.exit(255)
+
+for mail in qr[1]['indexed']:
+    print("[OK] {}: Indexed.".format(mail))
+
+for mail in qr[1]['removed']:
+    print("[OK] {}: Removed from index.".format(mail))